@@ -0,0 +1,331 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Utilities to run benchmarks and compare their results with stored baselines.
+
+Each benchmark is run in a new Python process, so that it starts from the
+same state every time and its memory usage can be measured in isolation:
+forked processes would inherit the peak memory usage of their parent.
+
+"""
+from json import dump as write_json
+from json import dumps as convert_to_json
+from json import load as read_json
+from json import loads as parse_json
+import gc
+from optparse import OptionParser
+import os
+from subprocess import PIPE
+from subprocess import Popen
+import sys
+import time
+
+
+__all__ = ['run_benchmarks']
+
+
+_DEFAULT_BASELINES_FILE_PATH = os.path.join(
+    os.path.dirname(__file__),
+    'baselines.json',
+    )
+
+_DISTRIBUTION_DIRECTORY_PATH = os.path.dirname(os.path.dirname(__file__))
+
+
+def run_benchmarks(suite_name, get_benchmarks, argv=None, default_sizes=()):
+    """
+    Run the benchmarks in the suite ``suite_name`` as configured by the
+    command line arguments ``argv``.
+
+    :param get_benchmarks: Callable which takes the sizes requested and
+        returns an iterable of ``(benchmark_name, benchmark_function)`` pairs
+    :return: The exit status: ``1`` if there are regressions with respect to
+        the baseline, ``0`` otherwise
+    :rtype: :class:`int`
+
+    """
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option(
+        '--sizes',
+        default=','.join(str(size) for size in default_sizes),
+        help='Comma-separated list of sizes to benchmark [default: %default]',
+        )
+    parser.add_option(
+        '--repeat',
+        default=3,
+        type='int',
+        help='Number of times each benchmark is run [default: %default]',
+        )
+    parser.add_option(
+        '--baselines',
+        default=_DEFAULT_BASELINES_FILE_PATH,
+        dest='baselines_file_path',
+        help='File where the baselines are stored [default: %default]',
+        )
+    parser.add_option(
+        '--save-baselines',
+        action='store_true',
+        default=False,
+        dest='save_baselines',
+        help='Store the results as the new baselines',
+        )
+    parser.add_option(
+        '--time-tolerance',
+        default=0.25,
+        type='float',
+        dest='time_tolerance',
+        help='Maximum relative increase in time with respect to the '
+            'baseline [default: %default]',
+        )
+    parser.add_option(
+        '--memory-tolerance',
+        default=0.25,
+        type='float',
+        dest='memory_tolerance',
+        help='Maximum relative increase in peak memory with respect to the '
+            'baseline [default: %default]',
+        )
+    # Used internally to run each benchmark in a new process
+    parser.add_option('--run-benchmark', dest='benchmark_name')
+    options = parser.parse_args(argv)[0]
+
+    sizes = [int(size) for size in options.sizes.split(',') if size]
+
+    if options.benchmark_name:
+        return _run_benchmark(get_benchmarks, sizes, options.benchmark_name)
+
+    all_baselines = _read_baselines(options.baselines_file_path)
+    suite_baselines = all_baselines.get(suite_name, {})
+
+    results = {}
+    regressions = []
+    for size in sizes:
+        benchmark_names = \
+            [benchmark_name for benchmark_name, _ in get_benchmarks([size])]
+        for benchmark_name in benchmark_names:
+            # Benchmarks which don't depend on the size are only run once
+            if benchmark_name in results:
+                continue
+
+            result = _measure(
+                suite_name,
+                benchmark_name,
+                size,
+                options.repeat,
+                )
+            results[benchmark_name] = result
+
+            baseline = suite_baselines.get(benchmark_name)
+            benchmark_regressions = \
+                _get_regressions(result, baseline, options)
+            regressions.extend(
+                '%s: %s' % (benchmark_name, regression)
+                for regression in benchmark_regressions
+                )
+            _report_result(
+                benchmark_name,
+                result,
+                baseline,
+                benchmark_regressions,
+                )
+
+    if options.save_baselines:
+        suite_baselines.update(results)
+        all_baselines[suite_name] = suite_baselines
+        _write_baselines(options.baselines_file_path, all_baselines)
+
+    if regressions:
+        sys.stdout.write('\nRegressions:\n')
+        for regression in regressions:
+            sys.stdout.write('  %s\n' % regression)
+        exit_status = 1
+    else:
+        exit_status = 0
+    return exit_status
+
+
+def _run_benchmark(get_benchmarks, sizes, benchmark_name):
+    for current_benchmark_name, benchmark_function in get_benchmarks(sizes):
+        if current_benchmark_name == benchmark_name:
+            measurement = _measure_in_current_process(benchmark_function)
+            sys.stdout.write('\n' + convert_to_json(measurement) + '\n')
+            return 0
+
+    sys.stderr.write('Unknown benchmark %r\n' % benchmark_name)
+    return 1
+
+
+def _measure(suite_name, benchmark_name, size, repeat):
+    wall_times = []
+    cpu_times = []
+    peak_memory_increases = []
+    memory_increases = []
+    for _ in range(repeat):
+        measurement = _measure_in_new_process(suite_name, benchmark_name, size)
+        wall_times.append(measurement['wall_time'])
+        cpu_times.append(measurement['cpu_time'])
+        peak_memory_increases.append(measurement['peak_memory'])
+        memory_increases.append(measurement['memory'])
+
+    result = {
+        'wall_time': min(wall_times),
+        'cpu_time': min(cpu_times),
+        'peak_memory': max(peak_memory_increases),
+        'memory': max(memory_increases),
+        }
+    return result
+
+
+def _measure_in_new_process(suite_name, benchmark_name, size):
+    environ = dict(os.environ)
+    python_path = environ.get('PYTHONPATH')
+    environ['PYTHONPATH'] = _DISTRIBUTION_DIRECTORY_PATH + \
+        (os.pathsep + python_path if python_path else '')
+    process = Popen(
+        [
+            sys.executable,
+            '-m',
+            'benchmarks.' + suite_name,
+            '--sizes=%s' % size,
+            '--run-benchmark=%s' % benchmark_name,
+            ],
+        stdout=PIPE,
+        stderr=PIPE,
+        env=environ,
+        )
+    output, error_output = process.communicate()
+    if process.returncode:
+        raise RuntimeError(
+            'Benchmark %s failed:\n%s' % (benchmark_name, error_output),
+            )
+
+    # The measurement is written last, after anything the benchmark printed
+    return parse_json(output.strip().splitlines()[-1])
+
+
+def _measure_in_current_process(benchmark_function):
+    gc.collect()
+    _reset_peak_memory()
+    initial_memory = _get_memory_status()['VmRSS']
+    initial_cpu_time = _get_cpu_time()
+    initial_wall_time = time.time()
+
+    benchmark_function()
+
+    wall_time = time.time() - initial_wall_time
+    cpu_time = _get_cpu_time() - initial_cpu_time
+    memory_status = _get_memory_status()
+
+    measurement = {
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        # In kilobytes
+        'peak_memory': memory_status['VmHWM'] - initial_memory,
+        'memory': memory_status['VmRSS'] - initial_memory,
+        }
+    return measurement
+
+
+def _reset_peak_memory():
+    # The peak would otherwise include the memory used to start Python and
+    # generate the benchmark, and that of the process which started this one,
+    # since it's inherited on exec().
+    with open('/proc/self/clear_refs', 'w') as clear_refs_file:
+        clear_refs_file.write('5')
+
+
+def _get_memory_status():
+    memory_status = {}
+    with open('/proc/self/status') as status_file:
+        for line in status_file:
+            field_name, _, field_value = line.partition(':')
+            if field_name in ('VmRSS', 'VmHWM'):
+                memory_status[field_name] = int(field_value.split()[0])
+    return memory_status
+
+
+def _get_cpu_time():
+    process_times = os.times()
+    return process_times[0] + process_times[1]
+
+
+def _get_regressions(result, baseline, options):
+    regressions = []
+    if not baseline:
+        return regressions
+
+    maximum_wall_time = baseline['wall_time'] * (1 + options.time_tolerance)
+    if maximum_wall_time < result['wall_time']:
+        regressions.append(
+            'time %.4fs exceeds baseline %.4fs' % (
+                result['wall_time'],
+                baseline['wall_time'],
+                ),
+            )
+
+    # Small increases in memory are just noise:
+    maximum_peak_memory = max(
+        baseline['peak_memory'] * (1 + options.memory_tolerance),
+        baseline['peak_memory'] + 1024,
+        )
+    if maximum_peak_memory < result['peak_memory']:
+        regressions.append(
+            'peak memory %sKB exceeds baseline %sKB' % (
+                result['peak_memory'],
+                baseline['peak_memory'],
+                ),
+            )
+
+    return regressions
+
+
+def _report_result(benchmark_name, result, baseline, regressions):
+    line = '%-60s %10.4fs %10.4fs CPU %10dKB %10dKB retained' % (
+        benchmark_name,
+        result['wall_time'],
+        result['cpu_time'],
+        result['peak_memory'],
+        result['memory'],
+        )
+    if baseline:
+        line += '  (baseline: %.4fs %dKB)' % (
+            baseline['wall_time'],
+            baseline['peak_memory'],
+            )
+    if regressions:
+        line += '  REGRESSION'
+    sys.stdout.write(line + '\n')
+    sys.stdout.flush()
+
+
+def _read_baselines(baselines_file_path):
+    if not os.path.exists(baselines_file_path):
+        return {}
+    with open(baselines_file_path) as baselines_file:
+        baselines = read_json(baselines_file)
+    return baselines
+
+
+def _write_baselines(baselines_file_path, baselines):
+    with open(baselines_file_path, 'w') as baselines_file:
+        write_json(
+            baselines,
+            baselines_file,
+            indent=4,
+            separators=(',', ': '),
+            sort_keys=True,
+            )
+        baselines_file.write('\n')
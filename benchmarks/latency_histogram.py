@@ -0,0 +1,77 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Benchmarks for the overhead of
+:class:`~django_pastedeploy_settings.latency.LatencyHistogramMiddleware`,
+with an increasing number of route prefixes.
+
+Run it from the root of the distribution::
+
+    python -m benchmarks.latency_histogram --sizes=0,10,100
+
+"""
+import sys
+
+from django_pastedeploy_settings.latency import LatencyHistogramMiddleware
+
+from benchmarks import run_benchmarks
+
+
+_DEFAULT_SIZES = (0, 10, 100)
+
+_REQUEST_COUNT = 100000
+
+
+def get_benchmarks(sizes):
+    yield ('bare/request', lambda: _make_requests(_mock_app))
+    for size in sizes:
+        route_prefixes = ['/section%s' % index for index in range(size)]
+        middleware = LatencyHistogramMiddleware(_mock_app, route_prefixes)
+        yield (
+            'LatencyHistogramMiddleware-%s/request' % size,
+            lambda: _make_requests(middleware),
+            )
+
+
+def _make_requests(app):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': '/accounts/1/',
+        }
+    for _ in range(_REQUEST_COUNT):
+        app_iter = app(environ, _start_response)
+        for _ in app_iter:
+            pass
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def _mock_app(environ, start_response):
+    start_response('200 OK', [])
+    return []
+
+
+def _start_response(status, headers, exc_info=None):
+    pass
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmarks(
+        'latency_histogram',
+        get_benchmarks,
+        default_sizes=_DEFAULT_SIZES,
+        ))
@@ -0,0 +1,214 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Benchmarks for the resolution of settings and the loading of the Django
+application, on synthetic configurations of increasing size.
+
+Run it from the root of the distribution::
+
+    python -m benchmarks.settings_resolution --sizes=10,1000
+
+"""
+from json import dumps as convert_to_json
+import os
+from random import Random
+from shutil import rmtree
+import sys
+from tempfile import mkdtemp
+
+from django_pastedeploy_settings import _set_up_settings
+from django_pastedeploy_settings import get_configured_django_wsgi_app
+from django_pastedeploy_settings import resolve_local_conf_options
+
+from benchmarks import run_benchmarks
+
+
+_DEFAULT_SIZES = (10, 100, 1000, 10000, 50000)
+
+
+class _ConfigProfile(object):
+    """
+    Shape of a synthetic configuration.
+
+    """
+
+    def __init__(
+        self,
+        name,
+        reference_density=0.0,
+        json_payload_density=0.0,
+        json_payload_size=0,
+        list_setting_density=0.0,
+        extra_global_conf=None,
+        ):
+        super(_ConfigProfile, self).__init__()
+
+        self.name = name
+        #: Proportion of options whose values reference other options
+        self.reference_density = reference_density
+        #: Proportion of options whose values are large JSON arrays/objects
+        self.json_payload_density = json_payload_density
+        #: Number of items in the large JSON arrays/objects
+        self.json_payload_size = json_payload_size
+        #: Proportion of options extending lists in the settings module
+        self.list_setting_density = list_setting_density
+        #: Meta options set in the ``[DEFAULT]`` section
+        self.extra_global_conf = extra_global_conf or {}
+
+
+_CONFIG_PROFILES = (
+    _ConfigProfile('plain'),
+    _ConfigProfile('references', reference_density=0.5),
+    _ConfigProfile(
+        'json-payloads',
+        json_payload_density=0.1,
+        json_payload_size=100,
+        ),
+    _ConfigProfile(
+        'json-payloads-batched',
+        json_payload_density=0.1,
+        json_payload_size=100,
+        extra_global_conf={'batch_json_decoding': 'true'},
+        ),
+    _ConfigProfile('list-settings', list_setting_density=0.2),
+    )
+
+
+def get_benchmarks(sizes):
+    settings_modules_directory_path = mkdtemp()
+    sys.path.insert(0, settings_modules_directory_path)
+    try:
+        for config_profile in _CONFIG_PROFILES:
+            for size in sizes:
+                scenario_name = '%s-%s' % (config_profile.name, size)
+                global_conf, local_conf = _generate_config(
+                    config_profile,
+                    size,
+                    settings_modules_directory_path,
+                    )
+                yield (
+                    scenario_name + '/resolve_local_conf_options',
+                    lambda: resolve_local_conf_options(
+                        global_conf,
+                        local_conf,
+                        ),
+                    )
+                yield (
+                    scenario_name + '/_set_up_settings',
+                    lambda: _set_up_settings(global_conf, local_conf),
+                    )
+                yield (
+                    scenario_name + '/get_configured_django_wsgi_app',
+                    lambda: get_configured_django_wsgi_app(
+                        global_conf,
+                        **local_conf
+                        ),
+                    )
+    finally:
+        sys.path.remove(settings_modules_directory_path)
+        rmtree(settings_modules_directory_path)
+
+
+def _generate_config(config_profile, size, settings_modules_directory_path):
+    # The same configuration must be generated on every run
+    random = Random(size)
+
+    settings_module_name = 'benchmark_settings_%s_%s' % (
+        config_profile.name.replace('-', '_'),
+        size,
+        )
+    global_conf = {
+        'debug': 'false',
+        'django_settings_module': settings_module_name,
+        'here': settings_modules_directory_path,
+        }
+    global_conf.update(config_profile.extra_global_conf)
+    global_option_count = max(size // 10, 1)
+    for global_option_index in range(global_option_count):
+        global_conf['variable%s' % global_option_index] = \
+            'value%s' % global_option_index
+
+    local_conf = {'SECRET_KEY': '"secret"'}
+    list_setting_names = []
+    for option_index in range(size):
+        option_name = 'OPTION%s' % option_index
+        dice = random.random()
+        if dice < config_profile.list_setting_density:
+            option_value = convert_to_json(['item%s' % option_index])
+            list_setting_names.append(option_name)
+        elif dice < config_profile.list_setting_density + \
+                config_profile.json_payload_density:
+            option_value = \
+                _generate_json_payload(config_profile, random)
+        elif dice < config_profile.list_setting_density + \
+                config_profile.json_payload_density + \
+                config_profile.reference_density:
+            # Referenced options are valid JSON documents on their own
+            option_value = '["${variable%s}", ${OPTION%s}]' % (
+                random.randrange(global_option_count),
+                random.randrange(option_index + 1, size + 1),
+                )
+        else:
+            option_value = '"value%s"' % option_index
+        local_conf[option_name] = option_value
+    # Referenced by the last options
+    local_conf['OPTION%s' % size] = '1'
+
+    _write_settings_module(
+        settings_module_name,
+        list_setting_names,
+        settings_modules_directory_path,
+        )
+
+    return global_conf, local_conf
+
+
+def _generate_json_payload(config_profile, random):
+    if random.random() < 0.5:
+        payload = [
+            'item%s' % item_index
+            for item_index in range(config_profile.json_payload_size)
+            ]
+    else:
+        payload = {
+            'key%s' % item_index: {'value': item_index, 'enabled': True}
+            for item_index in range(config_profile.json_payload_size)
+            }
+    return convert_to_json(payload)
+
+
+def _write_settings_module(
+    settings_module_name,
+    list_setting_names,
+    settings_modules_directory_path,
+    ):
+    settings_module_path = os.path.join(
+        settings_modules_directory_path,
+        settings_module_name + '.py',
+        )
+    with open(settings_module_path, 'w') as settings_module_file:
+        for list_setting_name in list_setting_names:
+            settings_module_file.write(
+                '%s = ("original item", )\n' % list_setting_name,
+                )
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmarks(
+        'settings_resolution',
+        get_benchmarks,
+        default_sizes=_DEFAULT_SIZES,
+        ))
@@ -0,0 +1,103 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Benchmarks for the dispatching of requests by :class:`paste.urlmap.URLMap`
+and :class:`~django_pastedeploy_settings.urlmap.TrieURLMap`, with an
+increasing number of applications mounted.
+
+Run it from the root of the distribution::
+
+    python -m benchmarks.url_dispatch --sizes=10,100,1000
+
+"""
+from random import Random
+import sys
+
+from paste.urlmap import URLMap
+
+from django_pastedeploy_settings.urlmap import TrieURLMap
+
+from benchmarks import run_benchmarks
+
+
+_DEFAULT_SIZES = (10, 100, 1000)
+
+_REQUEST_COUNT = 20000
+
+_URL_MAP_CLASSES = (URLMap, TrieURLMap)
+
+
+def get_benchmarks(sizes):
+    for size in sizes:
+        environs = _generate_environs(size)
+        for url_map_class in _URL_MAP_CLASSES:
+            url_map = _get_url_map(url_map_class, size)
+            yield (
+                '%s-%s/dispatch' % (url_map_class.__name__, size),
+                lambda: _dispatch_requests(url_map, environs),
+                )
+
+
+def _get_url_map(url_map_class, mount_count):
+    url_map = url_map_class()
+    url_map['/'] = _mock_app
+    for mount_index in range(mount_count):
+        url_map['/media/tenant%s' % mount_index] = _mock_app
+    return url_map
+
+
+def _generate_environs(mount_count):
+    # The same requests must be generated on every run
+    random = Random(mount_count)
+
+    environs = []
+    for _ in range(_REQUEST_COUNT):
+        if random.random() < 0.9:
+            path_info = '/media/tenant%s/images/%s.png' % (
+                random.randrange(mount_count),
+                random.randrange(1000),
+                )
+        else:
+            path_info = '/accounts/%s/' % random.randrange(1000)
+        environ = {
+            'HTTP_HOST': 'example.com',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path_info,
+            'wsgi.url_scheme': 'http',
+            }
+        environs.append(environ)
+    return environs
+
+
+def _dispatch_requests(url_map, environs):
+    for environ in environs:
+        url_map(environ.copy(), _start_response)
+
+
+def _mock_app(environ, start_response):
+    return []
+
+
+def _start_response(status, headers, exc_info=None):
+    pass
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmarks(
+        'url_dispatch',
+        get_benchmarks,
+        default_sizes=_DEFAULT_SIZES,
+        ))
@@ -18,18 +18,37 @@
 Utilities to set up Django applications, both in Web and CLI environments.
 
 """
+from collections import Mapping
+from itertools import chain
 from json import loads as parse_json
 from logging import getLogger
 import os
 import re
+from threading import Lock
+from time import time
+from uuid import uuid4
 
+from paste.deploy.converters import asbool
+from paste.deploy.converters import aslist
 from paste.deploy.loadwsgi import appconfig
 
+from django_pastedeploy_settings.forking import compact_options
+from django_pastedeploy_settings.forking import freeze_loaded_objects
+from django_pastedeploy_settings.hot_reload import FileWatcher
+from django_pastedeploy_settings.instrumentation import get_startup_recorder
+from django_pastedeploy_settings.instrumentation import NULL_STARTUP_RECORDER
+from django_pastedeploy_settings.settings_cache import \
+    get_settings_cache_fingerprint
+from django_pastedeploy_settings.settings_cache import load_cached_options
+from django_pastedeploy_settings.settings_cache import store_cached_options
+from django_pastedeploy_settings.warm_up import warm_up_application
+
 
 # The order is important to Sphinx' autodoc extension.
 __all__ = [
     'resolve_local_conf_options',
     'get_configured_django_wsgi_app',
+    'LazilyResolvedOptions',
     'BadDebugFlagError',
     'InvalidSettingValueError',
     'MissingDjangoSettingsModuleError',
@@ -41,6 +60,11 @@ __all__ = [
 _LOGGER = getLogger(__name__)
 
 
+# Faster alternatives to the "json" module from the standard library, tried in
+# this order when the "json_decoder" option is set to "auto".
+_FAST_JSON_DECODER_MODULE_NAMES = ('ujson', 'simplejson')
+
+
 _OPTION_REFERENCE_REGEX = re.compile(r"""
     (?P<escape_character>\$)?
     \$
@@ -52,10 +76,14 @@ _OPTION_REFERENCE_REGEX = re.compile(r"""
     )
 
 
-def resolve_local_conf_options(global_conf, local_conf):
+def resolve_local_conf_options(global_conf, local_conf, lazy=False):
     """
     Return the final values for the items in ``local_conf``.
 
+    :param lazy: Whether to defer the variable substitution and JSON decoding
+        of each option until its value is first requested
+    :type lazy: :class:`bool`
+
     :raises ImportError: If the Django settings module cannot be imported.
     :raises UnsupportedDjangoSettingError: If ``local_conf`` contains a Django
         setting which is not supported.
@@ -63,9 +91,13 @@ def resolve_local_conf_options(global_conf, local_conf):
         option is not set.
     :raises BadDebugFlagError: If Django's ``DEBUG`` is set instead of Paste's
         ``debug``.
+    :raises InvalidSettingValueError: If the value of an option cannot be
+        decoded or references a non-existing global option. When ``lazy`` is
+        set, this is raised when the value is requested instead.
     :return: ``local_conf`` with its values deserialized from JSON and
         variable references resolved
-    :rtype: :class:`dict`
+    :rtype: :class:`dict`, or :class:`LazilyResolvedOptions` if ``lazy``
+        is set
 
     The result also includes the following items:
 
@@ -74,13 +106,44 @@ def resolve_local_conf_options(global_conf, local_conf):
       file used.
 
     """
-    _validate_debug_data(global_conf, local_conf)
-    _require_supported_options_only(local_conf)
+    local_conf_resolved = _resolve_local_conf_options(
+        global_conf,
+        local_conf,
+        lazy,
+        NULL_STARTUP_RECORDER,
+        )
+    return local_conf_resolved
+
+
+def _resolve_local_conf_options(
+    global_conf,
+    local_conf,
+    lazy,
+    startup_recorder,
+    ):
+    with startup_recorder.record_phase('validation'):
+        _validate_debug_data(global_conf, local_conf)
+        _require_supported_options_only(local_conf)
 
     local_conf = dict(local_conf, DEBUG=global_conf['debug'])
-    local_conf_resolved = \
-        _get_option_values_dereferenced(global_conf, local_conf)
-    local_conf_resolved = _get_option_values_parsed(local_conf_resolved)
+    startup_recorder.count_options(len(local_conf))
+    if lazy:
+        local_conf_resolved = LazilyResolvedOptions(global_conf, local_conf)
+    else:
+        with startup_recorder.record_phase('dereferencing'):
+            local_conf_resolved = \
+                _get_option_values_dereferenced(global_conf, local_conf)
+
+        if startup_recorder.is_recording:
+            startup_recorder.count_decoded_bytes(
+                sum(len(value) for value in local_conf_resolved.values()),
+                )
+        with startup_recorder.record_phase('decoding'):
+            local_conf_resolved = _get_option_values_parsed(
+                local_conf_resolved,
+                _get_json_decoder(global_conf),
+                asbool(global_conf.get('batch_json_decoding', False)),
+                )
 
     # Make the PasteDeploy configuration file path available
     local_conf_resolved['paste_configuration_file'] = \
@@ -89,6 +152,62 @@ def resolve_local_conf_options(global_conf, local_conf):
     return local_conf_resolved
 
 
+class LazilyResolvedOptions(Mapping):
+    """
+    Mapping of options whose values are dereferenced and decoded from JSON
+    when they are first requested.
+
+    The resolved values are memoized, so each option is only resolved once.
+
+    """
+
+    def __init__(self, global_conf, raw_options):
+        super(LazilyResolvedOptions, self).__init__()
+
+        self._option_reference_resolver = \
+            _OptionReferenceResolver(global_conf, raw_options)
+        self._json_decoder = _get_json_decoder(global_conf)
+        self._raw_options = raw_options
+        self._resolved_options = {}
+
+    def __getitem__(self, option_name):
+        try:
+            option_value = self._resolved_options[option_name]
+        except KeyError:
+            if option_name not in self._raw_options:
+                raise
+            option_value = \
+                self._option_reference_resolver.dereference(option_name)
+            option_value = _get_option_value_parsed(
+                option_name,
+                option_value,
+                self._json_decoder,
+                )
+            self._resolved_options[option_name] = option_value
+        return option_value
+
+    def __setitem__(self, option_name, option_value):
+        """Set the already resolved ``option_value`` for ``option_name``."""
+        self._resolved_options[option_name] = option_value
+
+    def __iter__(self):
+        option_names = set(self._raw_options) | set(self._resolved_options)
+        return iter(option_names)
+
+    def __len__(self):
+        return len(set(self._raw_options) | set(self._resolved_options))
+
+    def validate(self):
+        """
+        Resolve all the options at once.
+
+        :raises InvalidSettingValueError: If any option cannot be resolved
+
+        """
+        for option_name in self:
+            self[option_name]
+
+
 def get_configured_django_wsgi_app(global_conf, **local_conf):
     """
     Load the Django application for use in a WSGI server.
@@ -100,10 +219,52 @@ def get_configured_django_wsgi_app(global_conf, **local_conf):
     result as Django settings. Any exceptions raised by that function are also
     propagated.
 
+    The time spent in each phase is reported to the listeners registered with
+    :func:`~django_pastedeploy_settings.instrumentation.add_startup_listener`.
+
+    If the ``hot_reload_interval`` option is set, the PasteDeploy
+    configuration file is watched from then on and the changes to the
+    settings listed in the ``hot_reloadable_settings`` option are applied
+    without restarting the process.
+
+    If the ``fork_friendly_settings`` option is enabled, the settings are
+    stored as compact values shared between options, and the garbage
+    collector stops tracking the objects loaded, so that the processes
+    forked afterwards share more memory.
+
+    If the ``warm_up`` option is enabled, what Django would otherwise load on
+    the first request is loaded beforehand, along with the templates listed
+    in the ``warm_up_templates`` option. A request is also made to each of
+    the paths listed in the ``warm_up_paths`` option.
+
     """
-    _set_up_settings(global_conf, local_conf)
+    startup_recorder = get_startup_recorder()
+
+    settings_reloader = _get_settings_reloader(global_conf)
 
-    return _get_django_wsgi_app()
+    _set_up_settings(global_conf, local_conf, startup_recorder)
+
+    with startup_recorder.record_phase('wsgi_application'):
+        wsgi_application = _get_django_wsgi_app()
+
+    if asbool(global_conf.get('warm_up', False)):
+        with startup_recorder.record_phase('warm_up'):
+            warm_up_application(
+                wsgi_application,
+                aslist(global_conf.get('warm_up_templates', '')),
+                aslist(global_conf.get('warm_up_paths', '')),
+                )
+
+    if asbool(global_conf.get('fork_friendly_settings', False)):
+        with startup_recorder.record_phase('garbage_collection'):
+            freeze_loaded_objects()
+
+    startup_recorder.finish()
+
+    if settings_reloader is not None:
+        settings_reloader.start(local_conf)
+
+    return wsgi_application
 
 
 def _get_django_wsgi_app():
@@ -114,14 +275,279 @@ def _get_django_wsgi_app():
     return wsgi_application
 
 
-def _set_up_settings(global_conf, local_conf):
+def _get_settings_reloader(global_conf):
+    raw_poll_interval = global_conf.get('hot_reload_interval', '0')
+    try:
+        poll_interval = float(raw_poll_interval)
+    except ValueError:
+        raise InvalidSettingValueError(
+            'Option "hot_reload_interval" must be a number of seconds: %r' %
+                raw_poll_interval,
+            )
+
+    config_file_path = global_conf.get('__file__')
+    if not (0 < poll_interval and config_file_path):
+        return None
+
+    settings_reloader = _SettingsReloader(
+        global_conf,
+        aslist(global_conf.get('hot_reloadable_settings', '')),
+        poll_interval,
+        )
+    return settings_reloader
+
+
+class _SettingsReloader(object):
+    """
+    Applier of the changes to the PasteDeploy configuration file to the
+    hot-reloadable Django settings.
+
+    Only the options whose value changed after the variable substitution are
+    decoded again, and each new value is merged with the value in the settings
+    module as it was before the configuration file was first applied.
+
+    This must be initialized before the settings are first stored in the
+    settings module.
+
+    The configuration file is watched by a thread in each process, which is
+    started when the process handles its first request, since servers may
+    fork the worker processes after loading the application.
+
+    """
+
+    def __init__(
+        self,
+        global_conf,
+        hot_reloadable_setting_names,
+        poll_interval,
+        ):
+        super(_SettingsReloader, self).__init__()
+
+        self._global_conf = global_conf
+        self._config_file_path = global_conf['__file__']
+        self._app_name = global_conf.get('hot_reload_app_name', 'main')
+        self._hot_reloadable_setting_names = \
+            frozenset(hot_reloadable_setting_names)
+        self._poll_interval = poll_interval
+
+        self._django_settings_module = \
+            _get_django_settings_module_from_global_conf(global_conf)
+        self._original_setting_values = {}
+        for setting_name in self._hot_reloadable_setting_names:
+            if hasattr(self._django_settings_module, setting_name):
+                self._original_setting_values[setting_name] = \
+                    getattr(self._django_settings_module, setting_name)
+
+        self._setting_merge_strategies = \
+            _get_setting_merge_strategies(global_conf)
+        self._json_decoder = _get_json_decoder(global_conf)
+
+        self._dereferenced_options = None
+        self._file_watcher = None
+        self._file_watcher_process_id = None
+        self._file_watcher_lock = Lock()
+
+    def start(self, local_conf):
+        """
+        Watch the configuration file for changes to the options that were
+        loaded from ``local_conf``, from the first request to each process
+        onwards.
+
+        """
+        from django.core.signals import request_started
+
+        self._dereferenced_options = \
+            _get_reloadable_options_dereferenced(self._global_conf, local_conf)
+        self._file_watcher = FileWatcher(
+            self._config_file_path,
+            self.reload,
+            self._poll_interval,
+            )
+        request_started.connect(
+            self.ensure_watching,
+            weak=False,
+            dispatch_uid=id(self),
+            )
+
+    def ensure_watching(self, **kwargs):
+        """
+        Start watching the configuration file unless it's being watched by
+        the current process already.
+
+        This can be used as a receiver of Django's ``request_started`` signal.
+
+        """
+        process_id = os.getpid()
+        if self._file_watcher_process_id == process_id:
+            return
+
+        with self._file_watcher_lock:
+            if self._file_watcher_process_id != process_id and \
+                    self._file_watcher is not None:
+                # The thread of a parent process doesn't survive a fork
+                self._file_watcher.start()
+                self._file_watcher_process_id = process_id
+
+    def stop(self):
+        """Stop watching the configuration file."""
+        from django.core.signals import request_started
+
+        request_started.disconnect(dispatch_uid=id(self))
+        if self._file_watcher is not None:
+            self._file_watcher.stop()
+            self._file_watcher = None
+        self._file_watcher_process_id = None
+
+    def reload(self):
+        """
+        Apply the changes to the hot-reloadable settings in the configuration
+        file.
+
+        :return: The names of the settings reloaded
+        :rtype: :class:`set`
+
+        Nothing is applied if any of the changed values cannot be resolved.
+
+        """
+        reload_start_time = time()
+
+        app_config = appconfig(
+            'config:' + self._config_file_path,
+            name=self._app_name,
+            )
+        _require_supported_options_only(app_config.local_conf)
+        dereferenced_options = _get_reloadable_options_dereferenced(
+            app_config.global_conf,
+            app_config.local_conf,
+            )
+
+        changed_option_names = set()
+        for option_name in \
+                set(self._dereferenced_options) | set(dereferenced_options):
+            old_option_value = self._dereferenced_options.get(option_name)
+            new_option_value = dereferenced_options.get(option_name)
+            if old_option_value != new_option_value:
+                changed_option_names.add(option_name)
+
+        reloaded_setting_names = \
+            changed_option_names & self._hot_reloadable_setting_names
+        changed_raw_options = {
+            option_name: dereferenced_options[option_name]
+            for option_name in reloaded_setting_names
+            if option_name in dereferenced_options
+            }
+        changed_options = \
+            _get_option_values_parsed(changed_raw_options, self._json_decoder)
+
+        for setting_name in reloaded_setting_names:
+            if setting_name in changed_options:
+                setting_value = changed_options[setting_name]
+                self._store_setting(setting_name, setting_value)
+            else:
+                self._remove_setting(setting_name)
+
+        self._dereferenced_options = dereferenced_options
+
+        unreloaded_option_names = \
+            changed_option_names - reloaded_setting_names
+        if unreloaded_option_names:
+            _LOGGER.warning(
+                'Options %s changed in %s but are not hot-reloadable',
+                ', '.join(sorted(unreloaded_option_names)),
+                self._config_file_path,
+                )
+        if reloaded_setting_names:
+            _LOGGER.info(
+                'Settings %s reloaded from %s in %.3fs',
+                ', '.join(sorted(reloaded_setting_names)),
+                self._config_file_path,
+                time() - reload_start_time,
+                )
+
+        return reloaded_setting_names
+
+    def _store_setting(self, setting_name, setting_value):
+        self._restore_original_setting_value(setting_name)
+        _store_django_settings(
+            {setting_name: setting_value},
+            self._django_settings_module,
+            self._setting_merge_strategies,
+            )
+        self._update_django_setting(
+            setting_name,
+            getattr(self._django_settings_module, setting_name),
+            )
+
+    def _remove_setting(self, setting_name):
+        self._restore_original_setting_value(setting_name)
+
+        # django.conf must only be imported after DJANGO_SETTINGS_MODULE has
+        # been set.
+        import django.conf
+
+        for settings_source in \
+                (self._django_settings_module, django.conf.global_settings):
+            if hasattr(settings_source, setting_name):
+                self._update_django_setting(
+                    setting_name,
+                    getattr(settings_source, setting_name),
+                    )
+                break
+        else:
+            if django.conf.settings.configured:
+                try:
+                    delattr(django.conf.settings, setting_name)
+                except AttributeError:
+                    pass
+
+    def _restore_original_setting_value(self, setting_name):
+        if setting_name in self._original_setting_values:
+            setattr(
+                self._django_settings_module,
+                setting_name,
+                self._original_setting_values[setting_name],
+                )
+        elif hasattr(self._django_settings_module, setting_name):
+            delattr(self._django_settings_module, setting_name)
+
+    @staticmethod
+    def _update_django_setting(setting_name, setting_value):
+        # django.conf must only be imported after DJANGO_SETTINGS_MODULE has
+        # been set.
+        import django.conf
+
+        if django.conf.settings.configured:
+            setattr(django.conf.settings, setting_name, setting_value)
+
+
+def _get_reloadable_options_dereferenced(global_conf, local_conf):
+    # A missing "debug" option resets DEBUG to its default when it's
+    # hot-reloadable
+    if 'debug' in global_conf:
+        local_conf = dict(local_conf, DEBUG=global_conf['debug'])
+    dereferenced_options = \
+        _get_option_values_dereferenced(global_conf, local_conf)
+    return dereferenced_options
+
+
+def _set_up_settings(
+    global_conf,
+    local_conf,
+    startup_recorder=NULL_STARTUP_RECORDER,
+    ):
     """
     Add the PasteDeploy options ``global_conf`` and ``local_conf`` to the
     Django settings module.
 
+    :return: The names of the settings stored in the Django settings module
+    :rtype: :class:`set`
+
     """
-    django_settings_module = \
-        _get_django_settings_module_from_global_conf(global_conf)
+    with startup_recorder.record_phase('settings_module_import'):
+        django_settings_module = \
+            _get_django_settings_module_from_global_conf(global_conf)
+
+    setting_merge_strategies = _get_setting_merge_strategies(global_conf)
 
     # apply all settings from ``[DEFAULT]`` section to django directly and first as otherwise
     # e.g. this won't work:
@@ -129,17 +555,107 @@ def _set_up_settings(global_conf, local_conf):
     # [DEFAULT]
     # STATIC_URL = "/static/"
     # VAR_ROOT = %(here)s/../../var
-    valid_names_re = re.compile("^[A-Z_]+$")
-    leftover_globals_to_apply_direct = {
-        l: v for l, v in global_conf.copy().iteritems()
-        if valid_names_re.match(l) and l not in local_conf
-    }
-    _store_django_settings(leftover_globals_to_apply_direct, django_settings_module)
+    with startup_recorder.record_phase('default_section'):
+        valid_names_re = re.compile("^[A-Z_]+$")
+        leftover_globals_to_apply_direct = {
+            l: v for l, v in global_conf.copy().iteritems()
+            if valid_names_re.match(l) and l not in local_conf
+        }
+        _store_django_settings(
+            leftover_globals_to_apply_direct,
+            django_settings_module,
+            setting_merge_strategies,
+            )
 
     _set_django_settings_module(django_settings_module)
 
-    options = resolve_local_conf_options(global_conf, local_conf)
-    _store_django_settings(options, django_settings_module)
+    options = _get_resolved_local_conf_options(
+        global_conf,
+        local_conf,
+        django_settings_module,
+        startup_recorder,
+        )
+
+    is_fork_friendly = \
+        asbool(global_conf.get('fork_friendly_settings', False))
+    if is_fork_friendly and not isinstance(options, LazilyResolvedOptions):
+        with startup_recorder.record_phase('compaction'):
+            options = compact_options(
+                options,
+                aslist(global_conf.get('mutable_settings', 'DATABASES')),
+                )
+
+    with startup_recorder.record_phase('storage'):
+        if isinstance(options, LazilyResolvedOptions):
+            _store_lazy_django_settings(
+                options,
+                django_settings_module,
+                setting_merge_strategies,
+                )
+        else:
+            _store_django_settings(
+                options,
+                django_settings_module,
+                setting_merge_strategies,
+                )
+
+    stored_setting_names = \
+        set(leftover_globals_to_apply_direct) | set(options)
+    return stored_setting_names
+
+
+def _get_resolved_local_conf_options(
+    global_conf,
+    local_conf,
+    django_settings_module,
+    startup_recorder=NULL_STARTUP_RECORDER,
+    ):
+    """
+    Return the result of :func:`resolve_local_conf_options`, reusing the one
+    cached next to the PasteDeploy configuration file if the ``settings_cache``
+    option is enabled and none of the input has changed.
+
+    Otherwise, the options are resolved lazily if the ``lazy_settings`` option
+    is enabled, in which case they can all be resolved upfront to catch errors
+    by enabling the ``validate_settings`` option.
+
+    """
+    config_file_path = global_conf.get('__file__')
+    is_cache_enabled = asbool(global_conf.get('settings_cache', False))
+    if not (is_cache_enabled and config_file_path):
+        is_lazy = asbool(global_conf.get('lazy_settings', False))
+        options = _resolve_local_conf_options(
+            global_conf,
+            local_conf,
+            is_lazy,
+            startup_recorder,
+            )
+        if is_lazy and asbool(global_conf.get('validate_settings', False)):
+            with startup_recorder.record_phase('validation'):
+                options.validate()
+        return options
+
+    with startup_recorder.record_phase('settings_cache_lookup'):
+        fingerprint = get_settings_cache_fingerprint(
+            global_conf,
+            local_conf,
+            django_settings_module,
+            )
+        options = load_cached_options(config_file_path, fingerprint)
+
+    if options is None:
+        options = _resolve_local_conf_options(
+            global_conf,
+            local_conf,
+            False,
+            startup_recorder,
+            )
+        with startup_recorder.record_phase('settings_cache_storage'):
+            store_cached_options(config_file_path, fingerprint, options)
+    else:
+        startup_recorder.count_options(len(options))
+
+    return options
 
 
 def _set_django_settings_module(django_settings_module):
@@ -167,24 +683,279 @@ def _get_module(module_qualified_name):
     return module
 
 
-def _store_django_settings(settings_dict, django_settings_module):
+def _get_setting_merge_strategies(global_conf):
+    raw_setting_merge_strategies = \
+        global_conf.get('settings_merge_strategies', '{}')
+    try:
+        setting_merge_strategies = parse_json(raw_setting_merge_strategies)
+    except ValueError:
+        raise InvalidSettingValueError(
+            'Could not decode value for option "settings_merge_strategies": '
+                '%r' % raw_setting_merge_strategies,
+            )
+
+    if not isinstance(setting_merge_strategies, dict):
+        raise InvalidSettingValueError(
+            'Option "settings_merge_strategies" must be a JSON object',
+            )
+
+    for setting_name, merge_strategy in setting_merge_strategies.items():
+        is_merge_strategy_known = isinstance(merge_strategy, basestring) and \
+            merge_strategy in _SETTING_MERGERS_BY_STRATEGY
+        if not is_merge_strategy_known:
+            raise InvalidSettingValueError(
+                'Unknown merge strategy %r for setting %r' % (
+                    merge_strategy,
+                    setting_name,
+                    ),
+                )
+
+    return setting_merge_strategies
+
+
+def _store_django_settings(
+    settings_dict,
+    django_settings_module,
+    setting_merge_strategies=None,
+    ):
+    setting_merge_strategies = setting_merge_strategies or {}
     for (setting_name, setting_value) in settings_dict.items():
         try:
             existing_setting_value = \
                 getattr(django_settings_module, setting_name)
         except AttributeError:
             setattr(django_settings_module, setting_name, setting_value)
+            continue
+
+        merge_strategy = setting_merge_strategies.get(setting_name)
+        if merge_strategy is not None:
+            merge_setting_values = \
+                _SETTING_MERGERS_BY_STRATEGY[merge_strategy]
+        elif isinstance(existing_setting_value, (tuple, list)):
+            merge_strategy = 'append'
+            # Unlike the explicit strategy, the default one accepts any
+            # iterable value, as it always has
+            merge_setting_values = _append_setting_values_unchecked
         else:
-            if isinstance(existing_setting_value, (tuple, list)):
-                new_tuple = tuple(existing_setting_value) + tuple(setting_value)
-                setattr(django_settings_module, setting_name, new_tuple)
-            else:
-                # The name is already used and it's not an iterable
-                _LOGGER.warn(
-                    '"%s" will not be overridden in %s',
-                    setting_name,
-                    django_settings_module.__name__,
-                    )
+            # The name is already used and it's not an iterable
+            _LOGGER.warn(
+                '"%s" will not be overridden in %s',
+                setting_name,
+                django_settings_module.__name__,
+                )
+            continue
+
+        new_setting_value = merge_setting_values(
+            setting_name,
+            existing_setting_value,
+            setting_value,
+            )
+        setattr(django_settings_module, setting_name, new_setting_value)
+        _LOGGER.debug(
+            '"%s" merged into %s with the "%s" strategy',
+            setting_name,
+            django_settings_module.__name__,
+            merge_strategy,
+            )
+
+
+def _append_setting_values(
+    setting_name,
+    existing_setting_value,
+    setting_value,
+    ):
+    _require_sequence_setting_values(
+        setting_name,
+        existing_setting_value,
+        setting_value,
+        )
+    return _append_setting_values_unchecked(
+        setting_name,
+        existing_setting_value,
+        setting_value,
+        )
+
+
+def _append_setting_values_unchecked(
+    setting_name,
+    existing_setting_value,
+    setting_value,
+    ):
+    # A string is appended character by character
+    return tuple(existing_setting_value) + tuple(setting_value)
+
+
+def _prepend_setting_values(
+    setting_name,
+    existing_setting_value,
+    setting_value,
+    ):
+    _require_sequence_setting_values(
+        setting_name,
+        existing_setting_value,
+        setting_value,
+        )
+    return tuple(setting_value) + tuple(existing_setting_value)
+
+
+def _append_setting_values_deduplicated(
+    setting_name,
+    existing_setting_value,
+    setting_value,
+    ):
+    """
+    Append ``setting_value`` to ``existing_setting_value``, keeping the first
+    occurrence of each item only.
+
+    """
+    _require_sequence_setting_values(
+        setting_name,
+        existing_setting_value,
+        setting_value,
+        )
+
+    merged_setting_value = []
+    hashable_items_seen = set()
+    # Unhashable items (e.g., dictionaries) can only be compared one by one
+    unhashable_items_seen = []
+    for item in chain(existing_setting_value, setting_value):
+        try:
+            is_item_duplicated = item in hashable_items_seen
+        except TypeError:
+            is_item_duplicated = item in unhashable_items_seen
+            if not is_item_duplicated:
+                unhashable_items_seen.append(item)
+        else:
+            if not is_item_duplicated:
+                hashable_items_seen.add(item)
+
+        if not is_item_duplicated:
+            merged_setting_value.append(item)
+
+    return tuple(merged_setting_value)
+
+
+def _merge_setting_values(setting_name, existing_setting_value, setting_value):
+    if not isinstance(existing_setting_value, dict) or \
+            not isinstance(setting_value, dict):
+        raise InvalidSettingValueError(
+            'Setting %r must be a dictionary to be merged' % setting_name,
+            )
+
+    return _merge_dicts(existing_setting_value, setting_value)
+
+
+def _merge_dicts(original_dict, overriding_dict):
+    merged_dict = dict(original_dict)
+    for key, overriding_value in overriding_dict.items():
+        original_value = merged_dict.get(key)
+        if isinstance(original_value, dict) and \
+                isinstance(overriding_value, dict):
+            merged_dict[key] = _merge_dicts(original_value, overriding_value)
+        else:
+            merged_dict[key] = overriding_value
+    return merged_dict
+
+
+def _replace_setting_value(
+    setting_name,
+    existing_setting_value,
+    setting_value,
+    ):
+    return setting_value
+
+
+def _require_sequence_setting_values(
+    setting_name,
+    existing_setting_value,
+    setting_value,
+    ):
+    are_values_sequences = \
+        isinstance(existing_setting_value, (tuple, list)) and \
+        isinstance(setting_value, (tuple, list))
+    if not are_values_sequences:
+        raise InvalidSettingValueError(
+            'Setting %r must be a list to be merged' % setting_name,
+            )
+
+
+_SETTING_MERGERS_BY_STRATEGY = {
+    'append': _append_setting_values,
+    'prepend': _prepend_setting_values,
+    'dedupe': _append_setting_values_deduplicated,
+    'merge': _merge_setting_values,
+    'replace': _replace_setting_value,
+    }
+
+
+def _store_lazy_django_settings(
+    lazy_options,
+    django_settings_module,
+    setting_merge_strategies=None,
+    ):
+    """
+    Store the options in ``lazy_options`` so that they are only resolved when
+    they are first requested from :data:`django.conf.settings`.
+
+    Options which are not Django settings, those which have to be merged with
+    the values in the settings module and those used by Django when the
+    settings are loaded are resolved and stored in the settings module
+    straightaway.
+
+    """
+    lazy_option_names = set()
+    eager_options = {}
+    for option_name in lazy_options:
+        is_option_eager = not option_name.isupper() or \
+            option_name in _EAGERLY_RESOLVED_DJANGO_SETTINGS or \
+            hasattr(django_settings_module, option_name)
+        if is_option_eager:
+            eager_options[option_name] = lazy_options[option_name]
+        else:
+            lazy_option_names.add(option_name)
+
+    _store_django_settings(
+        eager_options,
+        django_settings_module,
+        setting_merge_strategies,
+        )
+
+    # django.conf.Settings must only be imported after DJANGO_SETTINGS_MODULE
+    # has been set.
+    import django.conf
+
+    class LazilyResolvedDjangoSettings(django.conf.Settings):
+
+        def __init__(self, settings_module_name):
+            super(LazilyResolvedDjangoSettings, self).__init__(
+                settings_module_name,
+                )
+
+            # Prevent Django's defaults from hiding the lazy settings
+            for lazy_option_name in lazy_option_names:
+                self.__dict__.pop(lazy_option_name, None)
+
+            explicit_settings = self.__dict__.get('_explicit_settings')
+            if explicit_settings is not None:
+                explicit_settings.update(lazy_option_names)
+
+        def __getattr__(self, name):
+            if name not in lazy_option_names:
+                raise AttributeError(name)
+
+            setting_value = lazy_options[name]
+            setattr(self, name, setting_value)
+            return setting_value
+
+    django.conf.settings._wrapped = \
+        LazilyResolvedDjangoSettings(django_settings_module.__name__)
+
+
+# Django settings used by django.conf.Settings when the settings are loaded
+_EAGERLY_RESOLVED_DJANGO_SETTINGS = frozenset([
+    "SECRET_KEY",
+    "TIME_ZONE",
+    ])
 
 
 # Built-in Django settings not currently supported by this plugin
@@ -226,57 +997,255 @@ def _require_supported_options_only(local_conf):
 
 
 def _get_option_values_dereferenced(global_conf, local_conf):
+    option_reference_resolver = \
+        _OptionReferenceResolver(global_conf, local_conf)
     options = {}
-    for local_option_name, local_option_value in local_conf.items():
-        try:
-            local_option_value_dereferrenced = _OPTION_REFERENCE_REGEX.sub(
-                lambda match: _resolve_option_reference(match, global_conf),
-                local_option_value,
-                )
-        except _NonExistingReferencedOptionError, exc:
-            raise InvalidSettingValueError(
-                'Option "%s" references non-existing global option "%s"' % (
-                    local_option_name,
-                    exc,
-                    ),
-                )
+    for local_option_name in local_conf:
+        options[local_option_name] = \
+            option_reference_resolver.dereference(local_option_name)
+    return options
 
-        options[local_option_name] = local_option_value_dereferrenced
 
-    return options
+_GLOBAL_OPTION = 'global'
 
 
-def _resolve_option_reference(reference_match, options):
-    is_escaping = bool(reference_match.group('escape_character'))
-    if is_escaping:
-        replacement = reference_match.group(0)[1:]
-    else:
-        referenced_option_name = reference_match.group('referenced_option_name')
-        try:
-            referenced_option_value = options[referenced_option_name]
-        except KeyError:
-            raise _NonExistingReferencedOptionError(referenced_option_name)
-        replacement = referenced_option_value
+_LOCAL_OPTION = 'local'
 
-    return replacement
 
+class _OptionReferenceResolver(object):
+    """
+    Resolver of the references to global and local options in the values of
+    the local options.
 
-def _get_option_values_parsed(raw_options):
-    options = {}
-    for (option_name, option_value) in raw_options.items():
+    References in local options are resolved to the global option with that
+    name or else to the local option with that name, whilst references in
+    global options can only be resolved to other global options.
+
+    Each value is only tokenized and dereferenced once, so the cost of
+    dereferencing all the options is linear in the total size of the values.
+
+    """
+
+    def __init__(self, global_conf, local_conf):
+        super(_OptionReferenceResolver, self).__init__()
+
+        self._options_by_scope = {
+            _GLOBAL_OPTION: global_conf,
+            _LOCAL_OPTION: local_conf,
+            }
+        self._tokens_by_option = {}
+        self._dereferenced_values_by_option = {}
+
+    def dereference(self, local_option_name):
+        """
+        Return the value of the local option ``local_option_name`` with all
+        the references to other options (including indirect ones) resolved.
+
+        :raises InvalidSettingValueError: If there's a reference to a
+            non-existing option or a reference cycle
+
+        """
+        option = (_LOCAL_OPTION, local_option_name)
+        if option not in self._dereferenced_values_by_option:
+            self._dereference_option_graph(option)
+        return self._dereferenced_values_by_option[option]
+
+    def _dereference_option_graph(self, root_option):
+        """
+        Dereference ``root_option`` and the options it depends on, in
+        topological order.
+
+        The graph is traversed iteratively in depth-first order so that long
+        chains of references don't exhaust the stack.
+
+        """
+        options_being_dereferenced = [root_option]
+        options_being_dereferenced_set = set(options_being_dereferenced)
+        pending_dependencies_stack = [self._get_dependencies(root_option)]
+        while pending_dependencies_stack:
+            pending_dependencies = pending_dependencies_stack[-1]
+            for dependency in pending_dependencies:
+                if dependency in self._dereferenced_values_by_option:
+                    continue
+
+                if dependency in options_being_dereferenced_set:
+                    self._raise_reference_cycle_error(
+                        options_being_dereferenced,
+                        dependency,
+                        )
+
+                options_being_dereferenced.append(dependency)
+                options_being_dereferenced_set.add(dependency)
+                pending_dependencies_stack.append(
+                    self._get_dependencies(dependency),
+                    )
+                break
+            else:
+                option = options_being_dereferenced.pop()
+                options_being_dereferenced_set.remove(option)
+                pending_dependencies_stack.pop()
+                self._dereferenced_values_by_option[option] = \
+                    self._get_value_from_tokens(option)
+
+    def _get_dependencies(self, option):
+        option_name = option[1]
+        for is_reference, token in self._get_tokens(option):
+            if not is_reference:
+                continue
+
+            if token in self._options_by_scope[_GLOBAL_OPTION]:
+                dependency = (_GLOBAL_OPTION, token)
+            elif option[0] == _LOCAL_OPTION and \
+                    token in self._options_by_scope[_LOCAL_OPTION]:
+                dependency = (_LOCAL_OPTION, token)
+            else:
+                raise InvalidSettingValueError(
+                    'Option "%s" references non-existing option "%s"' % (
+                        option_name,
+                        token,
+                        ),
+                    )
+            yield dependency
+
+    def _get_tokens(self, option):
+        """
+        Return the literal strings and references in the value of ``option``,
+        as ``(is_reference, token)`` pairs.
+
+        """
         try:
-            decoded_option_value = parse_json(option_value)
-        except ValueError:
-            raise InvalidSettingValueError(
-                'Could not decode value for option %r: %r' % (
-                    option_name,
-                    option_value,
-                    ),
+            tokens = self._tokens_by_option[option]
+        except KeyError:
+            option_scope, option_name = option
+            option_value = self._options_by_scope[option_scope][option_name]
+            tokens = _tokenize_option_value(option_value)
+            self._tokens_by_option[option] = tokens
+        return tokens
+
+    def _get_value_from_tokens(self, option):
+        value_parts = []
+        dependencies = self._get_dependencies(option)
+        for is_reference, token in self._get_tokens(option):
+            if is_reference:
+                dependency = next(dependencies)
+                token = self._dereferenced_values_by_option[dependency]
+            value_parts.append(token)
+        return ''.join(value_parts)
+
+    @staticmethod
+    def _raise_reference_cycle_error(options_being_dereferenced, option):
+        cycle_start_index = options_being_dereferenced.index(option)
+        options_in_cycle = \
+            options_being_dereferenced[cycle_start_index:] + [option]
+        raise InvalidSettingValueError(
+            'Options reference each other in a cycle: %s' % ' -> '.join(
+                '"%s"' % option_name for _, option_name in options_in_cycle
+                ),
+            )
+
+
+def _tokenize_option_value(option_value):
+    tokens = []
+    literal_start_index = 0
+    for reference_match in _OPTION_REFERENCE_REGEX.finditer(option_value):
+        literal = option_value[literal_start_index:reference_match.start()]
+        tokens.append((False, literal))
+        if reference_match.group('escape_character'):
+            tokens.append((False, reference_match.group(0)[1:]))
+        else:
+            referenced_option_name = \
+                reference_match.group('referenced_option_name')
+            tokens.append((True, referenced_option_name))
+        literal_start_index = reference_match.end()
+    tokens.append((False, option_value[literal_start_index:]))
+    return tokens
+
+
+def _get_json_decoder(global_conf):
+    json_decoder_name = global_conf.get('json_decoder', 'json')
+
+    if json_decoder_name == 'auto':
+        json_decoder = parse_json
+        for json_decoder_module_name in _FAST_JSON_DECODER_MODULE_NAMES:
+            try:
+                json_decoder_module = _get_module(json_decoder_module_name)
+            except ImportError:
+                continue
+            json_decoder = json_decoder_module.loads
+            break
+    else:
+        json_decoder = _get_module(json_decoder_name).loads
+
+    return json_decoder
+
+
+def _get_option_values_parsed(
+    raw_options,
+    json_decoder=parse_json,
+    is_batched=False,
+    ):
+    options = None
+    if is_batched and raw_options:
+        options = _get_option_values_parsed_in_batch(raw_options, json_decoder)
+
+    if options is None:
+        options = {}
+        for (option_name, option_value) in raw_options.items():
+            options[option_name] = _get_option_value_parsed(
+                option_name,
+                option_value,
+                json_decoder,
                 )
-        options[option_name] = decoded_option_value
     return options
 
 
+def _get_option_values_parsed_in_batch(raw_options, json_decoder):
+    """
+    Decode all the ``raw_options`` with a single call to ``json_decoder``.
+
+    :return: The decoded options, or ``None`` if any of them is invalid
+
+    The values are decoded as a JSON array where they are separated by a
+    random string, so that a value which is not a JSON document on its own
+    (e.g., ``1, 2``) cannot be mistaken for a valid one.
+
+    """
+    option_names = list(raw_options)
+    sentinel = uuid4().hex
+    batch = '[%s]' % (', "%s", ' % sentinel).join(
+        raw_options[option_name] for option_name in option_names
+        )
+
+    try:
+        decoded_batch = json_decoder(batch)
+    except ValueError:
+        _LOGGER.debug('Decoding options one by one to find the invalid one')
+        return None
+
+    is_batch_valid = isinstance(decoded_batch, list) and \
+        len(decoded_batch) == len(option_names) * 2 - 1 and \
+        all(separator == sentinel for separator in decoded_batch[1::2])
+    if not is_batch_valid:
+        _LOGGER.debug('Decoding options one by one to find the invalid one')
+        return None
+
+    options = dict(zip(option_names, decoded_batch[::2]))
+    return options
+
+
+def _get_option_value_parsed(option_name, option_value, json_decoder):
+    try:
+        decoded_option_value = json_decoder(option_value)
+    except ValueError:
+        raise InvalidSettingValueError(
+            'Could not decode value for option %r: %r' % (
+                option_name,
+                option_value,
+                ),
+            )
+    return decoded_option_value
+
+
 #{ Exceptions
 
 
@@ -300,8 +1269,4 @@ class InvalidSettingValueError(SettingException):
     pass
 
 
-class _NonExistingReferencedOptionError(InvalidSettingValueError):
-    pass
-
-
 #}
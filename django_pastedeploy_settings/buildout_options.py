@@ -15,29 +15,72 @@
 ##############################################################################
 from deployrecipes import ConfvarsRecipe
 
+from django_pastedeploy_settings import \
+    _get_django_settings_module_from_global_conf
 from django_pastedeploy_settings import resolve_local_conf_options
+from django_pastedeploy_settings.settings_cache import \
+    get_settings_cache_fingerprint
+from django_pastedeploy_settings.settings_cache import load_cached_options
+from django_pastedeploy_settings.settings_cache import store_cached_options
 
 
 __all__ = ['DecodedConfvarsRecipe']
 
 
+_VARIABLES_CACHE_NAME = 'buildout-variables'
+
+
 class DecodedConfvarsRecipe(ConfvarsRecipe):
     """
     Recipe to make PasteDeploy-based Django settings available to Buildout.
 
     Each setting value must be converted from JSON to ASCII strings.
 
+    The variables are cached next to the PasteDeploy configuration file, and
+    reused as long as the configuration and the source code of the Django
+    settings module are unchanged.
+
     """
 
     @staticmethod
     def get_config_variables_from_app_config(app_config):
-        variables = resolve_local_conf_options(
-            app_config.global_conf,
-            app_config.local_conf,
-            )
+        global_conf = app_config.global_conf
+        local_conf = app_config.local_conf
 
-        variables_with_str_values = {}
-        for variable_name, variable_value in variables.items():
-            variables_with_str_values[variable_name] = str(variable_value)
+        config_file_path = global_conf.get('__file__')
+        if not config_file_path:
+            return _get_variables_with_str_values(global_conf, local_conf)
+
+        django_settings_module = \
+            _get_django_settings_module_from_global_conf(global_conf)
+        fingerprint = get_settings_cache_fingerprint(
+            global_conf,
+            local_conf,
+            django_settings_module,
+            )
+        variables_with_str_values = load_cached_options(
+            config_file_path,
+            fingerprint,
+            _VARIABLES_CACHE_NAME,
+            )
+        if variables_with_str_values is None:
+            variables_with_str_values = \
+                _get_variables_with_str_values(global_conf, local_conf)
+            store_cached_options(
+                config_file_path,
+                fingerprint,
+                variables_with_str_values,
+                _VARIABLES_CACHE_NAME,
+                )
 
         return variables_with_str_values
+
+
+def _get_variables_with_str_values(global_conf, local_conf):
+    variables = resolve_local_conf_options(global_conf, local_conf)
+
+    variables_with_str_values = {}
+    for variable_name, variable_value in variables.items():
+        variables_with_str_values[variable_name] = str(variable_value)
+
+    return variables_with_str_values
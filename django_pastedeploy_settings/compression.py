@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Compression of static files ahead of time, so that
+:class:`~django_pastedeploy_settings.static.StaticFilesApplication` can serve
+the compressed copies.
+
+"""
+from gzip import GzipFile
+from io import BytesIO
+from mimetypes import guess_type
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+from optparse import OptionParser
+import os
+import sys
+from tempfile import mkstemp
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django_pastedeploy_settings.static import \
+    _FILE_EXTENSIONS_BY_CONTENT_ENCODING
+
+
+__all__ = ['main', 'precompress_files', 'PrecompressionResult']
+
+
+_DEFAULT_MINIMUM_FILE_SIZE = 256
+
+# Marks the compressed copies which were not written because they were not
+# smaller than the original file, so that they're not tried again until the
+# file changes
+_INCOMPRESSIBLE_MARKER_FILE_EXTENSION = '.incompressible'
+
+_UP_TO_DATE = 'up-to-date'
+
+_INCOMPRESSIBLE = 'incompressible'
+
+_COMPRESSIBLE_CONTENT_TYPES = frozenset([
+    'application/javascript',
+    'application/json',
+    'application/x-javascript',
+    'application/xml',
+    'image/svg+xml',
+    'image/x-icon',
+    ])
+
+
+class PrecompressionResult(object):
+    """
+    Summary of the compression of the files in a directory.
+
+    """
+
+    def __init__(self):
+        super(PrecompressionResult, self).__init__()
+
+        #: The number of compressed copies written
+        self.compressed_file_count = 0
+        #: The number of compressed copies which were already up-to-date
+        self.up_to_date_file_count = 0
+        #: The number of compressed copies which were not written because
+        #: they were not smaller than the original file
+        self.incompressible_file_count = 0
+
+
+def precompress_files(
+    directory_path,
+    content_encodings=('gzip', ),
+    process_count=None,
+    minimum_file_size=_DEFAULT_MINIMUM_FILE_SIZE,
+    ):
+    """
+    Write a compressed copy of each compressible file in ``directory_path``
+    for each of the ``content_encodings``, using ``process_count`` processes.
+
+    :param process_count: The number of processes, which defaults to the
+        number of CPUs
+    :param minimum_file_size: The size in bytes of the smallest file to
+        compress
+    :rtype: :class:`PrecompressionResult`
+    :raises ValueError: If any of the ``content_encodings`` is unsupported
+
+    Compressed copies which are at least as recent as the original file are
+    left untouched, and those which would not be smaller than the original
+    file are not written. In the latter case, an empty file with the name of
+    the compressed copy and the ``.incompressible`` extension is written, so
+    the file is only compressed again once it changes.
+
+    """
+    for content_encoding in content_encodings:
+        if content_encoding not in _FILE_EXTENSIONS_BY_CONTENT_ENCODING:
+            raise ValueError(
+                'Unsupported content coding %r' % content_encoding,
+                )
+        if content_encoding == 'br' and brotli is None:
+            raise ValueError('The "brotli" library is required for "br"')
+
+    result = PrecompressionResult()
+
+    compression_tasks = []
+    for compression_task in _get_compression_tasks(
+        directory_path,
+        content_encodings,
+        minimum_file_size,
+        ):
+        if compression_task == _UP_TO_DATE:
+            result.up_to_date_file_count += 1
+        elif compression_task == _INCOMPRESSIBLE:
+            result.incompressible_file_count += 1
+        else:
+            compression_tasks.append(compression_task)
+
+    if not compression_tasks:
+        return result
+
+    process_pool = Pool(process_count or cpu_count())
+    try:
+        were_compressed_files_written = process_pool.imap_unordered(
+            _run_compression_task,
+            compression_tasks,
+            chunksize=16,
+            )
+        for was_compressed_file_written in were_compressed_files_written:
+            if was_compressed_file_written:
+                result.compressed_file_count += 1
+            else:
+                result.incompressible_file_count += 1
+        process_pool.close()
+    except BaseException:
+        process_pool.terminate()
+        raise
+    finally:
+        process_pool.join()
+
+    return result
+
+
+def _get_compression_tasks(
+    directory_path,
+    content_encodings,
+    minimum_file_size,
+    ):
+    """
+    Generate the description of the compressed copies to write, or whether
+    each of the rest is up-to-date or known to be incompressible.
+
+    """
+    compressed_file_extensions = \
+        tuple(_FILE_EXTENSIONS_BY_CONTENT_ENCODING.values()) + \
+        (_INCOMPRESSIBLE_MARKER_FILE_EXTENSION, )
+    for parent_directory_path, _, file_names in os.walk(directory_path):
+        for file_name in file_names:
+            if file_name.endswith(compressed_file_extensions):
+                continue
+
+            if not _is_file_compressible(file_name):
+                continue
+
+            file_path = os.path.join(parent_directory_path, file_name)
+            file_stat = os.stat(file_path)
+            if file_stat.st_size < minimum_file_size:
+                continue
+
+            for content_encoding in content_encodings:
+                compressed_file_path = file_path + \
+                    _FILE_EXTENSIONS_BY_CONTENT_ENCODING[content_encoding]
+                marker_file_path = compressed_file_path + \
+                    _INCOMPRESSIBLE_MARKER_FILE_EXTENSION
+                if _is_file_up_to_date(compressed_file_path, file_stat):
+                    yield _UP_TO_DATE
+                elif _is_file_up_to_date(marker_file_path, file_stat):
+                    yield _INCOMPRESSIBLE
+                else:
+                    yield (file_path, compressed_file_path, content_encoding)
+
+
+def _is_file_up_to_date(derived_file_path, original_file_stat):
+    try:
+        derived_file_mtime = os.stat(derived_file_path).st_mtime
+    except OSError:
+        return False
+    return original_file_stat.st_mtime <= derived_file_mtime
+
+
+def _is_file_compressible(file_name):
+    content_type, content_encoding = guess_type(file_name)
+    is_file_compressible = content_encoding is None and \
+        content_type is not None and (
+            content_type.startswith('text/') or
+            content_type in _COMPRESSIBLE_CONTENT_TYPES
+            )
+    return is_file_compressible
+
+
+def _run_compression_task(compression_task):
+    """
+    Write the compressed copy of a file as described by
+    ``compression_task``.
+
+    :return: Whether the compressed copy was written
+
+    """
+    file_path, compressed_file_path, content_encoding = compression_task
+    file_stat = os.stat(file_path)
+    with open(file_path, 'rb') as file_:
+        file_contents = file_.read()
+
+    if content_encoding == 'br':
+        compressed_file_contents = brotli.compress(file_contents)
+    else:
+        compressed_file_contents = \
+            _compress_with_gzip(file_contents, file_stat.st_mtime)
+
+    marker_file_path = \
+        compressed_file_path + _INCOMPRESSIBLE_MARKER_FILE_EXTENSION
+    if len(file_contents) <= len(compressed_file_contents):
+        # An out-of-date copy must not be served
+        if os.path.exists(compressed_file_path):
+            os.remove(compressed_file_path)
+        open(marker_file_path, 'w').close()
+        return False
+
+    temporary_file_descriptor, temporary_file_path = mkstemp(
+        prefix='.precompressed',
+        dir=os.path.dirname(compressed_file_path),
+        )
+    try:
+        with os.fdopen(temporary_file_descriptor, 'wb') as temporary_file:
+            temporary_file.write(compressed_file_contents)
+        os.chmod(temporary_file_path, file_stat.st_mode & 0o777)
+        os.rename(temporary_file_path, compressed_file_path)
+    except BaseException:
+        if os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
+        raise
+
+    if os.path.exists(marker_file_path):
+        os.remove(marker_file_path)
+
+    return True
+
+
+def _compress_with_gzip(file_contents, file_mtime):
+    compressed_file = BytesIO()
+    gzip_file = GzipFile(
+        filename='',
+        mode='wb',
+        compresslevel=9,
+        fileobj=compressed_file,
+        mtime=int(file_mtime),
+        )
+    try:
+        gzip_file.write(file_contents)
+    finally:
+        gzip_file.close()
+    return compressed_file.getvalue()
+
+
+def main(argv=None):
+    """
+    Compress the static files in the directory given in the command line.
+
+    """
+    parser = OptionParser(
+        usage='%prog [options] DIRECTORY',
+        description='Write compressed copies of the text files in DIRECTORY '
+            'for the Django media application to serve.',
+        )
+    parser.add_option(
+        '--encoding',
+        action='append',
+        choices=sorted(_FILE_EXTENSIONS_BY_CONTENT_ENCODING),
+        dest='content_encodings',
+        help='Content coding to use; can be used more than once '
+            '[default: gzip]',
+        )
+    parser.add_option(
+        '--processes',
+        default=None,
+        type='int',
+        dest='process_count',
+        help='Number of processes to use [default: number of CPUs]',
+        )
+    parser.add_option(
+        '--minimum-size',
+        default=_DEFAULT_MINIMUM_FILE_SIZE,
+        type='int',
+        dest='minimum_file_size',
+        help='Size in bytes of the smallest file to compress '
+            '[default: %default]',
+        )
+
+    options, arguments = parser.parse_args(argv)
+    if len(arguments) != 1:
+        parser.error('The directory is required')
+    directory_path = arguments[0]
+
+    try:
+        result = precompress_files(
+            directory_path,
+            options.content_encodings or ('gzip', ),
+            options.process_count,
+            options.minimum_file_size,
+            )
+    except ValueError as exc:
+        sys.stderr.write('%s\n' % exc)
+        return 1
+
+    sys.stdout.write(
+        '%s compressed, %s up-to-date, %s incompressible\n' % (
+            result.compressed_file_count,
+            result.up_to_date_file_count,
+            result.incompressible_file_count,
+            ),
+        )
+    return 0
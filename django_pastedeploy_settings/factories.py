@@ -18,19 +18,40 @@
 Miscellaneous PasteDeploy Application Factories.
 
 """
+import atexit
 from os import path
+import signal
 
+from paste.urlmap import parse_path_expression
 from paste.urlmap import URLMap
-from paste.urlparser import StaticURLParser
 from django import __file__ as django_init
 
+from django_pastedeploy_settings.latency import LatencyHistogramMiddleware
+from django_pastedeploy_settings.profiling import SampledProfilerMiddleware
+from django_pastedeploy_settings.response_cache import \
+    ResponseCacheMiddleware
+from django_pastedeploy_settings.static import StaticFilesApplication
+from django_pastedeploy_settings.urlmap import TrieURLMap
 
-__all__ = ("make_full_django_app", "add_media_to_app")
+
+__all__ = (
+    "make_full_django_app",
+    "add_media_to_app",
+    "make_latency_histogram_filter",
+    "make_sampled_profiler_filter",
+    "make_response_cache_filter",
+    )
 
 
 _DJANGO_ROOT = path.dirname(django_init)
 
 
+_URL_MAP_CLASSES_BY_DISPATCHER_NAME = {
+    'urlmap': URLMap,
+    'trie': TrieURLMap,
+    }
+
+
 def make_full_django_app(loader, global_conf, **local_conf):
     """
     Return a WSGI application made up of the Django application, its media and
@@ -38,18 +59,65 @@ def make_full_django_app(loader, global_conf, **local_conf):
     
     This is a PasteDeploy Composite Application Factory.
     
+    The in-memory cache for the media can be configured with the
+    ``media_cache_size`` and ``media_cache_maximum_file_size`` options, both in
+    bytes. Compressed copies of the media (e.g., ``style.css.gz``) are only
+    served if their content codings are set with the
+    ``media_precompressed_encodings`` option, separated by whitespace.
+    
+    Other applications can be mounted by using their path as the option name,
+    as with the ``urlmap`` factory from Paste. The ``url_dispatcher`` option
+    can be set to ``trie`` to dispatch the requests with
+    :class:`~django_pastedeploy_settings.urlmap.TrieURLMap` instead of
+    :class:`~paste.urlmap.URLMap`, which is faster with many applications.
+    
     """
     django_app = loader.get_app(local_conf['django_app'], global_conf=global_conf)
-    return add_media_to_app(django_app)
 
+    url_dispatcher_name = local_conf.get('url_dispatcher', 'urlmap')
+    try:
+        url_map_class = \
+            _URL_MAP_CLASSES_BY_DISPATCHER_NAME[url_dispatcher_name]
+    except KeyError:
+        raise ValueError('Unknown URL dispatcher %r' % url_dispatcher_name)
+    url_map = url_map_class()
+
+    for option_name, option_value in local_conf.items():
+        if option_name.startswith('/') or option_name.startswith('domain '):
+            mounted_app = loader.get_app(option_value, global_conf=global_conf)
+            url_map[parse_path_expression(option_name)] = mounted_app
 
-def add_media_to_app(django_app):
+    static_files_app_options = {}
+    if 'media_cache_size' in local_conf:
+        static_files_app_options['cache_size'] = \
+            int(local_conf['media_cache_size'])
+    if 'media_cache_maximum_file_size' in local_conf:
+        static_files_app_options['maximum_cached_file_size'] = \
+            int(local_conf['media_cache_maximum_file_size'])
+    if 'media_precompressed_encodings' in local_conf:
+        static_files_app_options['precompressed_encodings'] = \
+            local_conf['media_precompressed_encodings'].split()
+
+    return add_media_to_app(django_app, url_map, **static_files_app_options)
+
+
+def add_media_to_app(django_app, url_map=None, **static_files_app_options):
     """
     Return a WSGI application made up of the Django application, its media and
     the Django Admin media.
     
+    The applications are mounted on ``url_map``, which defaults to a new
+    :class:`~paste.urlmap.URLMap`.
+    
+    The media are served by
+    :class:`~django_pastedeploy_settings.static.StaticFilesApplication`, which
+    is initialized with ``static_files_app_options``.
+    
     """
-    app = URLMap()
+    if url_map is None:
+        app = URLMap()
+    else:
+        app = url_map
     app['/'] = django_app
     
     # The Django App has been loaded, so it's now safe to access the settings:
@@ -57,9 +125,177 @@ def add_media_to_app(django_app):
     
     # Setting up the Admin media:
     admin_media = path.join(_DJANGO_ROOT, "contrib", "admin", "media")
-    app[settings.ADMIN_MEDIA_PREFIX] = StaticURLParser(admin_media)
+    app[settings.ADMIN_MEDIA_PREFIX] = \
+        StaticFilesApplication(admin_media, **static_files_app_options)
     
     # Setting up the media for the Django application:
-    app[settings.MEDIA_URL] = StaticURLParser(settings.MEDIA_ROOT)
+    app[settings.MEDIA_URL] = StaticFilesApplication(
+        settings.MEDIA_ROOT,
+        **static_files_app_options
+        )
     
     return app
+
+
+def make_latency_histogram_filter(global_conf, **local_conf):
+    """
+    Return a filter which records the latency of the requests to the
+    application it wraps with
+    :class:`~django_pastedeploy_settings.latency.LatencyHistogramMiddleware`.
+    
+    This is a PasteDeploy Filter Factory.
+    
+    The latencies are grouped by the URL path prefixes in the
+    ``route_prefixes`` option, separated by whitespace. The percentiles are
+    served at the path in the ``stats_path`` option to the requests whose
+    ``X-Stats-Secret`` header is set to the ``stats_secret`` option, which is
+    then required. They are also logged when the process receives the signal
+    named in the ``dump_signal`` option (e.g., ``SIGUSR2``), before the
+    signal is passed on to the handler set previously, if any.
+    
+    """
+    route_prefixes = local_conf.get('route_prefixes', '').split()
+    stats_path = local_conf.get('stats_path') or None
+    stats_secret = local_conf.get('stats_secret') or None
+    if stats_path is not None and stats_secret is None:
+        raise ValueError(
+            'The "stats_secret" option is required with "stats_path"',
+            )
+    dump_signal_number = _get_dump_signal_number(local_conf)
+
+    def filter_(app):
+        latency_histogram_middleware = LatencyHistogramMiddleware(
+            app,
+            route_prefixes,
+            stats_path,
+            stats_secret,
+            )
+        if dump_signal_number is not None:
+            _add_signal_handler(
+                dump_signal_number,
+                latency_histogram_middleware.log_stats,
+                )
+        return latency_histogram_middleware
+
+    return filter_
+
+
+def make_sampled_profiler_filter(global_conf, **local_conf):
+    """
+    Return a filter which profiles a sample of the requests to the application
+    it wraps with
+    :class:`~django_pastedeploy_settings.profiling.SampledProfilerMiddleware`.
+    
+    This is a PasteDeploy Filter Factory.
+    
+    The statistics are written to the directory in the ``profile_directory``
+    option, which is required. One in every ``sampling_interval`` requests is
+    profiled (``1000`` by default), as well as those whose ``X-Profile``
+    header is set to the ``profile_secret`` option, if any. The statistics are
+    merged by the URL path prefixes in the ``route_prefixes`` option,
+    separated by whitespace, and written every ``profile_window`` seconds
+    (``60`` by default) and when the process exits.
+    
+    """
+    try:
+        profile_directory_path = local_conf['profile_directory']
+    except KeyError:
+        raise ValueError('The "profile_directory" option is required')
+
+    sampling_interval = int(local_conf.get('sampling_interval', 1000))
+    if sampling_interval < 1:
+        raise ValueError('The sampling interval must be a positive integer')
+
+    def filter_(app):
+        sampled_profiler_middleware = SampledProfilerMiddleware(
+            app,
+            profile_directory_path,
+            sampling_interval,
+            local_conf.get('profile_secret') or None,
+            local_conf.get('route_prefixes', '').split(),
+            float(local_conf.get('profile_window', 60)),
+            )
+        atexit.register(sampled_profiler_middleware.flush)
+        return sampled_profiler_middleware
+
+    return filter_
+
+
+def make_response_cache_filter(global_conf, **local_conf):
+    """
+    Return a filter which caches the responses to anonymous requests to the
+    application it wraps with
+    :class:`~django_pastedeploy_settings.response_cache.ResponseCacheMiddleware`.
+    
+    This is a PasteDeploy Filter Factory.
+    
+    The memory for the responses can be configured with the ``cache_size``
+    and ``maximum_response_size`` options, both in bytes. Requests with
+    cookies are passed on to the application, unless the
+    ``private_cookie_names`` option is set, in which case only the cookies
+    named in it (separated by whitespace) are taken into account. The
+    statistics are logged when the process receives the signal named in the
+    ``dump_signal`` option (e.g., ``SIGUSR2``), which may be shared with
+    other filters.
+    
+    """
+    response_cache_middleware_options = {}
+    if 'cache_size' in local_conf:
+        response_cache_middleware_options['cache_size'] = \
+            int(local_conf['cache_size'])
+    if 'maximum_response_size' in local_conf:
+        response_cache_middleware_options['maximum_response_size'] = \
+            int(local_conf['maximum_response_size'])
+    if 'private_cookie_names' in local_conf:
+        response_cache_middleware_options['private_cookie_names'] = \
+            local_conf['private_cookie_names'].split()
+
+    dump_signal_number = _get_dump_signal_number(local_conf)
+
+    def filter_(app):
+        response_cache_middleware = ResponseCacheMiddleware(
+            app,
+            **response_cache_middleware_options
+            )
+        if dump_signal_number is not None:
+            _add_signal_handler(
+                dump_signal_number,
+                response_cache_middleware.log_stats,
+                )
+        return response_cache_middleware
+
+    return filter_
+
+
+def _get_dump_signal_number(local_conf):
+    dump_signal_name = local_conf.get('dump_signal', '').upper()
+    if not dump_signal_name:
+        return None
+
+    # Signal names have no underscores, unlike SIG_IGN and SIG_DFL
+    is_signal_name_valid = dump_signal_name.startswith('SIG') and \
+        '_' not in dump_signal_name and \
+        hasattr(signal, dump_signal_name)
+    if not is_signal_name_valid:
+        raise ValueError('Unknown signal %r' % dump_signal_name)
+    return getattr(signal, dump_signal_name)
+
+
+def _add_signal_handler(signal_number, signal_handler):
+    """
+    Make ``signal_handler`` handle the signal ``signal_number``, followed by
+    the handler set previously, if any, so that several filters can share the
+    same signal.
+
+    """
+    previous_signal_handler = signal.getsignal(signal_number)
+    if callable(previous_signal_handler):
+        def chained_signal_handler(signal_number, frame):
+            try:
+                signal_handler(signal_number, frame)
+            finally:
+                previous_signal_handler(signal_number, frame)
+    else:
+        # SIG_DFL, SIG_IGN or a handler not set from Python
+        chained_signal_handler = signal_handler
+    signal.signal(signal_number, chained_signal_handler)
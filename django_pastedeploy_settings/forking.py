@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Preparation of the Django settings for servers which fork their worker
+processes after loading the application, so that the memory holding the
+settings remains shared by the workers.
+
+"""
+import gc
+from optparse import OptionParser
+import sys
+
+
+__all__ = [
+    'compact_options',
+    'freeze_loaded_objects',
+    'get_memory_usage',
+    'main',
+    'MemoryUsage',
+    ]
+
+
+_SHARED_MEMORY_FIELD_NAMES = frozenset(['Shared_Clean', 'Shared_Dirty'])
+
+_PRIVATE_MEMORY_FIELD_NAMES = frozenset(['Private_Clean', 'Private_Dirty'])
+
+
+def compact_options(options, mutable_option_names=()):
+    """
+    Return ``options`` with their values replaced by compact equivalents.
+
+    :param options: The resolved options
+    :type options: :class:`dict`
+    :param mutable_option_names: The names of the options to leave untouched
+        because their values are changed at runtime (e.g., ``DATABASES``)
+    :rtype: :class:`dict`
+
+    Lists are converted to tuples and byte strings are interned. Equal
+    tuples, strings and numbers are only kept once across all the options,
+    so fewer objects end up in memory. Dictionaries remain dictionaries,
+    because the garbage collector only stops tracking objects of the exact
+    :class:`dict` and :class:`tuple` types, but their keys and values are
+    compacted too.
+
+    """
+    canonical_values = {}
+    compact_options_ = {}
+    for option_name, option_value in options.items():
+        if option_name not in mutable_option_names:
+            option_value = _compact_value(option_value, canonical_values)
+        compact_options_[option_name] = option_value
+    return compact_options_
+
+
+def _compact_value(value, canonical_values):
+    if isinstance(value, (list, tuple)):
+        value = tuple(
+            _compact_value(item, canonical_values) for item in value
+            )
+        # The items are canonical already, so they can be told apart by
+        # identity, which also keeps True apart from 1.
+        canonical_value_key = (tuple, tuple(id(item) for item in value))
+    elif isinstance(value, dict):
+        # Dictionaries can still be changed, so they are never shared
+        return dict(
+            (
+                _compact_value(key, canonical_values),
+                _compact_value(item_value, canonical_values),
+                )
+            for key, item_value in value.items()
+            )
+    else:
+        if type(value) is str:
+            value = intern(value)
+        # Unicode strings (e.g., those decoded from JSON) cannot be interned,
+        # so equal ones are only shared across the options
+        canonical_value_key = (type(value), value)
+
+    return canonical_values.setdefault(canonical_value_key, value)
+
+
+def freeze_loaded_objects():
+    """
+    Keep the garbage collector from touching the objects loaded so far, so
+    that the memory holding them is not copied into each forked process.
+
+    Collections are run until the garbage collector stops tracking the tuples
+    and dictionaries which only contain strings, numbers and untracked
+    tuples. Each collection only untracks one level of nested tuples, and
+    the containers of dictionaries are never untracked.
+
+    """
+    tracked_object_count = None
+    while True:
+        gc.collect()
+        previous_tracked_object_count = tracked_object_count
+        tracked_object_count = len(gc.get_objects())
+        if previous_tracked_object_count is not None and \
+                previous_tracked_object_count <= tracked_object_count:
+            break
+
+
+class MemoryUsage(object):
+    """
+    Memory used by a process, as reported by Linux.
+
+    """
+
+    def __init__(self, shared_byte_count, private_byte_count):
+        super(MemoryUsage, self).__init__()
+
+        #: The number of bytes in memory pages shared with other processes
+        self.shared_byte_count = shared_byte_count
+        #: The number of bytes in memory pages used by this process only
+        self.private_byte_count = private_byte_count
+
+    def __repr__(self):
+        return '<MemoryUsage: %s bytes shared, %s bytes private>' % (
+            self.shared_byte_count,
+            self.private_byte_count,
+            )
+
+
+def get_memory_usage(process_id='self'):
+    """
+    Return the memory used by the process identified by ``process_id``,
+    which defaults to the current process.
+
+    :rtype: :class:`MemoryUsage`
+    :raises IOError: If the memory usage is unavailable (e.g., on systems
+        other than Linux)
+
+    """
+    memory_map_file_path = '/proc/%s/smaps' % process_id
+    shared_kilobyte_count = 0
+    private_kilobyte_count = 0
+    with open(memory_map_file_path) as memory_map_file:
+        for line in memory_map_file:
+            field_name, _, field_value = line.partition(':')
+            if field_name in _SHARED_MEMORY_FIELD_NAMES:
+                shared_kilobyte_count += int(field_value.split()[0])
+            elif field_name in _PRIVATE_MEMORY_FIELD_NAMES:
+                private_kilobyte_count += int(field_value.split()[0])
+
+    memory_usage = MemoryUsage(
+        shared_kilobyte_count * 1024,
+        private_kilobyte_count * 1024,
+        )
+    return memory_usage
+
+
+def main(argv=None):
+    """
+    Report the memory shared and used privately by each of the processes
+    given in the command line.
+
+    """
+    parser = OptionParser(
+        usage='%prog PID [PID ...]',
+        description='Report the memory shared with other processes and the '
+            'memory used privately by each of the processes (e.g., the '
+            'master and workers of a WSGI server).',
+        )
+
+    options, arguments = parser.parse_args(argv)
+    if not arguments:
+        parser.error('At least one process id is required')
+
+    sys.stdout.write('%10s %15s %15s\n' % ('PID', 'SHARED', 'PRIVATE'))
+    for process_id in arguments:
+        try:
+            memory_usage = get_memory_usage(process_id)
+        except (IOError, OSError) as exc:
+            sys.stderr.write('%s\n' % exc)
+            return 1
+
+        sys.stdout.write(
+            '%10s %15s %15s\n' % (
+                process_id,
+                memory_usage.shared_byte_count,
+                memory_usage.private_byte_count,
+                ),
+            )
+
+    return 0
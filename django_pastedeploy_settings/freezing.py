@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Compilation of PasteDeploy configuration files into static Django settings
+modules.
+
+"""
+from ast import literal_eval
+from optparse import OptionParser
+import os
+from py_compile import compile as compile_python_module
+import sys
+
+from paste.deploy.loadwsgi import appconfig
+
+from django_pastedeploy_settings import \
+    _get_django_settings_module_from_global_conf
+from django_pastedeploy_settings import _set_up_settings
+from django_pastedeploy_settings import InvalidSettingValueError
+from django_pastedeploy_settings import SettingException
+
+
+__all__ = ['freeze_django_settings', 'main']
+
+
+_FROZEN_SETTINGS_MODULE_TEMPLATE = '''\
+# -*- coding: utf-8 -*-
+"""
+Django settings frozen from the PasteDeploy configuration file %(config_file)s.
+
+This module was generated by "freeze-django-settings" and must not be edited.
+
+"""
+from %(django_settings_module)s import *
+
+
+%(settings)s
+'''
+
+
+def freeze_django_settings(global_conf, local_conf, output_file_path):
+    """
+    Write the Django settings resulting from the PasteDeploy options
+    ``global_conf`` and ``local_conf`` to the Python module at
+    ``output_file_path``, along with its bytecode.
+
+    :raises InvalidSettingValueError: If the final value of a setting cannot
+        be represented as a Python literal.
+
+    The generated module imports everything from the original settings module
+    and then sets the settings that were defined or extended by the
+    PasteDeploy configuration, so the original settings module must remain
+    importable.
+
+    Any exceptions raised by
+    :func:`~django_pastedeploy_settings.resolve_local_conf_options` are also
+    propagated.
+
+    """
+    # All the settings must end up in the settings module
+    global_conf = dict(global_conf, lazy_settings='false')
+
+    django_settings_module = \
+        _get_django_settings_module_from_global_conf(global_conf)
+    original_settings = dict(vars(django_settings_module))
+
+    stored_setting_names = _set_up_settings(global_conf, local_conf)
+
+    setting_definitions = []
+    for setting_name in sorted(stored_setting_names):
+        setting_value = getattr(django_settings_module, setting_name)
+        is_setting_unchanged = setting_name in original_settings and \
+            original_settings[setting_name] is setting_value
+        if not is_setting_unchanged:
+            setting_definition = '%s = %s' % (
+                setting_name,
+                _get_python_literal(setting_name, setting_value),
+                )
+            setting_definitions.append(setting_definition)
+
+    frozen_settings_module_source = _FROZEN_SETTINGS_MODULE_TEMPLATE % {
+        'config_file': global_conf.get('__file__'),
+        'django_settings_module': django_settings_module.__name__,
+        'settings': '\n'.join(setting_definitions),
+        }
+
+    with open(output_file_path, 'w') as output_file:
+        output_file.write(frozen_settings_module_source)
+    compile_python_module(output_file_path, doraise=True)
+
+
+def _get_python_literal(setting_name, setting_value):
+    python_literal = repr(setting_value)
+    try:
+        is_literal_equivalent = literal_eval(python_literal) == setting_value
+    except (ValueError, SyntaxError):
+        is_literal_equivalent = False
+
+    if not is_literal_equivalent:
+        raise InvalidSettingValueError(
+            'Setting %r cannot be frozen because its value cannot be '
+                'represented as a Python literal: %s' % (
+                    setting_name,
+                    python_literal,
+                    ),
+            )
+
+    return python_literal
+
+
+def main(argv=None):
+    """
+    Freeze the Django settings for the PasteDeploy application given in the
+    command line.
+
+    """
+    parser = OptionParser(
+        usage='%prog [options] CONFIG_URI OUTPUT_FILE',
+        description='Compile the Django settings for the application '
+            'described by the PasteDeploy configuration URI into a static '
+            'Python module.',
+        )
+    parser.add_option(
+        '--relative-to',
+        default=os.getcwd(),
+        dest='relative_to',
+        help='Directory against which relative configuration URIs are '
+            'resolved [default: current directory]',
+        )
+
+    options, arguments = parser.parse_args(argv)
+    if len(arguments) != 2:
+        parser.error('Both the configuration URI and output file are required')
+    config_uri, output_file_path = arguments
+
+    app_config = appconfig(config_uri, relative_to=options.relative_to)
+    try:
+        freeze_django_settings(
+            app_config.global_conf,
+            app_config.local_conf,
+            output_file_path,
+            )
+    except SettingException as exc:
+        sys.stderr.write('%s\n' % exc)
+        return 1
+
+    return 0
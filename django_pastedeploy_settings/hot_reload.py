@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Detection of changes to files by polling their status, for the hot reloading
+of the PasteDeploy configuration file.
+
+"""
+from logging import getLogger
+import os
+from threading import Event
+from threading import Thread
+
+
+__all__ = ['FileWatcher']
+
+
+_LOGGER = getLogger(__name__)
+
+
+class FileWatcher(object):
+    """
+    Poller of the status of the file at ``file_path``, which calls
+    ``callback`` without arguments whenever the file changes.
+
+    The modification time, size and inode of the file are compared, so no
+    extra dependencies are needed. Exceptions raised by ``callback`` are
+    logged instead of propagated.
+
+    """
+
+    def __init__(self, file_path, callback, poll_interval):
+        super(FileWatcher, self).__init__()
+
+        self.file_path = file_path
+        self.callback = callback
+        self.poll_interval = poll_interval
+
+        self._file_signature = _get_file_signature(file_path)
+        self._stop_event = Event()
+        self._thread = None
+
+    def check(self):
+        """
+        Call the callback if the file changed since it was last checked.
+
+        :return: Whether the file changed
+        :rtype: :class:`bool`
+
+        A missing file is ignored, since editors may replace the file instead
+        of writing to it.
+
+        """
+        file_signature = _get_file_signature(self.file_path)
+        has_file_changed = file_signature is not None and \
+            file_signature != self._file_signature
+        if has_file_changed:
+            self._file_signature = file_signature
+            try:
+                self.callback()
+            except Exception:
+                _LOGGER.exception(
+                    'Could not handle the change to %s',
+                    self.file_path,
+                    )
+        return has_file_changed
+
+    def start(self):
+        """
+        Check the file every ``poll_interval`` seconds in a daemon thread.
+
+        """
+        self._stop_event.clear()
+        self._thread = Thread(
+            target=self._poll,
+            name='FileWatcher(%s)' % self.file_path,
+            )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop checking the file and wait for the thread to finish.
+
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self.check()
+
+
+def _get_file_signature(file_path):
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (file_stat.st_mtime, file_stat.st_size, file_stat.st_ino)
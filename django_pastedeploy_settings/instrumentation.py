@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Instrumentation of the loading of Django applications.
+
+Listeners registered with :func:`add_startup_listener` receive a
+:class:`StartupReport` every time an application is loaded. Nothing is
+measured when there are no listeners.
+
+"""
+from logging import getLogger
+from time import time
+
+try:
+    from time import process_time as get_cpu_time
+except ImportError:
+    # Python 2
+    from time import clock as get_cpu_time
+
+
+__all__ = [
+    'add_startup_listener',
+    'log_startup_report',
+    'PhaseTiming',
+    'remove_startup_listener',
+    'StartupReport',
+    ]
+
+
+_LOGGER = getLogger(__name__)
+
+
+_STARTUP_LISTENERS = []
+
+
+def add_startup_listener(listener):
+    """
+    Call ``listener`` with the :class:`StartupReport` for every application
+    loaded from now on.
+
+    """
+    _STARTUP_LISTENERS.append(listener)
+
+
+def remove_startup_listener(listener):
+    """
+    Stop calling ``listener`` when applications are loaded.
+
+    :raises ValueError: If ``listener`` was not registered
+
+    """
+    _STARTUP_LISTENERS.remove(listener)
+
+
+def log_startup_report(startup_report):
+    """
+    Startup listener which logs ``startup_report``.
+
+    The report is also attached to the log record as a dictionary in its
+    ``startup_report`` attribute, for use by structured logging handlers.
+
+    """
+    _LOGGER.info(
+        'Application loaded in %.3fs: %s',
+        startup_report.wall_time,
+        ', '.join(
+            '%s=%.3fs' % (phase_timing.name, phase_timing.wall_time)
+            for phase_timing in startup_report.phase_timings
+            ),
+        extra={'startup_report': startup_report.as_dict()},
+        )
+
+
+class PhaseTiming(object):
+    """
+    Time spent in a phase of the loading of an application.
+
+    """
+
+    def __init__(self, name, wall_time, cpu_time):
+        super(PhaseTiming, self).__init__()
+
+        #: The name of the phase
+        self.name = name
+        #: The wall clock time in seconds
+        self.wall_time = wall_time
+        #: The processor time in seconds
+        self.cpu_time = cpu_time
+
+    def __repr__(self):
+        return '<PhaseTiming %s: %.6fs wall, %.6fs CPU>' % (
+            self.name,
+            self.wall_time,
+            self.cpu_time,
+            )
+
+
+class StartupReport(object):
+    """
+    Measurements taken whilst loading an application.
+
+    """
+
+    def __init__(self):
+        super(StartupReport, self).__init__()
+
+        #: :class:`PhaseTiming` instances in the order the phases ended
+        self.phase_timings = []
+        #: The number of options resolved
+        self.option_count = 0
+        #: The number of bytes decoded from JSON
+        self.decoded_byte_count = 0
+
+    @property
+    def wall_time(self):
+        """The wall clock time spent in all the phases, in seconds."""
+        return sum(
+            phase_timing.wall_time for phase_timing in self.phase_timings
+            )
+
+    @property
+    def cpu_time(self):
+        """The processor time spent in all the phases, in seconds."""
+        return sum(
+            phase_timing.cpu_time for phase_timing in self.phase_timings
+            )
+
+    def as_dict(self):
+        """
+        Return the report as a dictionary made up of built-in types only.
+
+        """
+        report_dict = {
+            'phases': [
+                {
+                    'name': phase_timing.name,
+                    'wall_time': phase_timing.wall_time,
+                    'cpu_time': phase_timing.cpu_time,
+                    }
+                for phase_timing in self.phase_timings
+                ],
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'option_count': self.option_count,
+            'decoded_byte_count': self.decoded_byte_count,
+            }
+        return report_dict
+
+
+def get_startup_recorder():
+    """
+    Return a recorder for the loading of an application, which does nothing
+    if there are no listeners.
+
+    """
+    if _STARTUP_LISTENERS:
+        startup_recorder = _StartupRecorder()
+    else:
+        startup_recorder = NULL_STARTUP_RECORDER
+    return startup_recorder
+
+
+class _StartupRecorder(object):
+
+    is_recording = True
+
+    def __init__(self):
+        super(_StartupRecorder, self).__init__()
+
+        self.report = StartupReport()
+
+    def record_phase(self, phase_name):
+        return _PhaseRecording(phase_name, self.report)
+
+    def count_options(self, option_count):
+        self.report.option_count += option_count
+
+    def count_decoded_bytes(self, decoded_byte_count):
+        self.report.decoded_byte_count += decoded_byte_count
+
+    def finish(self):
+        for listener in list(_STARTUP_LISTENERS):
+            try:
+                listener(self.report)
+            except Exception:
+                _LOGGER.exception(
+                    'Startup listener %r failed to process report',
+                    listener,
+                    )
+
+
+class _PhaseRecording(object):
+
+    def __init__(self, phase_name, report):
+        super(_PhaseRecording, self).__init__()
+
+        self._phase_name = phase_name
+        self._report = report
+        self._initial_wall_time = None
+        self._initial_cpu_time = None
+
+    def __enter__(self):
+        self._initial_wall_time = time()
+        self._initial_cpu_time = get_cpu_time()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        phase_timing = PhaseTiming(
+            self._phase_name,
+            time() - self._initial_wall_time,
+            get_cpu_time() - self._initial_cpu_time,
+            )
+        self._report.phase_timings.append(phase_timing)
+
+
+class _NullStartupRecorder(object):
+
+    is_recording = False
+
+    def record_phase(self, phase_name):
+        return _NULL_PHASE_RECORDING
+
+    def count_options(self, option_count):
+        pass
+
+    def count_decoded_bytes(self, decoded_byte_count):
+        pass
+
+    def finish(self):
+        pass
+
+
+class _NullPhaseRecording(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_PHASE_RECORDING = _NullPhaseRecording()
+
+
+NULL_STARTUP_RECORDER = _NullStartupRecorder()
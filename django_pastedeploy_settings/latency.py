@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Measurement of the latency of the requests to a WSGI application, in
+histograms whose size does not depend on the number of requests.
+
+"""
+from hmac import compare_digest
+from json import dumps as convert_to_json
+from logging import getLogger
+from threading import Lock
+from time import time
+
+
+__all__ = [
+    'LatencyHistogram',
+    'LatencyHistogramMiddleware',
+    'RoutePrefixMatcher',
+    ]
+
+
+_LOGGER = getLogger(__name__)
+
+
+_REPORTED_PERCENTILES = (50, 90, 99, 99.9)
+
+_UNMATCHED_ROUTE_PREFIX = '*'
+
+
+class LatencyHistogram(object):
+    """
+    Log-linear histogram of latencies in microseconds.
+
+    Latencies below ``2 ** precision_bits`` microseconds are counted exactly.
+    Above that, each power of two is split in ``2 ** precision_bits`` buckets
+    of the same width, so the relative error of the percentiles is at most
+    ``2 ** -precision_bits`` (about 6% by default). Latencies above
+    ``2 ** maximum_bits`` microseconds (about 19 hours by default) are
+    counted in the last bucket.
+
+    """
+
+    def __init__(self, precision_bits=4, maximum_bits=36):
+        super(LatencyHistogram, self).__init__()
+
+        self._precision_bits = precision_bits
+        self._sub_bucket_count = 2 ** precision_bits
+        self._maximum_latency = 2 ** maximum_bits - 1
+        self._counts = \
+            [0] * (self._get_bucket_index(self._maximum_latency) + 1)
+        self._lock = Lock()
+
+        #: The highest latency recorded, in microseconds
+        self.maximum = 0
+
+    @property
+    def count(self):
+        """The number of latencies recorded."""
+        return sum(self._counts)
+
+    def record(self, latency):
+        """
+        Count a ``latency`` of the given number of microseconds.
+
+        """
+        latency = int(latency)
+        if self._maximum_latency < latency:
+            latency = self._maximum_latency
+        bucket_index = self._get_bucket_index(latency)
+        with self._lock:
+            self._counts[bucket_index] += 1
+            if self.maximum < latency:
+                self.maximum = latency
+
+    def get_percentile(self, percentile):
+        """
+        Return the latency below which ``percentile`` percent of the
+        latencies recorded fall, in microseconds.
+
+        The highest latency in the bucket is returned, so the result is never
+        underestimated. ``0`` is returned if nothing was recorded.
+
+        """
+        counts = list(self._counts)
+        total_count = sum(counts)
+        if not total_count:
+            return 0
+
+        minimum_count = total_count * percentile / 100.0
+        cumulative_count = 0
+        for bucket_index, bucket_count in enumerate(counts):
+            cumulative_count += bucket_count
+            if bucket_count and minimum_count <= cumulative_count:
+                break
+        latency = min(self._get_bucket_maximum(bucket_index), self.maximum)
+        return latency
+
+    def _get_bucket_index(self, latency):
+        if latency < self._sub_bucket_count:
+            return latency
+        shift = latency.bit_length() - self._precision_bits - 1
+        # The quotient is between 2 ** precision_bits and its double, so the
+        # buckets for each shift follow those for the previous one
+        return (shift << self._precision_bits) + (latency >> shift)
+
+    def _get_bucket_maximum(self, bucket_index):
+        if bucket_index < self._sub_bucket_count:
+            return bucket_index
+        shift = (bucket_index >> self._precision_bits) - 1
+        quotient = bucket_index - (shift << self._precision_bits)
+        return ((quotient + 1) << shift) - 1
+
+
+class LatencyHistogramMiddleware(object):
+    """
+    WSGI middleware which records the latency of the requests to ``app`` in
+    a :class:`LatencyHistogram` per route prefix and status class (e.g.,
+    ``2xx``).
+
+    :param route_prefixes: The URL path prefixes by which the latencies are
+        grouped; the longest one matching applies, and requests matching none
+        are grouped under ``*``
+    :param stats_path: The URL path at which the percentiles are served as
+        JSON, if any
+    :param stats_secret: The value of the ``X-Stats-Secret`` header required
+        to get the percentiles from ``stats_path``, which must be set along
+        with it
+    :raises ValueError: If ``stats_path`` is set without ``stats_secret``
+
+    The latency is measured until the response is closed by the server, so it
+    includes the time taken to send the response. Responses wrapped with
+    ``wsgi.file_wrapper`` are passed to the server untouched, so their latency
+    is measured until ``app`` returns.
+
+    The client address is not checked, since behind a reverse proxy every
+    request would come from the local host.
+
+    """
+
+    def __init__(
+        self,
+        app,
+        route_prefixes=(),
+        stats_path=None,
+        stats_secret=None,
+        ):
+        super(LatencyHistogramMiddleware, self).__init__()
+
+        if stats_path is not None and not stats_secret:
+            raise ValueError(
+                'A secret is required to serve the statistics at %r' %
+                stats_path,
+                )
+
+        self.app = app
+        self.stats_path = stats_path
+        self.stats_secret = stats_secret
+
+        self._route_prefix_matcher = RoutePrefixMatcher(route_prefixes)
+        self._histograms = {}
+        self._histograms_lock = Lock()
+
+    def __call__(self, environ, start_response):
+        start_time = time()
+
+        path = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+        if path == self.stats_path:
+            return self._serve_stats(environ, start_response)
+
+        request_recording = \
+            _RequestRecording(self, path, start_response, start_time)
+        try:
+            app_iter = self.app(environ, request_recording.start_response)
+        except BaseException:
+            request_recording.status = '500'
+            request_recording.close()
+            raise
+
+        if type(app_iter) is environ.get('wsgi.file_wrapper'):
+            request_recording.close()
+            return app_iter
+
+        request_recording.app_iter = app_iter
+        return request_recording
+
+    def get_stats(self):
+        """
+        Return the number of requests, the maximum latency and the main
+        percentiles for each route prefix and status class.
+
+        :return: Dictionaries with the latencies in milliseconds, keyed by
+            route prefix and then by status class
+        :rtype: :class:`dict`
+
+        """
+        stats = {}
+        for (route_prefix, status_digit), histogram in \
+                self._histograms.items():
+            histogram_stats = {
+                'count': histogram.count,
+                'max': histogram.maximum / 1000.0,
+                }
+            for percentile in _REPORTED_PERCENTILES:
+                histogram_stats['p%s' % percentile] = \
+                    histogram.get_percentile(percentile) / 1000.0
+
+            status_class = status_digit + 'xx' if status_digit else 'unknown'
+            stats.setdefault(route_prefix, {})[status_class] = \
+                histogram_stats
+        return stats
+
+    def log_stats(self, *args):
+        """
+        Log the statistics returned by :meth:`get_stats`.
+
+        This can be used as a signal handler.
+
+        """
+        _LOGGER.info(
+            'Request latencies in milliseconds: %s',
+            convert_to_json(self.get_stats(), sort_keys=True),
+            )
+
+    def _record(self, path, status, start_time):
+        latency = (time() - start_time) * 1000000
+
+        route_prefix = self._route_prefix_matcher.match(path) or \
+            _UNMATCHED_ROUTE_PREFIX
+        histogram_key = (route_prefix, status[:1])
+        histogram = self._histograms.get(histogram_key)
+        if histogram is None:
+            with self._histograms_lock:
+                histogram = self._histograms.setdefault(
+                    histogram_key,
+                    LatencyHistogram(),
+                    )
+        histogram.record(latency)
+
+    def _serve_stats(self, environ, start_response):
+        stats_secret = environ.get('HTTP_X_STATS_SECRET')
+        if stats_secret is None or \
+                not compare_digest(stats_secret, self.stats_secret):
+            start_response('403 Forbidden', [('Content-Type', 'text/plain')])
+            return ['Forbidden']
+
+        body = convert_to_json(self.get_stats(), sort_keys=True)
+        start_response(
+            '200 OK',
+            [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(body))),
+                ('Cache-Control', 'no-cache'),
+                ],
+            )
+        return [body]
+
+
+class RoutePrefixMatcher(object):
+    """
+    Finder of the longest of ``route_prefixes`` which a URL path starts with.
+
+    Route prefixes only match whole path segments: ``/api`` matches ``/api``
+    and ``/api/users``, but not ``/apiary``.
+
+    The prefixes of the path are looked up by length, which is faster than
+    comparing the path with every route prefix.
+
+    """
+
+    def __init__(self, route_prefixes):
+        super(RoutePrefixMatcher, self).__init__()
+
+        self._route_prefixes = frozenset(route_prefixes)
+        self._route_prefix_lengths = sorted(
+            set(len(route_prefix) for route_prefix in self._route_prefixes),
+            reverse=True,
+            )
+
+    def match(self, path):
+        """
+        Return the longest route prefix which ``path`` starts with, or
+        ``None`` if there's none.
+
+        """
+        for route_prefix_length in self._route_prefix_lengths:
+            path_prefix = path[:route_prefix_length]
+            is_segment_boundary = len(path) <= route_prefix_length or \
+                path[route_prefix_length] == '/' or path_prefix.endswith('/')
+            if is_segment_boundary and path_prefix in self._route_prefixes:
+                return path_prefix
+        return None
+
+
+class _RequestRecording(object):
+    """
+    Response iterable which records the latency of the request when it's
+    closed.
+
+    """
+
+    __slots__ = (
+        'app_iter',
+        'status',
+        '_middleware',
+        '_path',
+        '_original_start_response',
+        '_start_time',
+        )
+
+    def __init__(self, middleware, path, start_response, start_time):
+        self.app_iter = ()
+        self.status = ''
+        self._middleware = middleware
+        self._path = path
+        self._original_start_response = start_response
+        self._start_time = start_time
+
+    def start_response(self, status, headers, exc_info=None):
+        self.status = status
+        return self._original_start_response(status, headers, exc_info)
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            self._middleware._record(self._path, self.status, self._start_time)
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Profiling of a sample of the requests to a WSGI application, whose statistics
+are merged by route prefix and written periodically for offline analysis
+with :mod:`pstats`.
+
+"""
+from cProfile import Profile
+from hmac import compare_digest
+from logging import getLogger
+import os
+from pstats import Stats
+import re
+from threading import Lock
+from time import strftime
+from time import time
+
+from django_pastedeploy_settings.latency import RoutePrefixMatcher
+
+
+__all__ = ['SampledProfilerMiddleware']
+
+
+_LOGGER = getLogger(__name__)
+
+
+_UNMATCHED_ROUTE_PREFIX_NAME = 'other'
+
+_NON_ALPHANUMERIC_CHARACTERS_REGEX = re.compile(r'[^A-Za-z0-9]+')
+
+
+class SampledProfilerMiddleware(object):
+    """
+    WSGI middleware which profiles one in every ``sampling_interval`` requests
+    to ``app`` with :mod:`cProfile`, as well as the requests whose
+    ``X-Profile`` header is set to ``secret``.
+
+    :param profile_directory_path: The directory where the statistics are
+        written
+    :param route_prefixes: The URL path prefixes by which the statistics are
+        merged; the longest one matching applies
+    :param window: The number of seconds over which the statistics are merged
+        before they're written
+    :raises ValueError: If two route prefixes have the same name, or if one
+        is named like the requests matching none (``other``)
+
+    The statistics for each route prefix are written to a file named after
+    the prefix, the end of the window and the process id (e.g.,
+    ``api_v2-20130102T030405-1234.pstats``) when a request is profiled after
+    the window ends, or when :meth:`flush` is called.
+
+    The windows don't overlap: When one ends, the statistics for all the
+    route prefixes are written and the next window starts with none.
+
+    Requests which are not profiled only cost a counter decrement, and a
+    header lookup if ``secret`` is set.
+
+    """
+
+    def __init__(
+        self,
+        app,
+        profile_directory_path,
+        sampling_interval=1000,
+        secret=None,
+        route_prefixes=(),
+        window=60,
+        ):
+        super(SampledProfilerMiddleware, self).__init__()
+
+        self.app = app
+        self.profile_directory_path = profile_directory_path
+        self.sampling_interval = sampling_interval
+        self.secret = secret
+        self.window = window
+
+        self._route_prefix_matcher = RoutePrefixMatcher(route_prefixes)
+        self._route_prefix_names = _get_route_prefix_names(route_prefixes)
+        self._remaining_request_count = sampling_interval
+        self._stats_by_route_prefix_name = {}
+        self._window_end_time = time() + window
+        self._stats_lock = Lock()
+
+    def __call__(self, environ, start_response):
+        self._remaining_request_count -= 1
+        is_request_sampled = self._remaining_request_count <= 0
+        if is_request_sampled:
+            self._remaining_request_count = self.sampling_interval
+        elif self.secret is None:
+            return self.app(environ, start_response)
+        else:
+            profile_header_value = environ.get('HTTP_X_PROFILE')
+            if profile_header_value is None or \
+                    not compare_digest(profile_header_value, self.secret):
+                return self.app(environ, start_response)
+
+        profiler = Profile()
+        path = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+        profiler.enable()
+        try:
+            app_iter = self.app(environ, start_response)
+        except BaseException:
+            profiler.disable()
+            self._add_profile(path, profiler)
+            raise
+        profiler.disable()
+
+        return _ProfiledAppIter(app_iter, profiler, self, path)
+
+    def flush(self):
+        """
+        Write the statistics collected so far and start a new window.
+
+        """
+        with self._stats_lock:
+            stats_by_route_prefix_name = self._stats_by_route_prefix_name
+            self._stats_by_route_prefix_name = {}
+            self._window_end_time = time() + self.window
+
+        window_end = strftime('%Y%m%dT%H%M%S')
+        for route_prefix_name, stats in stats_by_route_prefix_name.items():
+            profile_file_name = '%s-%s-%s.pstats' % (
+                route_prefix_name,
+                window_end,
+                os.getpid(),
+                )
+            profile_file_path = \
+                os.path.join(self.profile_directory_path, profile_file_name)
+            try:
+                stats.dump_stats(profile_file_path)
+            except (IOError, OSError) as exc:
+                _LOGGER.warning(
+                    'Could not write profile %s: %s',
+                    profile_file_path,
+                    exc,
+                    )
+            else:
+                _LOGGER.debug('Profile written to %s', profile_file_path)
+
+    def _add_profile(self, path, profiler):
+        route_prefix = self._route_prefix_matcher.match(path)
+        route_prefix_name = self._route_prefix_names.get(
+            route_prefix,
+            _UNMATCHED_ROUTE_PREFIX_NAME,
+            )
+
+        with self._stats_lock:
+            stats = self._stats_by_route_prefix_name.get(route_prefix_name)
+            if stats is None:
+                self._stats_by_route_prefix_name[route_prefix_name] = \
+                    Stats(profiler)
+            else:
+                stats.add(profiler)
+            is_window_over = self._window_end_time <= time()
+
+        if is_window_over:
+            self.flush()
+
+
+def _get_route_prefix_names(route_prefixes):
+    """
+    Return the name of each of the ``route_prefixes`` for the profile files.
+
+    :raises ValueError: If two route prefixes have the same name (e.g.,
+        ``/a-b`` and ``/a_b``), or if one is named like the requests matching
+        none
+
+    """
+    route_prefix_names = {}
+    route_prefixes_by_name = {_UNMATCHED_ROUTE_PREFIX_NAME: None}
+    for route_prefix in sorted(set(route_prefixes)):
+        route_prefix_name = \
+            _NON_ALPHANUMERIC_CHARACTERS_REGEX.sub('_', route_prefix)
+        route_prefix_name = route_prefix_name.strip('_') or 'root'
+
+        if route_prefix_name in route_prefixes_by_name:
+            other_route_prefix = route_prefixes_by_name[route_prefix_name]
+            if other_route_prefix is None:
+                raise ValueError(
+                    'Route prefix %r would be named like the requests '
+                    'matching no route prefix (%r)' % (
+                        route_prefix,
+                        route_prefix_name,
+                        ),
+                    )
+            raise ValueError(
+                'Route prefixes %r and %r would have the same name (%r)' % (
+                    other_route_prefix,
+                    route_prefix,
+                    route_prefix_name,
+                    ),
+                )
+
+        route_prefix_names[route_prefix] = route_prefix_name
+        route_prefixes_by_name[route_prefix_name] = route_prefix
+    return route_prefix_names
+
+
+class _ProfiledAppIter(object):
+    """
+    Response iterable which keeps profiling whilst the response is produced,
+    until it's closed.
+
+    """
+
+    def __init__(self, app_iter, profiler, middleware, path):
+        super(_ProfiledAppIter, self).__init__()
+
+        self._app_iter = app_iter
+        self._profiler = profiler
+        self._middleware = middleware
+        self._path = path
+
+    def __iter__(self):
+        app_iterator = iter(self._app_iter)
+        while True:
+            self._profiler.enable()
+            try:
+                chunk = next(app_iterator)
+            except StopIteration:
+                return
+            finally:
+                self._profiler.disable()
+            yield chunk
+
+    def close(self):
+        self._profiler.enable()
+        try:
+            if hasattr(self._app_iter, 'close'):
+                self._app_iter.close()
+        finally:
+            self._profiler.disable()
+            self._middleware._add_profile(self._path, self._profiler)
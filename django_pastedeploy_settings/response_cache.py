@@ -0,0 +1,571 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+In-process cache of the responses to anonymous requests, so that popular
+public pages are served without calling the application.
+
+"""
+from collections import OrderedDict
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
+from json import dumps as convert_to_json
+from logging import getLogger
+from threading import Lock
+from time import time
+
+
+__all__ = ['ResponseCacheMiddleware']
+
+
+_LOGGER = getLogger(__name__)
+
+
+_DEFAULT_CACHE_SIZE = 16 * 1024 * 1024
+
+_DEFAULT_MAXIMUM_RESPONSE_SIZE = 256 * 1024
+
+_CACHEABLE_HTTP_METHODS = ('GET', 'HEAD')
+
+_UNCACHEABLE_CACHE_CONTROL_DIRECTIVES = \
+    frozenset(['private', 'no-cache', 'no-store'])
+
+# The headers of a cached response which are also sent when it's not modified
+_NOT_MODIFIED_HEADER_NAMES = frozenset([
+    'cache-control',
+    'content-location',
+    'date',
+    'etag',
+    'expires',
+    'last-modified',
+    'vary',
+    ])
+
+# The approximate memory used by each entry besides its strings
+_ENTRY_OVERHEAD_SIZE = 256
+
+
+class ResponseCacheMiddleware(object):
+    """
+    WSGI middleware which keeps the responses from ``app`` to anonymous
+    ``GET`` requests in memory, and serves them to subsequent ``GET`` and
+    ``HEAD`` requests until they expire.
+
+    :param cache_size: The maximum number of bytes kept in memory for all the
+        responses
+    :param maximum_response_size: The size in bytes of the largest response
+        kept in memory
+    :param private_cookie_names: The names of the cookies which make a request
+        personal (e.g., the session cookie), or ``None`` to treat every
+        request with cookies as personal
+
+    Requests are anonymous when they have no ``Authorization`` header and no
+    private cookies. Only ``200 OK`` responses without ``Set-Cookie`` are
+    kept, for as long as their ``s-maxage`` or ``max-age`` ``Cache-Control``
+    directive allows, unless the response is ``private``, ``no-cache`` or
+    ``no-store``.
+
+    Responses are looked up by URL scheme, host, path, query string and the
+    values of the request headers named in their ``Vary`` header. When the
+    cache is full, the least recently used responses are evicted.
+
+    Conditional requests served from the cache are answered with ``304 Not
+    Modified`` when the ``ETag`` or ``Last-Modified`` header of the cached
+    response satisfies their ``If-None-Match`` or ``If-Modified-Since``
+    header, respectively.
+
+    """
+
+    def __init__(
+        self,
+        app,
+        cache_size=_DEFAULT_CACHE_SIZE,
+        maximum_response_size=_DEFAULT_MAXIMUM_RESPONSE_SIZE,
+        private_cookie_names=None,
+        ):
+        super(ResponseCacheMiddleware, self).__init__()
+
+        self.app = app
+        self.maximum_response_size = min(maximum_response_size, cache_size)
+        if private_cookie_names is None:
+            self.private_cookie_names = None
+        else:
+            self.private_cookie_names = frozenset(private_cookie_names)
+
+        self._cache = _LRUCache(cache_size)
+
+    @property
+    def hit_count(self):
+        """The number of requests served from the cache."""
+        return self._cache.hit_count
+
+    @property
+    def miss_count(self):
+        """The number of cacheable requests passed on to ``app``."""
+        return self._cache.miss_count
+
+    @property
+    def eviction_count(self):
+        """The number of entries evicted to make room for others."""
+        return self._cache.eviction_count
+
+    def __call__(self, environ, start_response):
+        request_method = environ['REQUEST_METHOD']
+        if request_method not in _CACHEABLE_HTTP_METHODS or \
+                not self._is_request_anonymous(environ):
+            return self.app(environ, start_response)
+
+        resource_key = (
+            environ.get('wsgi.url_scheme', 'http'),
+            _get_request_host(environ),
+            environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', ''),
+            environ.get('QUERY_STRING', ''),
+            )
+        current_time = time()
+
+        vary_header_names = self._cache.get(resource_key, current_time)
+        if vary_header_names is not None:
+            response_key = \
+                _get_response_key(resource_key, vary_header_names, environ)
+            cached_response = self._cache.get(response_key, current_time)
+            if cached_response is not None:
+                self._cache.record_hit()
+                return cached_response.serve(
+                    environ,
+                    start_response,
+                    current_time,
+                    )
+
+        self._cache.record_miss()
+        if request_method == 'HEAD':
+            return self.app(environ, start_response)
+
+        response_recording = _ResponseRecording(
+            self,
+            resource_key,
+            environ,
+            start_response,
+            current_time,
+            )
+        app_iter = self.app(environ, response_recording.start_response)
+        if type(app_iter) is environ.get('wsgi.file_wrapper'):
+            return app_iter
+
+        response_recording.app_iter = app_iter
+        return response_recording
+
+    def get_stats(self):
+        """
+        Return the number of hits, misses and evictions, along with the
+        number of entries and bytes in the cache.
+
+        :rtype: :class:`dict`
+
+        """
+        stats = {
+            'hits': self._cache.hit_count,
+            'misses': self._cache.miss_count,
+            'evictions': self._cache.eviction_count,
+            'entries': len(self._cache),
+            'size': self._cache.size,
+            }
+        return stats
+
+    def log_stats(self, *args):
+        """
+        Log the statistics returned by :meth:`get_stats`.
+
+        This can be used as a signal handler.
+
+        """
+        _LOGGER.info(
+            'Response cache statistics: %s',
+            convert_to_json(self.get_stats(), sort_keys=True),
+            )
+
+    def _is_request_anonymous(self, environ):
+        if 'HTTP_AUTHORIZATION' in environ:
+            return False
+
+        cookie_header_value = environ.get('HTTP_COOKIE')
+        if not cookie_header_value:
+            return True
+        if self.private_cookie_names is None:
+            return False
+
+        for cookie in cookie_header_value.split(';'):
+            cookie_name = cookie.partition('=')[0].strip()
+            if cookie_name in self.private_cookie_names:
+                return False
+        return True
+
+    def _store(
+        self,
+        resource_key,
+        environ,
+        status,
+        headers,
+        body_chunks,
+        request_time,
+        ):
+        response_lifetime = _get_response_lifetime(status, headers)
+        if not response_lifetime:
+            return
+
+        vary_header_names = _get_vary_header_names(headers)
+        if vary_header_names is None:
+            return
+
+        expiry_time = request_time + response_lifetime
+        cached_response = _CachedResponse(
+            status,
+            headers,
+            body_chunks,
+            request_time,
+            )
+        response_key = \
+            _get_response_key(resource_key, vary_header_names, environ)
+        self._cache.set(
+            resource_key,
+            vary_header_names,
+            _get_strings_size(vary_header_names) + _ENTRY_OVERHEAD_SIZE,
+            expiry_time,
+            )
+        self._cache.set(
+            response_key,
+            cached_response,
+            cached_response.size,
+            expiry_time,
+            )
+
+
+class _ResponseRecording(object):
+    """
+    Response iterable which keeps a copy of the response and stores it in the
+    cache when it's closed, if it's cacheable and was sent in full.
+
+    """
+
+    __slots__ = (
+        'app_iter',
+        '_middleware',
+        '_resource_key',
+        '_environ',
+        '_original_start_response',
+        '_request_time',
+        '_status',
+        '_headers',
+        '_body_chunks',
+        '_body_size',
+        '_is_body_complete',
+        )
+
+    def __init__(
+        self,
+        middleware,
+        resource_key,
+        environ,
+        start_response,
+        request_time,
+        ):
+        self.app_iter = ()
+        self._middleware = middleware
+        self._resource_key = resource_key
+        self._environ = environ
+        self._original_start_response = start_response
+        self._request_time = request_time
+        self._status = None
+        self._headers = None
+        self._body_chunks = []
+        self._body_size = 0
+        self._is_body_complete = False
+
+    def start_response(self, status, headers, exc_info=None):
+        if exc_info is None:
+            self._status = status
+            self._headers = list(headers)
+        else:
+            self._status = None
+        original_write = \
+            self._original_start_response(status, headers, exc_info)
+
+        def write(data):
+            # Data written directly is not part of the copy of the response
+            self._status = None
+            return original_write(data)
+
+        return write
+
+    def __iter__(self):
+        maximum_response_size = self._middleware.maximum_response_size
+        for chunk in self.app_iter:
+            if self._body_chunks is not None:
+                self._body_size += len(chunk)
+                if maximum_response_size < self._body_size:
+                    self._body_chunks = None
+                else:
+                    self._body_chunks.append(chunk)
+            yield chunk
+        self._is_body_complete = True
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            if self._is_body_complete and self._status is not None and \
+                    self._body_chunks is not None:
+                self._middleware._store(
+                    self._resource_key,
+                    self._environ,
+                    self._status,
+                    self._headers,
+                    self._body_chunks,
+                    self._request_time,
+                    )
+
+
+class _CachedResponse(object):
+
+    __slots__ = (
+        'status',
+        'headers',
+        'body',
+        'size',
+        '_creation_time',
+        '_entity_tag',
+        '_modification_time',
+        )
+
+    def __init__(self, status, headers, body_chunks, creation_time):
+        self.status = status
+        self.headers = [
+            (header_name, header_value) for header_name, header_value in
+            headers if header_name.lower() != 'age'
+            ]
+        self.body = ''.join(body_chunks)
+        self.size = len(status) + len(self.body) + _ENTRY_OVERHEAD_SIZE + \
+            _get_strings_size(
+                header_string for header in self.headers
+                for header_string in header
+                )
+        self._creation_time = creation_time
+
+        self._entity_tag = None
+        self._modification_time = None
+        for header_name, header_value in self.headers:
+            header_name = header_name.lower()
+            if header_name == 'etag':
+                self._entity_tag = _get_weak_entity_tag(header_value)
+            elif header_name == 'last-modified':
+                self._modification_time = _parse_http_date(header_value)
+
+    def serve(self, environ, start_response, current_time):
+        age_header = ('Age', str(int(current_time - self._creation_time)))
+        if self._is_unmodified(environ):
+            response_headers = [
+                header for header in self.headers
+                if header[0].lower() in _NOT_MODIFIED_HEADER_NAMES
+                ]
+            start_response('304 Not Modified', response_headers + [age_header])
+            return []
+
+        start_response(self.status, self.headers + [age_header])
+        return [] if environ['REQUEST_METHOD'] == 'HEAD' else [self.body]
+
+    def _is_unmodified(self, environ):
+        if_none_match_header_value = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match_header_value is not None:
+            # If-Modified-Since must be ignored when If-None-Match is present
+            return self._entity_tag is not None and \
+                _does_entity_tag_match(
+                    if_none_match_header_value,
+                    self._entity_tag,
+                    )
+
+        if_modified_since_header_value = environ.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since_header_value is None or \
+                self._modification_time is None:
+            return False
+
+        if_modified_since = _parse_http_date(if_modified_since_header_value)
+        return if_modified_since is not None and \
+            self._modification_time <= if_modified_since
+
+
+class _LRUCache(object):
+    """
+    Thread-safe cache of entries which expire, bounded by the total size
+    given for the entries, along with the number of hits and misses recorded
+    by its users.
+
+    """
+
+    def __init__(self, maximum_size):
+        super(_LRUCache, self).__init__()
+
+        self.maximum_size = maximum_size
+        self.size = 0
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, entry_key, current_time):
+        with self._lock:
+            entry = self._entries.pop(entry_key, None)
+            if entry is None:
+                return None
+
+            entry_value, entry_size, expiry_time = entry
+            if expiry_time <= current_time:
+                self.size -= entry_size
+                return None
+
+            # Make it the most recently used entry
+            self._entries[entry_key] = entry
+        return entry_value
+
+    def set(self, entry_key, entry_value, entry_size, expiry_time):
+        if self.maximum_size < entry_size:
+            return
+
+        with self._lock:
+            old_entry = self._entries.pop(entry_key, None)
+            if old_entry is not None:
+                self.size -= old_entry[1]
+
+            while self.maximum_size < self.size + entry_size:
+                evicted_entry = self._entries.popitem(last=False)[1]
+                self.size -= evicted_entry[1]
+                self.eviction_count += 1
+
+            self._entries[entry_key] = (entry_value, entry_size, expiry_time)
+            self.size += entry_size
+
+    def record_hit(self):
+        with self._lock:
+            self.hit_count += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.miss_count += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _get_response_lifetime(status, headers):
+    if not status.startswith('200 '):
+        return 0
+
+    cache_control_directives = {}
+    age = 0
+    for header_name, header_value in headers:
+        header_name = header_name.lower()
+        if header_name == 'set-cookie':
+            return 0
+        elif header_name == 'cache-control':
+            for directive in header_value.split(','):
+                directive_name, _, directive_value = directive.partition('=')
+                directive_name = directive_name.strip().lower()
+                cache_control_directives[directive_name] = \
+                    directive_value.strip().strip('"')
+        elif header_name == 'age':
+            age = _parse_seconds(header_value)
+
+    if _UNCACHEABLE_CACHE_CONTROL_DIRECTIVES & set(cache_control_directives):
+        return 0
+
+    if 's-maxage' in cache_control_directives:
+        maximum_age = _parse_seconds(cache_control_directives['s-maxage'])
+    else:
+        maximum_age = _parse_seconds(cache_control_directives.get('max-age'))
+    return max(maximum_age - age, 0)
+
+
+def _get_vary_header_names(headers):
+    vary_header_names = set()
+    for header_name, header_value in headers:
+        if header_name.lower() != 'vary':
+            continue
+        for vary_header_name in header_value.split(','):
+            vary_header_name = vary_header_name.strip().upper()
+            if vary_header_name == '*':
+                return None
+            if vary_header_name:
+                vary_header_names.add(vary_header_name)
+
+    environ_keys = tuple(sorted(
+        'HTTP_' + vary_header_name.replace('-', '_')
+        for vary_header_name in vary_header_names
+        ))
+    return environ_keys
+
+
+def _get_request_host(environ):
+    host = environ.get('HTTP_HOST')
+    if not host:
+        host = '%s:%s' % (
+            environ.get('SERVER_NAME', ''),
+            environ.get('SERVER_PORT', ''),
+            )
+    return host.lower()
+
+
+def _get_response_key(resource_key, vary_header_names, environ):
+    vary_header_values = tuple(
+        environ.get(vary_header_name)
+        for vary_header_name in vary_header_names
+        )
+    return resource_key + (vary_header_values, )
+
+
+def _does_entity_tag_match(if_none_match_header_value, weak_entity_tag):
+    if if_none_match_header_value.strip() == '*':
+        return True
+
+    # Conditional GET requests use the weak comparison function
+    for requested_entity_tag in if_none_match_header_value.split(','):
+        if _get_weak_entity_tag(requested_entity_tag) == weak_entity_tag:
+            return True
+    return False
+
+
+def _get_weak_entity_tag(entity_tag):
+    entity_tag = entity_tag.strip()
+    if entity_tag.startswith('W/'):
+        entity_tag = entity_tag[2:]
+    return entity_tag
+
+
+def _parse_http_date(http_date):
+    parsed_http_date = parsedate_tz(http_date)
+    if parsed_http_date is None:
+        return None
+    return mktime_tz(parsed_http_date)
+
+
+def _get_strings_size(strings):
+    return sum(len(string) for string in strings)
+
+
+def _parse_seconds(seconds):
+    try:
+        return max(int(seconds), 0)
+    except (TypeError, ValueError):
+        return 0
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+On-disk cache for the options resolved from a PasteDeploy configuration file.
+
+The cache is stored next to the configuration file and is only valid for the
+exact same input: The raw options, the modification time of the configuration
+file and the source code of the Django settings module.
+
+"""
+from hashlib import sha1
+from logging import getLogger
+import os
+from tempfile import mkstemp
+
+try:
+    from cPickle import dumps as pickle
+    from cPickle import HIGHEST_PROTOCOL
+    from cPickle import loads as unpickle
+except ImportError:
+    from pickle import dumps as pickle
+    from pickle import HIGHEST_PROTOCOL
+    from pickle import loads as unpickle
+
+
+__all__ = [
+    'get_settings_cache_fingerprint',
+    'get_settings_cache_file_path',
+    'load_cached_options',
+    'store_cached_options',
+    ]
+
+
+_LOGGER = getLogger(__name__)
+
+
+# Must be changed whenever the way options are resolved changes, so that
+# caches created by previous versions are not reused.
+_CACHE_FORMAT_VERSION = '2'
+
+_DEFAULT_CACHE_NAME = 'settings-cache'
+
+
+def get_settings_cache_file_path(
+    config_file_path,
+    cache_name=_DEFAULT_CACHE_NAME,
+    ):
+    """
+    Return the path to the cache file for the PasteDeploy configuration file
+    at ``config_file_path``.
+
+    :param cache_name: The suffix of the cache file name, so that different
+        views of the same options can be cached separately
+
+    """
+    config_directory_path, config_file_name = os.path.split(config_file_path)
+    cache_file_name = '.%s.%s' % (config_file_name, cache_name)
+    return os.path.join(config_directory_path, cache_file_name)
+
+
+def get_settings_cache_fingerprint(
+    global_conf,
+    local_conf,
+    django_settings_module,
+    ):
+    """
+    Return the hash of all the input used to resolve ``local_conf``.
+
+    """
+    fingerprint = sha1(_CACHE_FORMAT_VERSION)
+    fingerprint.update(repr(sorted(global_conf.items())))
+    fingerprint.update(repr(sorted(local_conf.items())))
+
+    config_file_path = global_conf.get('__file__')
+    if config_file_path:
+        fingerprint.update(repr(os.stat(config_file_path).st_mtime))
+
+    fingerprint.update(_get_module_source(django_settings_module))
+
+    return fingerprint.hexdigest()
+
+
+def load_cached_options(
+    config_file_path,
+    fingerprint,
+    cache_name=_DEFAULT_CACHE_NAME,
+    ):
+    """
+    Return the options cached for ``config_file_path`` if they were resolved
+    from the input identified by ``fingerprint``, or ``None`` otherwise.
+
+    """
+    cache_file_path = \
+        get_settings_cache_file_path(config_file_path, cache_name)
+    try:
+        with open(cache_file_path, 'rb') as cache_file:
+            serialized_cache_entry = cache_file.read()
+    except IOError:
+        return None
+
+    try:
+        cached_fingerprint, cached_options = unpickle(serialized_cache_entry)
+    except Exception as exc:
+        # Unpickling a corrupted file can raise pretty much anything
+        _LOGGER.warning(
+            'Ignoring corrupted settings cache %s: %s',
+            cache_file_path,
+            exc,
+            )
+        return None
+
+    if cached_fingerprint != fingerprint:
+        _LOGGER.debug('Settings cache %s is out-of-date', cache_file_path)
+        return None
+
+    _LOGGER.debug('Using settings cache %s', cache_file_path)
+    return cached_options
+
+
+def store_cached_options(
+    config_file_path,
+    fingerprint,
+    options,
+    cache_name=_DEFAULT_CACHE_NAME,
+    ):
+    """
+    Cache ``options`` for ``config_file_path`` under ``fingerprint``.
+
+    The cache file is replaced atomically, so concurrent processes never read
+    an incomplete cache. Failing to write the cache is not fatal.
+
+    """
+    cache_file_path = \
+        get_settings_cache_file_path(config_file_path, cache_name)
+    cache_directory_path = os.path.dirname(cache_file_path)
+    serialized_cache_entry = pickle((fingerprint, options), HIGHEST_PROTOCOL)
+
+    try:
+        temporary_file_descriptor, temporary_file_path = mkstemp(
+            prefix='.settings-cache',
+            dir=cache_directory_path,
+            )
+    except OSError as exc:
+        _LOGGER.warning(
+            'Could not write settings cache %s: %s',
+            cache_file_path,
+            exc,
+            )
+        return
+
+    try:
+        with os.fdopen(temporary_file_descriptor, 'wb') as temporary_file:
+            temporary_file.write(serialized_cache_entry)
+        os.rename(temporary_file_path, cache_file_path)
+    except (IOError, OSError) as exc:
+        _LOGGER.warning(
+            'Could not write settings cache %s: %s',
+            cache_file_path,
+            exc,
+            )
+        if os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
+
+
+def _get_module_source(module):
+    module_file_path = getattr(module, '__file__', None)
+    if not module_file_path:
+        return ''
+
+    module_source_file_path = os.path.splitext(module_file_path)[0] + '.py'
+    if not os.path.exists(module_source_file_path):
+        module_source_file_path = module_file_path
+
+    with open(module_source_file_path, 'rb') as module_source_file:
+        module_source = module_source_file.read()
+    return module_source
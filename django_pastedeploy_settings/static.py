@@ -0,0 +1,636 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+WSGI application to serve static files, such as the Django media.
+
+"""
+from collections import OrderedDict
+from email.utils import formatdate
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
+from mimetypes import guess_type
+from mmap import ACCESS_READ
+from mmap import mmap
+import os
+import stat
+from threading import Lock
+from uuid import uuid4
+
+from paste import httpexceptions
+from paste.request import construct_url
+
+
+__all__ = ['StaticFilesApplication']
+
+
+_DEFAULT_CACHE_SIZE = 16 * 1024 * 1024
+
+_DEFAULT_MAXIMUM_CACHED_FILE_SIZE = 256 * 1024
+
+_CHUNK_SIZE = 64 * 1024
+
+_SAFE_HTTP_METHODS = ('GET', 'HEAD')
+
+_INDEX_FILE_NAME = 'index.html'
+
+_FILE_EXTENSIONS_BY_CONTENT_ENCODING = {
+    'br': '.br',
+    'gzip': '.gz',
+    }
+
+# Requests with more ranges than this are answered with the whole file, as
+# they're likely to cost more than that.
+_MAXIMUM_BYTE_RANGE_COUNT = 64
+
+
+class StaticFilesApplication(object):
+    """
+    WSGI application which serves the files in ``directory_path``.
+
+    :param cache_size: The maximum number of bytes kept in memory for all the
+        files served
+    :param maximum_cached_file_size: The size in bytes of the largest file
+        kept in memory
+    :param precompressed_encodings: The content codings (``gzip`` and/or
+        ``br``) of the compressed copies of the files to serve, in order of
+        preference; none by default
+
+    The contents of the files served most recently are kept in memory, and
+    they're only read again from disk when their modification time or size
+    changes.
+
+    Responses include strong ``ETag`` and ``Last-Modified`` headers, and
+    conditional requests with ``If-None-Match`` or ``If-Modified-Since`` are
+    answered with ``304 Not Modified`` when the file is unchanged.
+
+    Single and multiple byte ranges are supported, including ``If-Range``.
+    Larger files are passed to ``wsgi.file_wrapper`` when the server provides
+    it (so it can use ``sendfile()``, for example), or are otherwise read
+    from a memory map of the file.
+
+    When a client accepts one of the ``precompressed_encodings``, the
+    compressed copy of the file with the corresponding extension (e.g.,
+    ``style.css.gz`` for ``style.css``) is served instead, as long as it's not
+    older than the file itself.
+
+    """
+
+    def __init__(
+        self,
+        directory_path,
+        cache_size=_DEFAULT_CACHE_SIZE,
+        maximum_cached_file_size=_DEFAULT_MAXIMUM_CACHED_FILE_SIZE,
+        precompressed_encodings=(),
+        ):
+        super(StaticFilesApplication, self).__init__()
+
+        for content_encoding in precompressed_encodings:
+            if content_encoding not in _FILE_EXTENSIONS_BY_CONTENT_ENCODING:
+                raise ValueError(
+                    'Unsupported content coding %r' % content_encoding,
+                    )
+        self.precompressed_encodings = tuple(precompressed_encodings)
+
+        self.directory_path = os.path.abspath(directory_path)
+        self.maximum_cached_file_size = \
+            min(maximum_cached_file_size, cache_size)
+        self._file_contents_cache = _LRUCache(cache_size)
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] not in _SAFE_HTTP_METHODS:
+            exception = httpexceptions.HTTPMethodNotAllowed(
+                headers=[('Allow', ', '.join(_SAFE_HTTP_METHODS))],
+                )
+            return exception.wsgi_application(environ, start_response)
+
+        path_info = environ.get('PATH_INFO', '')
+        file_path = self._get_file_path(path_info)
+        if file_path is None:
+            return _respond_not_found(environ, start_response)
+
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return _respond_not_found(environ, start_response)
+
+        if stat.S_ISDIR(file_stat.st_mode):
+            if path_info.endswith('/'):
+                file_path = os.path.join(file_path, _INDEX_FILE_NAME)
+                try:
+                    file_stat = os.stat(file_path)
+                except OSError:
+                    return _respond_not_found(environ, start_response)
+            else:
+                return _redirect_to_directory(environ, start_response)
+
+        if not stat.S_ISREG(file_stat.st_mode):
+            return _respond_not_found(environ, start_response)
+
+        content_type = _get_content_type(file_path)
+        modification_time = file_stat.st_mtime
+        file_path, file_stat, content_encoding = \
+            self._get_file_representation(environ, file_path, file_stat)
+        entity_tag = _get_entity_tag(file_stat, content_encoding)
+        last_modified = formatdate(modification_time, usegmt=True)
+
+        response_headers = [
+            ('ETag', entity_tag),
+            ('Last-Modified', last_modified),
+            ('Accept-Ranges', 'bytes'),
+            ]
+        if self.precompressed_encodings:
+            response_headers.append(('Vary', 'Accept-Encoding'))
+
+        if _is_file_unmodified(environ, entity_tag, modification_time):
+            start_response('304 Not Modified', response_headers)
+            return []
+
+        if content_encoding:
+            response_headers.append(('Content-Encoding', content_encoding))
+
+        byte_ranges = _get_requested_byte_ranges(
+            environ,
+            file_stat.st_size,
+            entity_tag,
+            last_modified,
+            )
+        if byte_ranges is None:
+            status = '200 OK'
+            response_headers.append(('Content-Type', content_type))
+            response_body_segments = [(0, file_stat.st_size)]
+        elif not byte_ranges:
+            return _respond_range_not_satisfiable(
+                environ,
+                start_response,
+                file_stat,
+                )
+        elif len(byte_ranges) == 1:
+            status = '206 Partial Content'
+            first_byte_position, last_byte_position = byte_ranges[0]
+            response_headers.extend([
+                ('Content-Type', content_type),
+                (
+                    'Content-Range',
+                    _get_content_range(byte_ranges[0], file_stat.st_size),
+                    ),
+                ])
+            response_body_segments = \
+                [(first_byte_position, last_byte_position + 1)]
+        else:
+            status = '206 Partial Content'
+            boundary = uuid4().hex
+            response_headers.append(
+                (
+                    'Content-Type',
+                    'multipart/byteranges; boundary=%s' % boundary,
+                    ),
+                )
+            response_body_segments = _get_multipart_body_segments(
+                byte_ranges,
+                boundary,
+                content_type,
+                file_stat.st_size,
+                )
+
+        response_body_length = sum(
+            _get_segment_length(segment) for segment in response_body_segments
+            )
+        response_headers.append(('Content-Length', str(response_body_length)))
+
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            start_response(status, response_headers)
+            return []
+
+        try:
+            response_body = self._get_response_body(
+                file_path,
+                file_stat,
+                response_body_segments,
+                environ,
+                )
+        except (IOError, OSError):
+            return _respond_not_found(environ, start_response)
+
+        start_response(status, response_headers)
+        return response_body
+
+    def _get_file_path(self, path_info):
+        # The operating system would reject the path, as no file name can
+        # contain NUL
+        if '\0' in path_info:
+            return None
+
+        relative_file_path = os.path.normpath(path_info.lstrip('/') or '.')
+        file_path = os.path.join(self.directory_path, relative_file_path)
+
+        is_file_path_within_directory = file_path == self.directory_path or \
+            file_path.startswith(self.directory_path + os.path.sep)
+        if not is_file_path_within_directory:
+            file_path = None
+        return file_path
+
+    def _get_file_representation(self, environ, file_path, file_stat):
+        """
+        Return the path to and status of the compressed copy of the file to
+        serve, along with its content coding, or those of the file itself if
+        there's none.
+
+        """
+        if self.precompressed_encodings:
+            accepted_content_encodings = \
+                _get_accepted_content_encodings(environ)
+        else:
+            accepted_content_encodings = ()
+
+        for content_encoding in self.precompressed_encodings:
+            if content_encoding not in accepted_content_encodings:
+                continue
+
+            compressed_file_extension = \
+                _FILE_EXTENSIONS_BY_CONTENT_ENCODING[content_encoding]
+            compressed_file_path = file_path + compressed_file_extension
+            try:
+                compressed_file_stat = os.stat(compressed_file_path)
+            except OSError:
+                continue
+
+            is_compressed_file_usable = \
+                stat.S_ISREG(compressed_file_stat.st_mode) and \
+                file_stat.st_mtime <= compressed_file_stat.st_mtime
+            if is_compressed_file_usable:
+                file_representation = (
+                    compressed_file_path,
+                    compressed_file_stat,
+                    content_encoding,
+                    )
+                return file_representation
+
+        return file_path, file_stat, None
+
+    def _get_response_body(
+        self,
+        file_path,
+        file_stat,
+        response_body_segments,
+        environ,
+        ):
+        if self.maximum_cached_file_size < file_stat.st_size:
+            file_ = open(file_path, 'rb')
+            is_whole_file_requested = \
+                response_body_segments == [(0, file_stat.st_size)]
+            if is_whole_file_requested and 'wsgi.file_wrapper' in environ:
+                response_body = \
+                    environ['wsgi.file_wrapper'](file_, _CHUNK_SIZE)
+            else:
+                response_body = \
+                    _FileSegmentsIterator(file_, response_body_segments)
+            return response_body
+
+        cache_key = (file_stat.st_mtime, file_stat.st_size)
+        file_contents = self._file_contents_cache.get(file_path, cache_key)
+        if file_contents is None:
+            with open(file_path, 'rb') as file_:
+                file_contents = file_.read()
+            self._file_contents_cache.set(file_path, cache_key, file_contents)
+
+        response_body = []
+        for segment in response_body_segments:
+            if isinstance(segment, str):
+                response_body.append(segment)
+            else:
+                response_body.append(file_contents[segment[0]:segment[1]])
+        return response_body
+
+
+class _FileSegmentsIterator(object):
+    """
+    Iterator over the ``segments`` of a response body, where each segment is
+    either a string or the ``(start, stop)`` offsets of a slice of ``file_``.
+
+    The file is read in chunks from a memory map, so its contents are never
+    copied to Python objects more than one chunk at a time.
+
+    """
+
+    def __init__(self, file_, segments):
+        super(_FileSegmentsIterator, self).__init__()
+
+        self._file = file_
+        self._file_map = None
+        self._chunks = self._generate_chunks(segments)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return next(self._chunks)
+
+    __next__ = next
+
+    def close(self):
+        if self._file_map is not None:
+            self._file_map.close()
+        self._file.close()
+
+    def _generate_chunks(self, segments):
+        for segment in segments:
+            if isinstance(segment, str):
+                yield segment
+                continue
+
+            segment_start, segment_stop = segment
+            if segment_start == segment_stop:
+                continue
+
+            if self._file_map is None:
+                self._file_map = \
+                    mmap(self._file.fileno(), 0, access=ACCESS_READ)
+            chunk_starts = xrange(segment_start, segment_stop, _CHUNK_SIZE)
+            for chunk_start in chunk_starts:
+                chunk_stop = min(chunk_start + _CHUNK_SIZE, segment_stop)
+                yield self._file_map[chunk_start:chunk_stop]
+
+
+class _LRUCache(object):
+    """
+    Thread-safe cache of strings, bounded by the total length of the strings.
+
+    Each entry is stored along with a key which must match when it's
+    retrieved, so out-of-date entries are never returned.
+
+    """
+
+    def __init__(self, maximum_size):
+        super(_LRUCache, self).__init__()
+
+        self.maximum_size = maximum_size
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, entry_name, entry_key):
+        with self._lock:
+            entry = self._entries.pop(entry_name, None)
+            if entry is None:
+                return None
+
+            if entry[0] != entry_key:
+                self.size -= len(entry[1])
+                return None
+
+            # Make it the most recently used entry
+            self._entries[entry_name] = entry
+        return entry[1]
+
+    def set(self, entry_name, entry_key, entry_value):
+        if self.maximum_size < len(entry_value):
+            return
+
+        with self._lock:
+            old_entry = self._entries.pop(entry_name, None)
+            if old_entry is not None:
+                self.size -= len(old_entry[1])
+
+            while self.maximum_size < self.size + len(entry_value):
+                evicted_entry = self._entries.popitem(last=False)[1]
+                self.size -= len(evicted_entry[1])
+
+            self._entries[entry_name] = (entry_key, entry_value)
+            self.size += len(entry_value)
+
+    def __contains__(self, entry_name):
+        return entry_name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _get_entity_tag(file_stat, content_encoding=None):
+    # The modification time is used with the highest precision available, so
+    # the tag changes whenever the contents may have changed
+    entity_tag = '%x-%x' % (
+        int(file_stat.st_mtime * 1000000),
+        file_stat.st_size,
+        )
+    if content_encoding:
+        entity_tag += '-' + content_encoding
+    return '"%s"' % entity_tag
+
+
+def _get_accepted_content_encodings(environ):
+    accepted_content_encodings = set()
+    rejected_content_encodings = set()
+    accept_encoding_header_value = environ.get('HTTP_ACCEPT_ENCODING', '')
+    for content_encoding_spec in accept_encoding_header_value.split(','):
+        content_encoding, _, parameters = content_encoding_spec.partition(';')
+        content_encoding = content_encoding.strip().lower()
+        if not content_encoding:
+            continue
+
+        quality = 1
+        parameter_name, _, parameter_value = parameters.partition('=')
+        if parameter_name.strip().lower() == 'q':
+            try:
+                quality = float(parameter_value)
+            except ValueError:
+                pass
+
+        if 0 < quality:
+            accepted_content_encodings.add(content_encoding)
+        else:
+            rejected_content_encodings.add(content_encoding)
+
+    if '*' in accepted_content_encodings:
+        accepted_content_encodings.update(
+            set(_FILE_EXTENSIONS_BY_CONTENT_ENCODING) -
+            rejected_content_encodings
+            )
+    return accepted_content_encodings
+
+
+def _is_file_unmodified(environ, entity_tag, modification_time):
+    if_none_match_header_value = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match_header_value is not None:
+        # If-Modified-Since must be ignored when If-None-Match is present
+        return _does_entity_tag_match(if_none_match_header_value, entity_tag)
+
+    if_modified_since_header_value = environ.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since_header_value is None:
+        return False
+
+    if_modified_since = parsedate_tz(if_modified_since_header_value)
+    if if_modified_since is None:
+        return False
+
+    return int(modification_time) <= mktime_tz(if_modified_since)
+
+
+def _does_entity_tag_match(if_none_match_header_value, entity_tag):
+    if if_none_match_header_value.strip() == '*':
+        return True
+
+    for requested_entity_tag in if_none_match_header_value.split(','):
+        requested_entity_tag = requested_entity_tag.strip()
+        # Conditional GET requests use the weak comparison function
+        if requested_entity_tag.startswith('W/'):
+            requested_entity_tag = requested_entity_tag[2:]
+        if requested_entity_tag == entity_tag:
+            return True
+    return False
+
+
+def _get_requested_byte_ranges(
+    environ,
+    file_size,
+    entity_tag,
+    last_modified,
+    ):
+    """
+    Return the byte ranges requested as ``(first, last)`` byte positions.
+
+    :return: ``None`` if the whole file must be served, or an empty list if
+        none of the requested ranges can be satisfied
+
+    """
+    range_header_value = environ.get('HTTP_RANGE')
+    if environ['REQUEST_METHOD'] != 'GET' or range_header_value is None:
+        return None
+
+    if_range_header_value = environ.get('HTTP_IF_RANGE')
+    if if_range_header_value is not None:
+        is_file_unchanged = \
+            if_range_header_value in (entity_tag, last_modified)
+        if not is_file_unchanged:
+            return None
+
+    byte_ranges = _parse_byte_ranges(range_header_value, file_size)
+    return byte_ranges
+
+
+def _parse_byte_ranges(range_header_value, file_size):
+    range_unit, _, range_specs = range_header_value.partition('=')
+    if range_unit.strip().lower() != 'bytes':
+        return None
+
+    range_specs = [
+        range_spec.strip()
+        for range_spec in range_specs.split(',') if range_spec.strip()
+        ]
+    if not range_specs or _MAXIMUM_BYTE_RANGE_COUNT < len(range_specs):
+        return None
+
+    byte_ranges = []
+    for range_spec in range_specs:
+        first_byte_position, separator, last_byte_position = \
+            range_spec.partition('-')
+        first_byte_position = first_byte_position.strip()
+        last_byte_position = last_byte_position.strip()
+        if not separator:
+            return None
+
+        if not first_byte_position:
+            # Suffix range, with the length of the suffix
+            if not last_byte_position.isdigit():
+                return None
+            suffix_length = int(last_byte_position)
+            if not suffix_length:
+                continue
+            first_byte_position = max(file_size - suffix_length, 0)
+            last_byte_position = file_size - 1
+        else:
+            if not first_byte_position.isdigit():
+                return None
+            first_byte_position = int(first_byte_position)
+
+            if not last_byte_position:
+                last_byte_position = file_size - 1
+            elif last_byte_position.isdigit():
+                last_byte_position = int(last_byte_position)
+                if last_byte_position < first_byte_position:
+                    return None
+                last_byte_position = min(last_byte_position, file_size - 1)
+            else:
+                return None
+
+        if first_byte_position < file_size:
+            byte_ranges.append((first_byte_position, last_byte_position))
+
+    return byte_ranges
+
+
+def _get_content_range(byte_range, file_size):
+    return 'bytes %s-%s/%s' % (byte_range[0], byte_range[1], file_size)
+
+
+def _get_multipart_body_segments(
+    byte_ranges,
+    boundary,
+    content_type,
+    file_size,
+    ):
+    segments = []
+    for byte_range in byte_ranges:
+        part_headers = \
+            '\r\n--%s\r\nContent-Type: %s\r\nContent-Range: %s\r\n\r\n' % (
+                boundary,
+                content_type,
+                _get_content_range(byte_range, file_size),
+                )
+        segments.append(part_headers)
+        segments.append((byte_range[0], byte_range[1] + 1))
+    segments.append('\r\n--%s--\r\n' % boundary)
+    return segments
+
+
+def _get_segment_length(segment):
+    if isinstance(segment, str):
+        segment_length = len(segment)
+    else:
+        segment_length = segment[1] - segment[0]
+    return segment_length
+
+
+def _get_content_type(file_path):
+    content_type, content_encoding = guess_type(file_path)
+    if content_type is None or content_encoding is not None:
+        content_type = 'application/octet-stream'
+    return content_type
+
+
+def _respond_not_found(environ, start_response):
+    exception = httpexceptions.HTTPNotFound(
+        'The resource at %s could not be found' % construct_url(environ),
+        )
+    return exception.wsgi_application(environ, start_response)
+
+
+def _respond_range_not_satisfiable(environ, start_response, file_stat):
+    exception = httpexceptions.HTTPRequestRangeNotSatisfiable(
+        headers=[('Content-Range', 'bytes */%s' % file_stat.st_size)],
+        )
+    return exception.wsgi_application(environ, start_response)
+
+
+def _redirect_to_directory(environ, start_response):
+    url = construct_url(environ, with_query_string=False) + '/'
+    if environ.get('QUERY_STRING'):
+        url += '?' + environ['QUERY_STRING']
+    exception = httpexceptions.HTTPMovedPermanently(
+        'The resource has moved to %s' % url,
+        headers=[('Location', url)],
+        )
+    return exception.wsgi_application(environ, start_response)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Dispatching of requests to WSGI applications by URL prefix.
+
+"""
+from paste.urlmap import URLMap
+
+
+__all__ = ['TrieURLMap']
+
+
+class TrieURLMap(URLMap):
+    """
+    Drop-in replacement for :class:`paste.urlmap.URLMap` whose dispatching
+    time depends on the number of segments in the path requested, instead of
+    the number of applications mounted.
+
+    The applications are matched exactly as with :class:`~paste.urlmap.URLMap`:
+    The longest URL prefix wins, and applications mounted on a domain take
+    precedence over those mounted on any domain.
+
+    """
+
+    def __init__(self, not_found_app=None):
+        URLMap.__init__(self, not_found_app)
+
+        self._root_nodes_by_domain = {}
+
+    def sort_apps(self):
+        # The order of the applications is irrelevant to the dispatching, so
+        # there's no need to sort them every time one is mounted
+        pass
+
+    def __setitem__(self, url, app):
+        URLMap.__setitem__(self, url, app)
+
+        if app is not None:
+            domain, app_url = self.normalize_url(url)
+            node = self._root_nodes_by_domain.setdefault(domain, _TrieNode())
+            for path_segment in _get_path_segments(app_url):
+                node = node.children.setdefault(path_segment, _TrieNode())
+            node.app = app
+            node.app_url = app_url
+
+    def __delitem__(self, url):
+        URLMap.__delitem__(self, url)
+
+        domain, app_url = self.normalize_url(url)
+        node = self._root_nodes_by_domain[domain]
+        for path_segment in _get_path_segments(app_url):
+            node = node.children[path_segment]
+        node.app = None
+        node.app_url = None
+
+    def __call__(self, environ, start_response):
+        host = environ.get('HTTP_HOST', environ.get('SERVER_NAME')).lower()
+        if ':' in host:
+            host, port = host.split(':', 1)
+        elif environ['wsgi.url_scheme'] == 'http':
+            port = '80'
+        else:
+            port = '443'
+
+        path_info = environ.get('PATH_INFO')
+        path_info = self.normalize_url(path_info, False)[1]
+
+        for domain in (host, host + ':' + port, None):
+            root_node = self._root_nodes_by_domain.get(domain)
+            if root_node is None:
+                continue
+
+            matching_node = _get_deepest_node_with_app(root_node, path_info)
+            if matching_node is not None:
+                environ['SCRIPT_NAME'] += matching_node.app_url
+                environ['PATH_INFO'] = \
+                    path_info[len(matching_node.app_url):]
+                return matching_node.app(environ, start_response)
+
+        environ['paste.urlmap_object'] = self
+        return self.not_found_application(environ, start_response)
+
+
+class _TrieNode(object):
+
+    __slots__ = ('children', 'app', 'app_url')
+
+    def __init__(self):
+        super(_TrieNode, self).__init__()
+
+        self.children = {}
+        self.app = None
+        self.app_url = None
+
+
+def _get_path_segments(url):
+    # The URL is either empty or starts with a slash
+    return url.split('/')[1:]
+
+
+def _get_deepest_node_with_app(root_node, path_info):
+    if path_info and not path_info.startswith('/'):
+        # Not even the root URL (i.e., the empty string) is a prefix
+        return None
+
+    deepest_node_with_app = root_node if root_node.app is not None else None
+    node = root_node
+    for path_segment in _get_path_segments(path_info):
+        node = node.children.get(path_segment)
+        if node is None:
+            break
+        if node.app is not None:
+            deepest_node_with_app = node
+    return deepest_node_with_app
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""
+Loading of what Django would otherwise load on the first request, so that
+the first request to each process is as fast as the rest.
+
+"""
+from functools import partial
+from io import BytesIO
+from logging import getLogger
+import sys
+from time import time
+
+from django_pastedeploy_settings.instrumentation import get_cpu_time
+from django_pastedeploy_settings.instrumentation import PhaseTiming
+
+
+__all__ = ['warm_up_application']
+
+
+_LOGGER = getLogger(__name__)
+
+
+def warm_up_application(
+    wsgi_application=None,
+    template_names=(),
+    request_paths=(),
+    ):
+    """
+    Load the URLconf (and with it, the views), the middleware, the template
+    loaders and the translations for the current language, and then compile
+    the templates named in ``template_names`` and make a ``GET`` request to
+    ``wsgi_application`` for each of the ``request_paths``.
+
+    :param wsgi_application: The Django WSGI application, which is required
+        to make requests and whose middleware is loaded if it's not yet
+    :return: The time spent in each step
+    :rtype: :class:`list` of
+        :class:`~django_pastedeploy_settings.instrumentation.PhaseTiming`
+
+    The time spent in each step is also logged. Errors are propagated,
+    except for requests, whose client and server errors are logged.
+
+    The database connections and the cache clients opened by the requests are
+    closed afterwards, so that the processes forked from this one don't share
+    their sockets.
+
+    """
+    steps = [
+        ('urlconf', _load_urlconf),
+        ('middleware', partial(_load_middleware, wsgi_application)),
+        ('templates', partial(_load_templates, template_names)),
+        ('translations', _load_translations),
+        ]
+    if request_paths:
+        make_requests = \
+            partial(_make_requests, wsgi_application, request_paths)
+        steps.append(('requests', make_requests))
+
+    step_timings = []
+    for step_name, step_function in steps:
+        initial_wall_time = time()
+        initial_cpu_time = get_cpu_time()
+        step_function()
+        step_timing = PhaseTiming(
+            step_name,
+            time() - initial_wall_time,
+            get_cpu_time() - initial_cpu_time,
+            )
+        step_timings.append(step_timing)
+
+    _LOGGER.info(
+        'Application warmed up in %.3fs: %s',
+        sum(step_timing.wall_time for step_timing in step_timings),
+        ', '.join(
+            '%s=%.3fs' % (step_timing.name, step_timing.wall_time)
+            for step_timing in step_timings
+            ),
+        )
+
+    return step_timings
+
+
+def _load_urlconf():
+    try:
+        from django.urls import get_resolver
+    except ImportError:
+        # Django < 1.10
+        from django.core.urlresolvers import get_resolver
+
+    url_resolver = get_resolver()
+    # Importing the URLconf imports the views, and reversing compiles all
+    # the URL patterns
+    url_resolver.url_patterns
+    url_resolver.reverse_dict
+
+
+def _load_middleware(wsgi_application):
+    # Django < 1.10 only loads the middleware on the first request
+    if getattr(wsgi_application, '_request_middleware', ()) is None:
+        wsgi_application.load_middleware()
+
+
+def _load_templates(template_names):
+    from django.template.loader import get_template
+
+    try:
+        from django.template import engines
+    except ImportError:
+        # Django < 1.8 loads the template loaders along with the first
+        # template
+        pass
+    else:
+        for template_engine in engines.all():
+            if hasattr(template_engine, 'engine'):
+                template_engine.engine.template_loaders
+
+    for template_name in template_names:
+        get_template(template_name)
+
+
+def _load_translations():
+    from django.conf import settings
+    from django.utils import translation
+
+    if settings.USE_I18N:
+        translation.activate(settings.LANGUAGE_CODE)
+        translation.deactivate()
+
+
+def _make_requests(wsgi_application, request_paths):
+    if wsgi_application is None:
+        raise ValueError('The WSGI application is required to make requests')
+
+    from django.conf import settings
+
+    host = _get_request_host(settings.ALLOWED_HOSTS)
+    try:
+        for request_path in request_paths:
+            _make_request(wsgi_application, request_path, host)
+    finally:
+        _close_connections()
+
+
+def _make_request(wsgi_application, request_path, host):
+    path_info, _, query_string = request_path.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path_info,
+        'QUERY_STRING': query_string,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        }
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+
+    response = wsgi_application(environ, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+
+    status = statuses[-1] if statuses else None
+    if status is None or status[0] in '45':
+        # Client errors include those caused by the host (e.g., when
+        # ALLOWED_HOSTS only has patterns and 'localhost' is rejected)
+        _LOGGER.warning(
+            'Warm-up request to %s (host %s) failed: %s',
+            request_path,
+            host,
+            status,
+            )
+    else:
+        _LOGGER.debug('Warm-up request to %s: %s', request_path, status)
+
+
+def _close_connections():
+    from django.db import connections
+
+    try:
+        from django.core.cache import caches
+    except ImportError:
+        # Django < 1.7
+        from django.core.cache import cache
+        cache_backends = [cache]
+    else:
+        # Only the caches used in this thread
+        cache_backends = caches.all()
+
+    if hasattr(connections, 'close_all'):
+        connections.close_all()
+    else:
+        for connection in connections.all():
+            connection.close()
+
+    for cache_backend in cache_backends:
+        cache_backend.close()
+
+
+def _get_request_host(allowed_hosts):
+    for allowed_host in allowed_hosts:
+        if allowed_host != '*' and not allowed_host.startswith('.'):
+            return allowed_host
+
+    # Subdomain patterns also match the domain itself
+    for allowed_host in allowed_hosts:
+        if allowed_host.startswith('.'):
+            return allowed_host[1:]
+
+    return 'localhost'
@@ -17,22 +17,87 @@
 """
 Nose plugin to run Django applications in a WSGI environment.
 
-This module has no automated tests on purpose. Functional tests would be very
-useful.
+Only the helpers which don't need a test run have automated tests. Functional
+tests would be very useful.
 
 """
+from hashlib import sha1
+from importlib import import_module
+from inspect import ismodule
+from json import dump as write_json
+from json import dumps as convert_to_json
+from json import load as read_json
+import errno
+from multiprocessing import Array
+from multiprocessing.util import Finalize
+import os
+from shutil import copyfile
+from time import sleep
+from time import time
+
 from nose.plugins import Plugin
 from paste.deploy import loadapp
+from paste.deploy.loadwsgi import APP
+from paste.deploy.loadwsgi import FILTER_APP
+from paste.deploy.loadwsgi import FILTER_WITH
+from paste.deploy.loadwsgi import loadcontext
+from paste.deploy.loadwsgi import PIPELINE
+
+from django_pastedeploy_settings.warm_up import warm_up_application
 
 
 __all__ = ("DjangoPastedeployPlugin",)
 
 
+_DATABASE_FINGERPRINT_FILE_PATH = ".django-test-databases"
+
+
+_FIXTURE_SNAPSHOT_FINGERPRINT_FILE_PATH = ".django-test-fixtures"
+
+
+# Suffix for the name of the copy of each test database with the fixtures
+_FIXTURE_SNAPSHOT_SUFFIX = "fixtures"
+
+
+# Compression formats supported by Django's loaddata command
+_FIXTURE_COMPRESSION_FORMATS = ("bz2", "gz", "xz", "zip")
+
+
+_TIMED_PHASE_NAMES = ("application_loading", "database_setup", "teardown")
+
+
+# The oldest Django versions with the APIs to set up the applications on their
+# own, and to keep and copy the test databases, respectively
+_SETTINGS_ONLY_MINIMUM_DJANGO_VERSION = (1, 7)
+_TEST_DATABASE_COPY_MINIMUM_DJANGO_VERSION = (1, 9)
+
+
+# Shared with the worker processes of nose's multiprocess plugin, which are
+# forked after the test databases are created, to give each worker its own
+# clone of the test databases: The process id of the worker using each clone,
+# or 0 if it's free.
+_WORKER_PROCESS_IDS_BY_CLONE = None
+
+
+# Seconds to wait for a clone to be freed by a worker which is exiting
+_CLONE_ALLOCATION_INTERVAL = 0.05
+
+
+# Names of the copies of the test databases with the fixtures, by database
+# alias, also shared with the worker processes.
+_FIXTURE_SNAPSHOT_NAMES_BY_ALIAS = {}
+
+
 class DjangoPastedeployPlugin(Plugin):
     """
     Loads the Django application described by the PasteDeploy configuration URL
     in a WSGI environment suitable for testing.
     
+    When nose runs the tests in several processes, the application is loaded
+    and warmed up and the test databases are created before the worker
+    processes are forked, and each worker process uses its own clone of the
+    test databases.
+    
     """
     enabled = False
     
@@ -63,6 +128,84 @@ class DjangoPastedeployPlugin(Plugin):
             # from:
             help="Do not set up a Django test database",
             )
+        
+        parser.add_option(
+            "--settings-only",
+            action="store_true",
+            default=False,
+            dest="settings_only",
+            help="Only set up the Django settings and applications, without "
+                "building the WSGI application",
+            )
+        
+        parser.add_option(
+            "--reuse-db",
+            action="store_true",
+            default=False,
+            dest="reuse_db",
+            help="Keep the Django test database between runs and only "
+                "rebuild it when the migrations or models change",
+            )
+        
+        parser.add_option(
+            "--create-db",
+            action="store_true",
+            default=False,
+            dest="force_db_creation",
+            help="Rebuild the Django test database even if it could be "
+                "reused",
+            )
+        
+        parser.add_option(
+            "--fixture",
+            action="append",
+            default=[],
+            dest="fixture_labels",
+            metavar="FIXTURE",
+            help="Load this Django fixture into the test database once and "
+                "restore it before each test module; can be used more than "
+                "once",
+            )
+        
+        parser.add_option(
+            "--slowest-tests",
+            type="int",
+            default=0,
+            dest="slowest_test_count",
+            metavar="N",
+            help="Report the time spent loading the Django application and "
+                "setting up the test database, and the N slowest tests",
+            )
+        
+        parser.add_option(
+            "--timing-file",
+            type="string",
+            default="",
+            dest="timing_file_path",
+            help="Write the time spent in each phase, test and test module "
+                "to this JSON file",
+            )
+        
+        parser.add_option(
+            "--shard",
+            type="string",
+            default="",
+            dest="shard",
+            metavar="INDEX/COUNT",
+            help="Only run the test modules in this shard, out of COUNT "
+                "shards starting at 1",
+            )
+        
+        parser.add_option(
+            "--shard-timings",
+            action="append",
+            default=[],
+            dest="shard_timing_file_paths",
+            metavar="TIMING_FILE",
+            help="Split the test modules across shards by the durations in "
+                "this file written by --timing-file; can be used more than "
+                "once",
+            )
     
     def configure(self, options, conf):
         """Store the URI to the PasteDeploy configuration."""
@@ -72,17 +215,196 @@ class DjangoPastedeployPlugin(Plugin):
         self.enabled = bool(self.paste_config_uri)
         self.verbosity = options.verbosity
         self.create_db = not options.no_db
+        self.settings_only = options.settings_only
+        self.reuse_db = options.reuse_db
+        self.force_db_creation = options.force_db_creation
+        self.fixture_labels = options.fixture_labels
+        self.are_fixture_snapshots_modified = False
+        
+        self.slowest_test_count = options.slowest_test_count
+        self.timing_file_path = options.timing_file_path
+        self.phase_durations = {}
+        self.test_durations = {}
+        self.test_module_durations = {}
+        self.test_start_times = {}
+        self.output_stream = None
+        
+        if options.shard:
+            self.shard_index, self.shard_count = _parse_shard(options.shard)
+            self.shard_index_by_module_name = _get_shard_index_by_module_name(
+                _load_test_module_durations(options.shard_timing_file_paths),
+                self.shard_count,
+                )
+        else:
+            self.shard_index = None
+        
+        if self.enabled:
+            if self.settings_only:
+                _require_django_version(
+                    _SETTINGS_ONLY_MINIMUM_DJANGO_VERSION,
+                    "--settings-only",
+                    )
+            if self.reuse_db:
+                _require_django_version(
+                    _TEST_DATABASE_COPY_MINIMUM_DJANGO_VERSION,
+                    "--reuse-db",
+                    )
+            if self.fixture_labels:
+                _require_django_version(
+                    _TEST_DATABASE_COPY_MINIMUM_DJANGO_VERSION,
+                    "--fixture",
+                    )
     
     def begin(self):
+        if self.conf.worker and _WORKER_PROCESS_IDS_BY_CLONE is not None:
+            # The application was loaded before this process was forked
+            self._switch_to_worker_databases()
+            return
+        
+        self.worker_count = _get_worker_count(self.conf)
+        if self.create_db and 1 < self.worker_count:
+            _require_django_version(
+                _TEST_DATABASE_COPY_MINIMUM_DJANGO_VERSION,
+                "Running the tests in several processes",
+                )
+        
+        phase_start_time = time()
         # Set up the settings before using Django
-        loadapp(self.paste_config_uri)
+        if self.settings_only:
+            _set_up_django(self.paste_config_uri)
+        else:
+            loadapp(self.paste_config_uri)
         
         self._set_up_test_environment()
+        self.phase_durations["application_loading"] = \
+            time() - phase_start_time
+        
+        phase_start_time = time()
         self._create_test_databases()
+        self.phase_durations["database_setup"] = time() - phase_start_time
+        
+        if self.worker_count:
+            if not self.settings_only:
+                warm_up_application()
+            self._prepare_worker_databases()
     
     def finalize(self, result=None):
+        phase_start_time = time()
         self._remove_test_databases()
         self._tear_down_test_environment()
+        self.phase_durations["teardown"] = time() - phase_start_time
+        
+        if self.slowest_test_count and self.output_stream:
+            self._write_timing_report()
+        if self.timing_file_path:
+            self._write_timing_file()
+    
+    def setOutputStream(self, stream):
+        self.output_stream = stream
+    
+    def wantModule(self, module):
+        if self.shard_index is None or hasattr(module, "__path__"):
+            # Packages must be collected for their modules to be examined
+            return None
+        
+        module_name = module.__name__
+        shard_index = self.shard_index_by_module_name.get(module_name)
+        if shard_index is None:
+            shard_index = _get_default_shard_index(
+                module_name,
+                self.shard_count,
+                )
+        return shard_index == self.shard_index
+    
+    def startContext(self, context):
+        is_test_module = ismodule(context) and not hasattr(context, "__path__")
+        if is_test_module and self.are_fixture_snapshots_modified:
+            _restore_fixture_snapshots()
+            self.are_fixture_snapshots_modified = False
+    
+    def startTest(self, test):
+        self.are_fixture_snapshots_modified = \
+            bool(_FIXTURE_SNAPSHOT_NAMES_BY_ALIAS)
+        self.test_start_times[test.id()] = time()
+    
+    def stopTest(self, test):
+        test_id = test.id()
+        test_start_time = self.test_start_times.pop(test_id, None)
+        if test_start_time is None:
+            return
+        
+        test_duration = time() - test_start_time
+        self.test_durations[test_id] = \
+            self.test_durations.get(test_id, 0) + test_duration
+        
+        test_module_name = _get_test_module_name(test)
+        if test_module_name:
+            self.test_module_durations[test_module_name] = \
+                self.test_module_durations.get(test_module_name, 0) + \
+                test_duration
+    
+    def _write_timing_report(self):
+        stream = self.output_stream
+        stream.write("\nDjango test timings:\n")
+        for phase_name in _TIMED_PHASE_NAMES:
+            if phase_name in self.phase_durations:
+                stream.write(
+                    "%8.3fs  %s\n" % (
+                        self.phase_durations[phase_name],
+                        phase_name.replace("_", " "),
+                        ),
+                    )
+        
+        slowest_tests = sorted(
+            self.test_durations.items(),
+            key=_get_test_duration,
+            reverse=True,
+            )[:self.slowest_test_count]
+        if slowest_tests:
+            stream.write("\n%s slowest tests:\n" % len(slowest_tests))
+            for test_id, test_duration in slowest_tests:
+                stream.write("%8.3fs  %s\n" % (test_duration, test_id))
+    
+    def _write_timing_file(self):
+        timings = {
+            "phases": self.phase_durations,
+            "tests": self.test_durations,
+            "modules": self.test_module_durations,
+            }
+        with open(self.timing_file_path, "w") as timing_file:
+            write_json(timings, timing_file, indent=2, sort_keys=True)
+    
+    def _prepare_worker_databases(self):
+        global _WORKER_PROCESS_IDS_BY_CLONE
+        _WORKER_PROCESS_IDS_BY_CLONE = Array("i", self.worker_count)
+        
+        # The worker processes must not share the connections of this process
+        from django.db import connections
+        connections.close_all()
+    
+    def _switch_to_worker_databases(self):
+        from django.db import connections
+        
+        worker_count = _get_worker_count(self.conf)
+        if not self.create_db or worker_count < 2:
+            # Django only clones the test databases for two or more workers
+            connections.close_all()
+            return
+        
+        worker_number = _allocate_clone()
+        
+        switched_settings_dict_ids = set()
+        for alias in connections:
+            connection = connections[alias]
+            # Test mirrors share the settings of the database they mirror
+            if id(connection.settings_dict) not in switched_settings_dict_ids:
+                connection.settings_dict.update(
+                    connection.creation.get_test_db_clone_settings(
+                        worker_number,
+                        ),
+                    )
+                switched_settings_dict_ids.add(id(connection.settings_dict))
+            connection.close()
     
     def _set_up_test_environment(self):
         from django.test.utils import setup_test_environment
@@ -96,11 +418,506 @@ class DjangoPastedeployPlugin(Plugin):
         if self.create_db:
             from django.conf import settings
             from django.test.utils import get_runner
+            
+            database_fingerprint = None
+            fixture_fingerprint = None
+            if self.reuse_db:
+                database_fingerprint = _get_database_fingerprint()
+                keep_db = not self.force_db_creation and \
+                    database_fingerprint == _load_fingerprint(
+                        _DATABASE_FINGERPRINT_FILE_PATH,
+                        )
+                if self.fixture_labels:
+                    fixture_fingerprint = _get_fixture_fingerprint(
+                        self.fixture_labels,
+                        database_fingerprint,
+                        )
+                    # The kept databases contain the changes made by the
+                    # tests, so the new fixtures must be loaded into new ones
+                    keep_db = keep_db and fixture_fingerprint == \
+                        _load_fingerprint(
+                            _FIXTURE_SNAPSHOT_FINGERPRINT_FILE_PATH,
+                            )
+            else:
+                keep_db = False
+            
             TestRunner = get_runner(settings)
-            self.test_runner = TestRunner(self.verbosity, interactive=False)
+            self.test_runner = TestRunner(
+                self.verbosity,
+                interactive=False,
+                keepdb=keep_db,
+                )
             self.db_config = self.test_runner.setup_databases()
+            
+            if self.reuse_db:
+                _store_fingerprint(
+                    _DATABASE_FINGERPRINT_FILE_PATH,
+                    database_fingerprint,
+                    )
+            
+            if self.fixture_labels:
+                self._set_up_fixture_snapshots(fixture_fingerprint, keep_db)
+            
+            # The clones for the worker processes must include the fixtures,
+            # which may have just been loaded
+            if 1 < self.worker_count:
+                self._clone_test_databases(
+                    keep_db and not self.fixture_labels,
+                    )
+            self.test_runner.parallel = self.worker_count
+            
+            if self.reuse_db:
+                # The databases must not be destroyed when the tests finish
+                self.test_runner.keepdb = True
+    
+    def _set_up_fixture_snapshots(self, fixture_fingerprint, keep_db):
+        """
+        Load the fixtures and copy the test databases, unless the test
+        databases and their copies were kept from a previous run with the same
+        ``fixture_fingerprint``.
+        
+        """
+        from django.core.management import call_command
+        
+        snapshotted_connections = [
+            connection for connection in self._get_test_connections()
+            if _is_fixture_snapshot_supported(connection)
+            ]
+        
+        # The databases are only kept with the fixtures they were copied with
+        are_fixture_snapshots_up_to_date = keep_db
+        
+        for connection in snapshotted_connections:
+            _FIXTURE_SNAPSHOT_NAMES_BY_ALIAS[connection.alias] = \
+                connection.creation.get_test_db_clone_settings(
+                    _FIXTURE_SNAPSHOT_SUFFIX,
+                    )["NAME"]
+        
+        if are_fixture_snapshots_up_to_date:
+            _restore_fixture_snapshots()
+            return
+        
+        call_command("loaddata", *self.fixture_labels, verbosity=0)
+        for connection in snapshotted_connections:
+            connection.creation.clone_test_db(
+                number=_FIXTURE_SNAPSHOT_SUFFIX,
+                verbosity=self.verbosity,
+                )
+        
+        if fixture_fingerprint:
+            _store_fingerprint(
+                _FIXTURE_SNAPSHOT_FINGERPRINT_FILE_PATH,
+                fixture_fingerprint,
+                )
+    
+    def _clone_test_databases(self, keep_db):
+        for connection in self._get_test_connections():
+            for worker_number in range(1, self.worker_count + 1):
+                connection.creation.clone_test_db(
+                    number=worker_number,
+                    verbosity=self.verbosity,
+                    keepdb=keep_db,
+                    )
+    
+    def _get_test_connections(self):
+        # Mirrors are not created by Django, so they are not copied either
+        test_connections = [
+            connection for connection, _, is_mirror_source in self.db_config
+            if is_mirror_source
+            ]
+        return test_connections
     
     def _remove_test_databases(self):
         if self.create_db:
+            if _FIXTURE_SNAPSHOT_NAMES_BY_ALIAS:
+                for connection in self._get_test_connections():
+                    if connection.alias in _FIXTURE_SNAPSHOT_NAMES_BY_ALIAS:
+                        connection.creation.destroy_test_db(
+                            verbosity=self.verbosity,
+                            keepdb=self.test_runner.keepdb,
+                            number=_FIXTURE_SNAPSHOT_SUFFIX,
+                            )
             self.test_runner.teardown_databases(self.db_config)
 
+
+def _require_django_version(minimum_version, feature_description):
+    import django
+    
+    if django.VERSION < minimum_version:
+        raise ValueError(
+            "%s requires Django %s or later" % (
+                feature_description,
+                ".".join(str(n) for n in minimum_version),
+                ),
+            )
+
+
+def _get_test_duration(test_duration_item):
+    return test_duration_item[1]
+
+
+def _get_test_module_name(test):
+    try:
+        test_address = test.address()
+    except (AttributeError, TypeError):
+        test_address = None
+    
+    if test_address:
+        test_module_name = test_address[1]
+    else:
+        test_module_name = None
+    return test_module_name
+
+
+def _parse_shard(raw_shard):
+    try:
+        shard_index, shard_count = [int(n) for n in raw_shard.split("/")]
+    except ValueError:
+        shard_index = shard_count = 0
+    
+    if not 1 <= shard_index <= shard_count:
+        raise ValueError(
+            "The shard must be given as INDEX/COUNT, where 1 <= INDEX <= "
+                "COUNT: %r" % raw_shard,
+            )
+    
+    # Shards are numbered from 1 on the command line only
+    return shard_index - 1, shard_count
+
+
+def _load_test_module_durations(timing_file_paths):
+    test_module_durations = {}
+    for timing_file_path in timing_file_paths:
+        try:
+            with open(timing_file_path) as timing_file:
+                timings = read_json(timing_file)
+        except IOError:
+            # The timings may not have been recorded yet
+            continue
+        
+        module_durations = timings.get("modules", {})
+        for module_name, module_duration in module_durations.items():
+            test_module_durations[module_name] = max(
+                test_module_durations.get(module_name, 0),
+                module_duration,
+                )
+    return test_module_durations
+
+
+def _get_shard_index_by_module_name(test_module_durations, shard_count):
+    """
+    Assign each test module to the shard with the shortest total duration so
+    far, from the slowest to the fastest module.
+    
+    The result is the same on every node as long as they use the same timing
+    files.
+    
+    """
+    shard_durations = [0] * shard_count
+    shard_index_by_module_name = {}
+    for module_name, module_duration in sorted(
+        test_module_durations.items(),
+        key=lambda item: (-item[1], item[0]),
+        ):
+        shard_index = shard_durations.index(min(shard_durations))
+        shard_index_by_module_name[module_name] = shard_index
+        shard_durations[shard_index] += module_duration
+    return shard_index_by_module_name
+
+
+def _get_default_shard_index(module_name, shard_count):
+    # Modules without a recorded duration (e.g., new ones) are spread evenly
+    module_name_hash = int(sha1(module_name).hexdigest(), 16)
+    return module_name_hash % shard_count
+
+
+def _allocate_clone():
+    """
+    Return the number of a clone of the test databases which no other worker
+    process is using, and release it when the current process exits.
+    
+    Workers restarted by nose may start before the worker they replace has
+    released its clone, in which case this waits for the clone.
+    
+    """
+    process_id = os.getpid()
+    while True:
+        with _WORKER_PROCESS_IDS_BY_CLONE.get_lock():
+            for clone_index, clone_process_id in \
+                    enumerate(_WORKER_PROCESS_IDS_BY_CLONE):
+                # Workers which were killed could not release their clones
+                if not clone_process_id or \
+                        not _is_process_running(clone_process_id):
+                    _WORKER_PROCESS_IDS_BY_CLONE[clone_index] = process_id
+                    break
+            else:
+                clone_index = None
+        
+        if clone_index is not None:
+            break
+        sleep(_CLONE_ALLOCATION_INTERVAL)
+    
+    # Run by multiprocessing as the worker process exits, unlike atexit
+    # handlers
+    Finalize(None, _release_clone, args=(clone_index, ), exitpriority=100)
+    
+    return clone_index + 1
+
+
+def _release_clone(clone_index):
+    with _WORKER_PROCESS_IDS_BY_CLONE.get_lock():
+        if _WORKER_PROCESS_IDS_BY_CLONE[clone_index] == os.getpid():
+            _WORKER_PROCESS_IDS_BY_CLONE[clone_index] = 0
+
+
+def _is_process_running(process_id):
+    try:
+        os.kill(process_id, 0)
+    except OSError as exc:
+        return exc.errno != errno.ESRCH
+    return True
+
+
+def _get_worker_count(conf):
+    # Set by nose's multiprocess plugin, if enabled
+    worker_count = getattr(conf, "multiprocess_workers", 0)
+    return worker_count
+
+
+def _set_up_django(config_uri):
+    """
+    Set up the Django settings and applications described by the PasteDeploy
+    configuration URI, without building the WSGI application.
+    
+    """
+    from django_pastedeploy_settings import _set_up_settings
+    
+    django_app_context = _get_django_app_context(loadcontext(APP, config_uri))
+    _set_up_settings(
+        django_app_context.global_conf,
+        django_app_context.local_conf,
+        )
+    
+    import django
+    django.setup()
+
+
+def _get_django_app_context(app_context):
+    """
+    Return the PasteDeploy context of the Django application in
+    ``app_context``, following the pipelines, filters and ``full_django``
+    composite applications that wrap it.
+    
+    """
+    while True:
+        if app_context.object_type is PIPELINE:
+            app_context = app_context.app_context
+        elif app_context.object_type in (FILTER_APP, FILTER_WITH):
+            app_context = app_context.next_context
+        elif "django_app" in app_context.local_conf:
+            app_context = app_context.loader.get_context(
+                APP,
+                app_context.local_conf["django_app"],
+                global_conf=app_context.global_conf,
+                )
+        else:
+            return app_context
+
+
+def _get_database_fingerprint():
+    """
+    Return a digest of the database configuration and the source code of the
+    models and migrations of every installed application.
+
+    """
+    from django.apps import apps
+    from django.conf import settings
+    
+    fingerprint = sha1()
+    fingerprint.update(
+        convert_to_json(settings.DATABASES, sort_keys=True, default=repr),
+        )
+    for app_config in sorted(apps.get_app_configs(), key=_get_app_label):
+        fingerprint.update(app_config.label)
+        
+        source_modules = [app_config.models_module]
+        migrations_module_name = settings.MIGRATION_MODULES.get(
+            app_config.label,
+            "%s.migrations" % app_config.name,
+            )
+        if migrations_module_name:
+            try:
+                source_modules.append(import_module(migrations_module_name))
+            except ImportError:
+                pass
+        
+        for source_module in source_modules:
+            for source_file_path in _get_module_source_file_paths(
+                source_module,
+                ):
+                with open(source_file_path, "rb") as source_file:
+                    fingerprint.update(source_file.read())
+    
+    return fingerprint.hexdigest()
+
+
+def _get_app_label(app_config):
+    return app_config.label
+
+
+def _get_module_source_file_paths(module):
+    module_file_path = getattr(module, "__file__", None)
+    if not module_file_path:
+        return []
+    
+    module_file_path = os.path.splitext(module_file_path)[0] + ".py"
+    if os.path.basename(module_file_path) != "__init__.py":
+        return [module_file_path]
+    
+    source_file_paths = []
+    package_directory_path = os.path.dirname(module_file_path)
+    for directory_path, directory_names, file_names in \
+            os.walk(package_directory_path):
+        directory_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(".py"):
+                source_file_paths.append(
+                    os.path.join(directory_path, file_name),
+                    )
+    return source_file_paths
+
+
+def _get_fixture_fingerprint(fixture_labels, database_fingerprint):
+    """
+    Return a digest of the ``fixture_labels``, the contents of the fixture
+    files they refer to and the ``database_fingerprint``.
+    
+    """
+    fingerprint = sha1(database_fingerprint)
+    fingerprint.update(convert_to_json(fixture_labels))
+    
+    for fixture_file_path in _get_fixture_file_paths(fixture_labels):
+        fingerprint.update(fixture_file_path)
+        with open(fixture_file_path, "rb") as fixture_file:
+            fingerprint.update(fixture_file.read())
+    
+    return fingerprint.hexdigest()
+
+
+def _get_fixture_file_paths(fixture_labels):
+    """
+    Return the paths to the fixture files that :command:`loaddata` would find
+    for the ``fixture_labels`` in the ``fixtures`` directory of each
+    application or in ``FIXTURE_DIRS``.
+    
+    Unlike :command:`loaddata`, the current directory is not searched, since
+    it also contains the test databases.
+    
+    """
+    from django.apps import apps
+    from django.conf import settings
+    from django.core.serializers import get_public_serializer_formats
+    from django.db import connections
+    
+    # A fixture file is named after its label, optionally followed by a
+    # database alias, a serialization format and a compression format
+    fixture_file_name_suffixes = \
+        set(get_public_serializer_formats()) | \
+        set(_FIXTURE_COMPRESSION_FORMATS) | \
+        set(connections)
+    
+    fixture_directory_paths = [
+        os.path.join(app_config.path, "fixtures")
+        for app_config in sorted(apps.get_app_configs(), key=_get_app_label)
+        ]
+    fixture_directory_paths.extend(settings.FIXTURE_DIRS)
+    
+    fixture_file_paths = []
+    for fixture_label in fixture_labels:
+        if os.path.isabs(fixture_label):
+            label_directory_paths = [os.path.dirname(fixture_label)]
+        else:
+            label_directory_paths = [
+                os.path.join(
+                    fixture_directory_path,
+                    os.path.dirname(fixture_label),
+                    )
+                for fixture_directory_path in fixture_directory_paths
+                ]
+        fixture_name = os.path.basename(fixture_label)
+        
+        for label_directory_path in label_directory_paths:
+            if not os.path.isdir(label_directory_path):
+                continue
+            
+            for file_name in sorted(os.listdir(label_directory_path)):
+                if file_name == fixture_name:
+                    is_fixture_file = True
+                elif file_name.startswith(fixture_name + "."):
+                    file_name_suffixes = \
+                        file_name[len(fixture_name) + 1:].split(".")
+                    is_fixture_file = \
+                        fixture_file_name_suffixes.issuperset(
+                            file_name_suffixes,
+                            )
+                else:
+                    is_fixture_file = False
+                
+                file_path = os.path.join(label_directory_path, file_name)
+                if is_fixture_file and os.path.isfile(file_path):
+                    fixture_file_paths.append(file_path)
+    
+    return fixture_file_paths
+
+
+def _is_fixture_snapshot_supported(connection):
+    if connection.vendor == "sqlite":
+        database_name = connection.settings_dict["NAME"]
+        is_fixture_snapshot_supported = \
+            not connection.creation.is_in_memory_db(database_name)
+    else:
+        is_fixture_snapshot_supported = connection.vendor == "postgresql"
+    return is_fixture_snapshot_supported
+
+
+def _restore_fixture_snapshots():
+    """
+    Replace the test databases used by this process with their copies with
+    the fixtures.
+    
+    """
+    from django.db import connections
+    
+    for alias, snapshot_name in _FIXTURE_SNAPSHOT_NAMES_BY_ALIAS.items():
+        connection = connections[alias]
+        connection.close()
+        database_name = connection.settings_dict["NAME"]
+        if connection.vendor == "sqlite":
+            copyfile(snapshot_name, database_name)
+        else:
+            quote_name = connection.ops.quote_name
+            # Django (1.8 to 1.11) uses this connection to create and copy the
+            # test databases, because PostgreSQL can't drop the database it's
+            # connected to
+            with connection._nodb_connection.cursor() as cursor:
+                cursor.execute("DROP DATABASE %s" % quote_name(database_name))
+                cursor.execute(
+                    "CREATE DATABASE %s WITH TEMPLATE %s" % (
+                        quote_name(database_name),
+                        quote_name(snapshot_name),
+                        ),
+                    )
+
+
+def _load_fingerprint(fingerprint_file_path):
+    try:
+        with open(fingerprint_file_path) as fingerprint_file:
+            fingerprint = fingerprint_file.read().strip()
+    except IOError:
+        fingerprint = None
+    return fingerprint
+
+
+def _store_fingerprint(fingerprint_file_path, fingerprint):
+    with open(fingerprint_file_path, "w") as fingerprint_file:
+        fingerprint_file.write(fingerprint)
@@ -59,6 +59,7 @@ setup(
     extras_require={
         'nose-buildout': ["zc.recipe.egg >= 1.2.2"],
         'buildout-options': ["deployrecipes >= 1.0"],
+        'brotli': ["brotli"],
         },
     test_suite="nose.collector",
     entry_points="""\
@@ -68,6 +69,16 @@ setup(
         [paste.composite_factory]
         full_django = django_pastedeploy_settings.factories:make_full_django_app
 
+        [paste.filter_factory]
+        latency_histogram = django_pastedeploy_settings.factories:make_latency_histogram_filter
+        sampled_profiler = django_pastedeploy_settings.factories:make_sampled_profiler_filter
+        response_cache = django_pastedeploy_settings.factories:make_response_cache_filter
+
+        [console_scripts]
+        freeze-django-settings = django_pastedeploy_settings.freezing:main
+        precompress-media = django_pastedeploy_settings.compression:main
+        report-memory-usage = django_pastedeploy_settings.forking:main
+
         [nose.plugins.0.10]
         paste-deploy-config = django_testing:DjangoPastedeployPlugin
 
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Settings module used to exercise the fork-friendly settings.
+
+"""
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Settings module to be frozen.
+
+"""
+
+SECRET_KEY = 'It is a secret'
+
+INSTALLED_APPS = ('app1', )
+
+UNCHANGED_SETTING = object()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Settings module used to exercise lazily resolved settings.
+
+"""
+
+TUPLE = (1, 2)
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+Settings module used to exercise the merge strategies.
+
+"""
+INSTALLED_APPS = ('django.contrib.auth', 'django.contrib.contenttypes')
+
+MIDDLEWARE = ['django.middleware.common.CommonMiddleware']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 300},
+        },
+    }
+
+LOGGING_HANDLERS = [{'class': 'logging.StreamHandler'}]
+
+EMAIL_HOST = 'localhost'
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""
+Settings module used to exercise the hot reloading of the settings.
+
+"""
+ALLOWED_HOSTS = ['localhost']
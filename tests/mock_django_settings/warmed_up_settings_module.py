@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Settings module used to exercise the warm-up of the application.
+
+"""
+
+urlpatterns = []
@@ -0,0 +1,142 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from nose.tools import assert_false
+from nose.tools import eq_
+
+from django_pastedeploy_settings.buildout_options import \
+    DecodedConfvarsRecipe
+from django_pastedeploy_settings.settings_cache import \
+    get_settings_cache_file_path
+from django_pastedeploy_settings.settings_cache import \
+    get_settings_cache_fingerprint
+from django_pastedeploy_settings.settings_cache import load_cached_options
+from django_pastedeploy_settings.settings_cache import store_cached_options
+
+from tests.mock_django_settings import cached_settings_module
+from tests.utils import get_global_conf
+from tests.utils import get_local_conf
+
+
+_VARIABLES_CACHE_NAME = 'buildout-variables'
+
+
+class TestConfigVariables(object):
+
+    def setup(self):
+        self.temporary_directory_path = mkdtemp()
+        self.config_file_path = \
+            os.path.join(self.temporary_directory_path, 'config.ini')
+        with open(self.config_file_path, 'w') as config_file:
+            config_file.write('[app:main]\n')
+
+        self.global_conf = get_global_conf(
+            'cached_settings_module',
+            __file__=self.config_file_path,
+            )
+
+    def teardown(self):
+        rmtree(self.temporary_directory_path)
+
+    def test_values_converted_to_strings(self):
+        local_conf = get_local_conf(SETTING=[1, 2])
+
+        variables = _get_config_variables(self.global_conf, local_conf)
+
+        eq_('[1, 2]', variables['SETTING'])
+        eq_('True', variables['DEBUG'])
+
+    def test_cache_miss(self):
+        local_conf = get_local_conf(SETTING=[1, 2])
+
+        variables = _get_config_variables(self.global_conf, local_conf)
+
+        fingerprint = self._get_fingerprint(local_conf)
+        cached_variables = load_cached_options(
+            self.config_file_path,
+            fingerprint,
+            _VARIABLES_CACHE_NAME,
+            )
+        eq_(variables, cached_variables)
+
+    def test_cache_hit(self):
+        local_conf = get_local_conf(SETTING=[1, 2])
+        store_cached_options(
+            self.config_file_path,
+            self._get_fingerprint(local_conf),
+            {'SETTING': 'cached'},
+            _VARIABLES_CACHE_NAME,
+            )
+
+        variables = _get_config_variables(self.global_conf, local_conf)
+
+        eq_({'SETTING': 'cached'}, variables)
+
+    def test_cache_invalidated(self):
+        store_cached_options(
+            self.config_file_path,
+            self._get_fingerprint(get_local_conf()),
+            {'SETTING': 'cached'},
+            _VARIABLES_CACHE_NAME,
+            )
+
+        local_conf = get_local_conf(SETTING='fresh')
+        variables = _get_config_variables(self.global_conf, local_conf)
+
+        eq_('fresh', variables['SETTING'])
+
+    def test_settings_cache_untouched(self):
+        _get_config_variables(self.global_conf, get_local_conf())
+
+        settings_cache_file_path = \
+            get_settings_cache_file_path(self.config_file_path)
+        assert_false(os.path.exists(settings_cache_file_path))
+
+    def test_no_config_file(self):
+        global_conf = get_global_conf('cached_settings_module')
+        local_conf = get_local_conf(SETTING='value')
+
+        variables = _get_config_variables(global_conf, local_conf)
+
+        eq_('value', variables['SETTING'])
+        eq_(['config.ini'], os.listdir(self.temporary_directory_path))
+
+    def _get_fingerprint(self, local_conf):
+        fingerprint = get_settings_cache_fingerprint(
+            self.global_conf,
+            local_conf,
+            cached_settings_module,
+            )
+        return fingerprint
+
+
+class _MockAppConfig(object):
+
+    def __init__(self, global_conf, local_conf):
+        super(_MockAppConfig, self).__init__()
+
+        self.global_conf = global_conf
+        self.local_conf = local_conf
+
+
+def _get_config_variables(global_conf, local_conf):
+    app_config = _MockAppConfig(global_conf, local_conf)
+    variables = \
+        DecodedConfvarsRecipe.get_config_variables_from_app_config(app_config)
+    return variables
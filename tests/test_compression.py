@@ -0,0 +1,139 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from gzip import GzipFile
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from nose.tools import assert_false
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings.compression import precompress_files
+
+
+_COMPRESSIBLE_FILE_CONTENTS = 'body { color: red; }\n' * 100
+
+
+class TestPrecompression(object):
+
+    def setup(self):
+        self.directory_path = mkdtemp()
+        os.mkdir(os.path.join(self.directory_path, 'css'))
+        self.file_path = self._write_file(
+            'css/style.css',
+            _COMPRESSIBLE_FILE_CONTENTS,
+            )
+
+    def teardown(self):
+        rmtree(self.directory_path)
+
+    def test_compressible_file(self):
+        result = precompress_files(self.directory_path, process_count=2)
+
+        eq_(1, result.compressed_file_count)
+        compressed_file = GzipFile(self.file_path + '.gz')
+        try:
+            eq_(_COMPRESSIBLE_FILE_CONTENTS, compressed_file.read())
+        finally:
+            compressed_file.close()
+
+    def test_modification_time(self):
+        precompress_files(self.directory_path, process_count=1)
+
+        ok_(
+            os.stat(self.file_path).st_mtime <=
+                os.stat(self.file_path + '.gz').st_mtime,
+            )
+
+    def test_up_to_date_file(self):
+        precompress_files(self.directory_path, process_count=1)
+
+        result = precompress_files(self.directory_path, process_count=1)
+
+        eq_(0, result.compressed_file_count)
+        eq_(1, result.up_to_date_file_count)
+
+    def test_out_of_date_file(self):
+        precompress_files(self.directory_path, process_count=1)
+        os.utime(self.file_path + '.gz', (1000000000, 1000000000))
+
+        result = precompress_files(self.directory_path, process_count=1)
+
+        eq_(1, result.compressed_file_count)
+
+    def test_incompressible_file(self):
+        random_contents = os.urandom(1024)
+        file_path = self._write_file('random.txt', random_contents)
+
+        result = precompress_files(self.directory_path, process_count=1)
+
+        eq_(1, result.incompressible_file_count)
+        assert_false(os.path.exists(file_path + '.gz'))
+
+    def test_incompressible_file_skipped(self):
+        file_path = self._write_file('random.txt', os.urandom(1024))
+        precompress_files(self.directory_path, process_count=1)
+
+        result = precompress_files(self.directory_path, process_count=1)
+
+        eq_(0, result.compressed_file_count)
+        eq_(1, result.incompressible_file_count)
+        eq_(1, result.up_to_date_file_count)
+        ok_(os.path.exists(file_path + '.gz.incompressible'))
+
+    def test_incompressible_file_changed(self):
+        file_path = self._write_file('random.txt', os.urandom(1024))
+        precompress_files(self.directory_path, process_count=1)
+        self._write_file('random.txt', _COMPRESSIBLE_FILE_CONTENTS)
+        os.utime(file_path + '.gz.incompressible', (1000000000, 1000000000))
+
+        result = precompress_files(self.directory_path, process_count=1)
+
+        eq_(1, result.compressed_file_count)
+        ok_(os.path.exists(file_path + '.gz'))
+        assert_false(os.path.exists(file_path + '.gz.incompressible'))
+
+    def test_binary_file(self):
+        file_path = \
+            self._write_file('image.png', _COMPRESSIBLE_FILE_CONTENTS)
+
+        precompress_files(self.directory_path, process_count=1)
+
+        assert_false(os.path.exists(file_path + '.gz'))
+
+    def test_small_file(self):
+        file_path = self._write_file('small.txt', 'Hello world')
+
+        precompress_files(self.directory_path, process_count=1)
+
+        assert_false(os.path.exists(file_path + '.gz'))
+        ok_(os.path.exists(self.file_path + '.gz'))
+
+    def test_unsupported_encoding(self):
+        assert_raises(
+            ValueError,
+            precompress_files,
+            self.directory_path,
+            ('deflate', ),
+            )
+
+    def _write_file(self, relative_file_path, file_contents):
+        file_path = os.path.join(self.directory_path, relative_file_path)
+        with open(file_path, 'wb') as file_:
+            file_.write(file_contents)
+        return file_path
@@ -13,6 +13,7 @@
 # INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
 #
 ##############################################################################
+from json import dumps as convert_to_json
 import os
 
 from django.core.handlers.wsgi import WSGIHandler
@@ -25,6 +26,7 @@ from nose.tools import eq_
 from nose.tools import ok_
 
 from django_pastedeploy_settings import get_configured_django_wsgi_app
+from django_pastedeploy_settings import InvalidSettingValueError
 
 from tests.utils import BaseDjangoTestCase
 from tests.utils import get_global_conf
@@ -99,6 +101,210 @@ class TestSettingsStorage(BaseDjangoTestCase):
         eq_(iterables_module.TUPLE, (1, 2, 3, 6, 7))
 
 
+class TestSettingsMerging(BaseDjangoTestCase):
+
+    setup_fixture = False
+
+    def teardown(self):
+        from tests.mock_django_settings import merged_settings_module
+        for setting_name in dir(merged_settings_module):
+            if not setting_name.startswith('_'):
+                delattr(merged_settings_module, setting_name)
+        reload(merged_settings_module)
+
+        super(TestSettingsMerging, self).teardown()
+
+    def test_default_strategies(self):
+        settings_module = self._load_settings(
+            {},
+            INSTALLED_APPS=['app'],
+            EMAIL_HOST='mail.example.com',
+            )
+
+        eq_(
+            ('django.contrib.auth', 'django.contrib.contenttypes', 'app'),
+            settings_module.INSTALLED_APPS,
+            )
+        eq_('localhost', settings_module.EMAIL_HOST)
+        eq_(1, len(self.logs['warning']))
+
+    def test_default_strategy_for_string(self):
+        settings_module = self._load_settings({}, INSTALLED_APPS='app')
+
+        eq_(
+            (
+                'django.contrib.auth',
+                'django.contrib.contenttypes',
+                'a',
+                'p',
+                'p',
+                ),
+            settings_module.INSTALLED_APPS,
+            )
+
+    def test_append(self):
+        settings_module = self._load_settings(
+            {'MIDDLEWARE': 'append'},
+            MIDDLEWARE=['middleware'],
+            )
+
+        eq_(
+            ('django.middleware.common.CommonMiddleware', 'middleware'),
+            settings_module.MIDDLEWARE,
+            )
+        assert_in(
+            '"MIDDLEWARE" merged into '
+                'tests.mock_django_settings.merged_settings_module with the '
+                '"append" strategy',
+            self.logs['debug'],
+            )
+
+    def test_prepend(self):
+        settings_module = self._load_settings(
+            {'MIDDLEWARE': 'prepend'},
+            MIDDLEWARE=['middleware'],
+            )
+
+        eq_(
+            ('middleware', 'django.middleware.common.CommonMiddleware'),
+            settings_module.MIDDLEWARE,
+            )
+
+    def test_dedupe(self):
+        settings_module = self._load_settings(
+            {'INSTALLED_APPS': 'dedupe', 'LOGGING_HANDLERS': 'dedupe'},
+            INSTALLED_APPS=['app', 'django.contrib.auth', 'app'],
+            LOGGING_HANDLERS=[
+                {'class': 'logging.StreamHandler'},
+                {'class': 'logging.NullHandler'},
+                ],
+            )
+
+        eq_(
+            ('django.contrib.auth', 'django.contrib.contenttypes', 'app'),
+            settings_module.INSTALLED_APPS,
+            )
+        eq_(
+            (
+                {'class': 'logging.StreamHandler'},
+                {'class': 'logging.NullHandler'},
+                ),
+            settings_module.LOGGING_HANDLERS,
+            )
+
+    def test_merge(self):
+        settings_module = self._load_settings(
+            {'CACHES': 'merge'},
+            CACHES={
+                'default': {'OPTIONS': {'CULL_FREQUENCY': 2}},
+                'sessions': {'BACKEND': 'backend'},
+                },
+            )
+
+        eq_(
+            {
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'OPTIONS': {'MAX_ENTRIES': 300, 'CULL_FREQUENCY': 2},
+                    },
+                'sessions': {'BACKEND': 'backend'},
+                },
+            settings_module.CACHES,
+            )
+
+    def test_replace(self):
+        settings_module = self._load_settings(
+            {'EMAIL_HOST': 'replace', 'MIDDLEWARE': 'replace'},
+            EMAIL_HOST='mail.example.com',
+            MIDDLEWARE=['middleware'],
+            )
+
+        eq_('mail.example.com', settings_module.EMAIL_HOST)
+        eq_(['middleware'], settings_module.MIDDLEWARE)
+        eq_([], self.logs['warning'])
+
+    def test_lazy_settings(self):
+        settings_module = self._load_settings(
+            {'MIDDLEWARE': 'prepend'},
+            lazy_settings='1',
+            MIDDLEWARE=['middleware'],
+            )
+
+        eq_(
+            ('middleware', 'django.middleware.common.CommonMiddleware'),
+            settings_module.MIDDLEWARE,
+            )
+
+    def test_list_strategy_for_non_list(self):
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'EMAIL_HOST',
+            self._load_settings,
+            {'EMAIL_HOST': 'append'},
+            EMAIL_HOST='mail.example.com',
+            )
+
+    def test_list_strategy_for_string(self):
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'INSTALLED_APPS',
+            self._load_settings,
+            {'INSTALLED_APPS': 'append'},
+            INSTALLED_APPS='app',
+            )
+
+    def test_dictionary_strategy_for_non_dictionary(self):
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'MIDDLEWARE',
+            self._load_settings,
+            {'MIDDLEWARE': 'merge'},
+            MIDDLEWARE=['middleware'],
+            )
+
+    def test_unknown_strategy(self):
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'unknown',
+            self._load_settings,
+            {'MIDDLEWARE': 'unknown'},
+            )
+
+    def test_malformed_strategy(self):
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'INSTALLED_APPS',
+            self._load_settings,
+            {'INSTALLED_APPS': ['append']},
+            )
+
+    def test_malformed_strategies(self):
+        global_conf = get_global_conf(
+            'merged_settings_module',
+            settings_merge_strategies='["MIDDLEWARE"]',
+            )
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'settings_merge_strategies',
+            get_configured_django_wsgi_app,
+            global_conf,
+            **get_local_conf()
+            )
+
+    @staticmethod
+    def _load_settings(merge_strategies, lazy_settings='0', **options):
+        global_conf = get_global_conf(
+            'merged_settings_module',
+            settings_merge_strategies=convert_to_json(merge_strategies),
+            lazy_settings=lazy_settings,
+            )
+        local_conf = get_local_conf(**options)
+        get_configured_django_wsgi_app(global_conf, **local_conf)
+
+        from tests.mock_django_settings import merged_settings_module
+        return merged_settings_module
+
+
 class TestSettingsModuleSpecification(BaseDjangoTestCase):
 
     setup_fixture = False
@@ -119,3 +325,55 @@ class TestSettingsModuleSpecification(BaseDjangoTestCase):
         assert_raises(ImportError, get_configured_django_wsgi_app, global_conf)
 
         assert_not_in('DJANGO_SETTINGS_MODULE', os.environ)
+
+
+class TestLazySettingsStorage(BaseDjangoTestCase):
+
+    setup_fixture = False
+
+    def test_lazy_settings(self):
+        global_conf = \
+            get_global_conf('lazy_settings_module', lazy_settings='1')
+        local_conf = get_local_conf(
+            ALLOWED_HOSTS=['example.com'],
+            TUPLE=[3],
+            lower_case_option='value',
+            )
+        local_conf['LAZY_SETTING'] = '"${non_existing}"'
+        get_configured_django_wsgi_app(global_conf, **local_conf)
+
+        from django.conf import settings
+        from tests.mock_django_settings import lazy_settings_module
+
+        # Lazily resolved settings
+        assert_false(hasattr(lazy_settings_module, 'ALLOWED_HOSTS'))
+        eq_(['example.com'], settings.ALLOWED_HOSTS)
+        ok_(settings.is_overridden('ALLOWED_HOSTS'))
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'LAZY_SETTING',
+            getattr,
+            settings,
+            'LAZY_SETTING',
+            )
+
+        # Eagerly resolved settings
+        eq_('secret', lazy_settings_module.SECRET_KEY)
+        eq_((1, 2, 3), lazy_settings_module.TUPLE)
+        eq_('value', lazy_settings_module.lower_case_option)
+
+    def test_settings_validation(self):
+        global_conf = get_global_conf(
+            'lazy_settings_module',
+            lazy_settings='1',
+            validate_settings='1',
+            )
+        local_conf = get_local_conf()
+        local_conf['LAZY_SETTING'] = '"${non_existing}"'
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'LAZY_SETTING',
+            get_configured_django_wsgi_app,
+            global_conf,
+            **local_conf
+            )
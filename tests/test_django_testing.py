@@ -0,0 +1,393 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from multiprocessing import Array
+from multiprocessing import Event
+from multiprocessing import Process
+from multiprocessing import Queue
+import os
+from shutil import rmtree
+import sys
+from tempfile import mkdtemp
+
+import django.apps
+from django.apps.registry import Apps
+import django.conf
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+import django_testing
+from django_testing import _allocate_clone
+from django_testing import _get_database_fingerprint
+from django_testing import _get_default_shard_index
+from django_testing import _get_fixture_file_paths
+from django_testing import _get_fixture_fingerprint
+from django_testing import _get_shard_index_by_module_name
+from django_testing import _load_test_module_durations
+from django_testing import _parse_shard
+
+from tests.utils import BaseDjangoTestCase
+
+
+_APP_NAME = 'fingerprinted_app'
+
+
+class _BaseInstalledAppTestCase(BaseDjangoTestCase):
+    """
+    Base test case with a Django application in a temporary directory,
+    installed in an application registry of its own.
+
+    """
+
+    setup_fixture = False
+
+    def setup(self):
+        super(_BaseInstalledAppTestCase, self).setup()
+
+        self.directory_path = mkdtemp()
+        self._write_file('%s/__init__.py' % _APP_NAME, '')
+        self._write_file('%s/migrations/__init__.py' % _APP_NAME, '')
+        self._write_file(
+            '%s/migrations/0001_initial.py' % _APP_NAME,
+            'operations = []\n',
+            )
+        sys.path.insert(0, self.directory_path)
+
+        django.conf.settings.configure(
+            DATABASES={
+                'default': {
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': 'test.sqlite',
+                    },
+                },
+            FIXTURE_DIRS=[os.path.join(self.directory_path, 'fixtures')],
+            )
+
+        self.original_apps = django.apps.apps
+        django.apps.apps = Apps([_APP_NAME])
+
+    def teardown(self):
+        django.apps.apps = self.original_apps
+
+        sys.path.remove(self.directory_path)
+        for module_name in list(sys.modules):
+            if module_name.split('.')[0] == _APP_NAME:
+                del sys.modules[module_name]
+        rmtree(self.directory_path)
+
+        super(_BaseInstalledAppTestCase, self).teardown()
+
+    def _write_file(self, relative_file_path, file_contents):
+        file_path = os.path.join(self.directory_path, relative_file_path)
+        directory_path = os.path.dirname(file_path)
+        if not os.path.isdir(directory_path):
+            os.makedirs(directory_path)
+        with open(file_path, 'wb') as file_:
+            file_.write(file_contents)
+
+
+class TestDatabaseFingerprint(_BaseInstalledAppTestCase):
+
+    def test_unchanged_source_code(self):
+        eq_(_get_database_fingerprint(), _get_database_fingerprint())
+
+    def test_changed_migration(self):
+        fingerprint = _get_database_fingerprint()
+        self._write_file(
+            '%s/migrations/0001_initial.py' % _APP_NAME,
+            'operations = [None]\n',
+            )
+
+        ok_(fingerprint != _get_database_fingerprint())
+
+    def test_new_migration(self):
+        fingerprint = _get_database_fingerprint()
+        self._write_file(
+            '%s/migrations/0002_update.py' % _APP_NAME,
+            'operations = []\n',
+            )
+
+        ok_(fingerprint != _get_database_fingerprint())
+
+    def test_new_models_module(self):
+        fingerprint = _get_database_fingerprint()
+        self._write_file('%s/models.py' % _APP_NAME, '# No models yet\n')
+        django.apps.apps = Apps([_APP_NAME])
+
+        ok_(fingerprint != _get_database_fingerprint())
+
+
+class TestShardParsing(object):
+
+    def test_valid_shard(self):
+        eq_((0, 1), _parse_shard('1/1'))
+        eq_((2, 3), _parse_shard('3/3'))
+
+    def test_malformed_shards(self):
+        for malformed_shard in ('', '1', '1/', '/2', 'a/b', '1/2/3', '1.5/2'):
+            assert_raises(ValueError, _parse_shard, malformed_shard)
+
+    def test_out_of_range_shards(self):
+        for out_of_range_shard in ('0/2', '3/2', '-1/2', '0/0'):
+            assert_raises(ValueError, _parse_shard, out_of_range_shard)
+
+
+class TestShardAssignment(object):
+
+    def test_balanced_shards(self):
+        test_module_durations = {
+            'tests.a': 10,
+            'tests.b': 6,
+            'tests.c': 5,
+            'tests.d': 1,
+            }
+
+        shard_index_by_module_name = \
+            _get_shard_index_by_module_name(test_module_durations, 2)
+
+        eq_(
+            {'tests.a': 0, 'tests.b': 1, 'tests.c': 1, 'tests.d': 0},
+            shard_index_by_module_name,
+            )
+
+    def test_equal_durations(self):
+        test_module_durations = dict(
+            ('tests.test_%s' % index, 1) for index in range(10)
+            )
+
+        shard_index_by_module_name = \
+            _get_shard_index_by_module_name(test_module_durations, 3)
+
+        shard_sizes = [
+            shard_index_by_module_name.values().count(shard_index)
+            for shard_index in range(3)
+            ]
+        eq_([4, 3, 3], shard_sizes)
+        # Ties are broken by name, so every node gets the same assignment
+        eq_(
+            shard_index_by_module_name,
+            _get_shard_index_by_module_name(
+                dict(reversed(test_module_durations.items())),
+                3,
+                ),
+            )
+
+    def test_more_shards_than_modules(self):
+        shard_index_by_module_name = \
+            _get_shard_index_by_module_name({'tests.a': 1}, 3)
+
+        eq_({'tests.a': 0}, shard_index_by_module_name)
+
+    def test_default_shard_index(self):
+        shard_sizes = [0] * 4
+        for index in range(1000):
+            shard_index = _get_default_shard_index('tests.test_%s' % index, 4)
+            shard_sizes[shard_index] += 1
+
+        for shard_size in shard_sizes:
+            ok_(200 < shard_size < 300)
+        eq_(
+            _get_default_shard_index('tests.test_module', 4),
+            _get_default_shard_index('tests.test_module', 4),
+            )
+
+
+class TestTimingFileLoading(object):
+
+    def setup(self):
+        self.directory_path = mkdtemp()
+
+    def teardown(self):
+        rmtree(self.directory_path)
+
+    def test_longest_durations(self):
+        timing_file_path1 = self._write_timing_file(
+            'timings1.json',
+            '{"modules": {"tests.a": 1, "tests.b": 4}}',
+            )
+        timing_file_path2 = self._write_timing_file(
+            'timings2.json',
+            '{"modules": {"tests.a": 2, "tests.c": 3}}',
+            )
+
+        test_module_durations = _load_test_module_durations(
+            [timing_file_path1, timing_file_path2],
+            )
+
+        eq_({'tests.a': 2, 'tests.b': 4, 'tests.c': 3}, test_module_durations)
+
+    def test_missing_timing_file(self):
+        test_module_durations = _load_test_module_durations(
+            [os.path.join(self.directory_path, 'missing.json')],
+            )
+
+        eq_({}, test_module_durations)
+
+    def _write_timing_file(self, file_name, file_contents):
+        timing_file_path = os.path.join(self.directory_path, file_name)
+        with open(timing_file_path, 'w') as timing_file:
+            timing_file.write(file_contents)
+        return timing_file_path
+
+
+class TestCloneAllocation(object):
+
+    def setup(self):
+        self.original_worker_process_ids_by_clone = \
+            django_testing._WORKER_PROCESS_IDS_BY_CLONE
+        django_testing._WORKER_PROCESS_IDS_BY_CLONE = Array('i', 2)
+
+        self.clone_numbers = Queue()
+        self.release_event = Event()
+
+    def teardown(self):
+        django_testing._WORKER_PROCESS_IDS_BY_CLONE = \
+            self.original_worker_process_ids_by_clone
+
+    def test_distinct_clones(self):
+        workers = [self._start_worker(), self._start_worker()]
+        clone_numbers = [self.clone_numbers.get(timeout=5) for _ in workers]
+        self.release_event.set()
+        for worker in workers:
+            worker.join()
+
+        eq_([1, 2], sorted(clone_numbers))
+
+    def test_released_clone(self):
+        self.release_event.set()
+        worker = self._start_worker()
+        clone_number = self.clone_numbers.get(timeout=5)
+        worker.join()
+
+        eq_(1, clone_number)
+        eq_([0, 0], list(django_testing._WORKER_PROCESS_IDS_BY_CLONE))
+
+    def test_clone_of_dead_worker(self):
+        dead_worker = Process(target=_do_nothing)
+        dead_worker.start()
+        dead_worker.join()
+        django_testing._WORKER_PROCESS_IDS_BY_CLONE[0] = os.getpid()
+        django_testing._WORKER_PROCESS_IDS_BY_CLONE[1] = dead_worker.pid
+
+        self.release_event.set()
+        worker = self._start_worker()
+        clone_number = self.clone_numbers.get(timeout=5)
+        worker.join()
+
+        eq_(2, clone_number)
+
+    def _start_worker(self):
+        worker = Process(
+            target=_report_clone_allocated,
+            args=(self.clone_numbers, self.release_event),
+            )
+        worker.start()
+        return worker
+
+
+class TestFixtureFiles(_BaseInstalledAppTestCase):
+
+    def test_application_fixture(self):
+        fixture_file_path = self._write_fixture_file(
+            '%s/fixtures/groups.json' % _APP_NAME,
+            )
+
+        eq_([fixture_file_path], _get_fixture_file_paths(['groups']))
+
+    def test_fixture_directory(self):
+        fixture_file_path = self._write_fixture_file('fixtures/groups.json')
+
+        eq_([fixture_file_path], _get_fixture_file_paths(['groups']))
+
+    def test_application_fixture_before_fixture_directory(self):
+        application_fixture_file_path = self._write_fixture_file(
+            '%s/fixtures/groups.json' % _APP_NAME,
+            )
+        fixture_file_path = self._write_fixture_file('fixtures/groups.json')
+
+        eq_(
+            [application_fixture_file_path, fixture_file_path],
+            _get_fixture_file_paths(['groups']),
+            )
+
+    def test_fixture_file_name_suffixes(self):
+        fixture_file_paths = [
+            self._write_fixture_file('fixtures/groups'),
+            self._write_fixture_file('fixtures/groups.default.json.gz'),
+            self._write_fixture_file('fixtures/groups.json'),
+            self._write_fixture_file('fixtures/groups.json.bz2'),
+            ]
+
+        eq_(fixture_file_paths, _get_fixture_file_paths(['groups']))
+
+    def test_label_with_suffix(self):
+        fixture_file_path = self._write_fixture_file('fixtures/groups.json')
+        self._write_fixture_file('fixtures/groups.xml')
+
+        eq_([fixture_file_path], _get_fixture_file_paths(['groups.json']))
+
+    def test_unrelated_files(self):
+        self._write_fixture_file('fixtures/groupsx.json')
+        self._write_fixture_file('fixtures/groups.txt')
+        self._write_fixture_file('fixtures/users.json')
+
+        eq_([], _get_fixture_file_paths(['groups']))
+
+    def test_label_in_subdirectory(self):
+        fixture_file_path = self._write_fixture_file(
+            'fixtures/auth/groups.json',
+            )
+        self._write_fixture_file('fixtures/groups.json')
+
+        eq_([fixture_file_path], _get_fixture_file_paths(['auth/groups']))
+
+    def test_absolute_label(self):
+        fixture_file_path = self._write_fixture_file('elsewhere/groups.json')
+        self._write_fixture_file('fixtures/groups.json')
+
+        fixture_label = os.path.join(self.directory_path, 'elsewhere/groups')
+        eq_([fixture_file_path], _get_fixture_file_paths([fixture_label]))
+
+    def test_missing_fixture_directories(self):
+        eq_([], _get_fixture_file_paths(['groups']))
+
+    def test_changed_fixture_file(self):
+        self._write_fixture_file('fixtures/groups.json')
+        fingerprint = _get_fixture_fingerprint(['groups'], 'database')
+        self._write_file('fixtures/groups.json', '[{}]')
+
+        ok_(fingerprint != _get_fixture_fingerprint(['groups'], 'database'))
+
+    def test_changed_database_fingerprint(self):
+        self._write_fixture_file('fixtures/groups.json')
+
+        ok_(
+            _get_fixture_fingerprint(['groups'], 'database1') !=
+            _get_fixture_fingerprint(['groups'], 'database2')
+            )
+
+    def _write_fixture_file(self, relative_file_path):
+        self._write_file(relative_file_path, '[]')
+        return os.path.join(self.directory_path, relative_file_path)
+
+
+def _report_clone_allocated(clone_numbers, release_event):
+    clone_numbers.put(_allocate_clone())
+    release_event.wait(5)
+
+
+def _do_nothing():
+    pass
@@ -0,0 +1,193 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+import gc
+
+from nose.tools import assert_false
+from nose.tools import assert_in
+from nose.tools import assert_not_in
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings import get_configured_django_wsgi_app
+from django_pastedeploy_settings.forking import compact_options
+from django_pastedeploy_settings.forking import freeze_loaded_objects
+from django_pastedeploy_settings.forking import get_memory_usage
+from django_pastedeploy_settings.instrumentation import add_startup_listener
+from django_pastedeploy_settings.instrumentation import \
+    remove_startup_listener
+
+from tests.mock_django_settings import fork_friendly_settings_module
+from tests.utils import BaseDjangoTestCase
+from tests.utils import get_global_conf
+
+
+class TestCompaction(object):
+
+    def test_lists(self):
+        options = compact_options({'SETTING': [1, [2, 3]]})
+
+        eq_((1, (2, 3)), options['SETTING'])
+        ok_(isinstance(options['SETTING'][1], tuple))
+
+    def test_dictionaries(self):
+        options = compact_options({'SETTING': {'a': {'b': [1]}}})
+
+        eq_({'a': {'b': (1, )}}, options['SETTING'])
+        eq_(dict, type(options['SETTING']))
+        eq_(dict, type(options['SETTING']['a']))
+
+    def test_atomic_values(self):
+        original_options = {'A': None, 'B': True, 'C': 1.5, 'D': u'value'}
+
+        eq_(original_options, compact_options(original_options))
+
+    def test_equal_values_shared(self):
+        options = compact_options({
+            'A': [u'value', [1, 2]],
+            'B': {'key': [1, 2]},
+            'C': u'value',
+            })
+
+        ok_(options['A'][1] is options['B']['key'])
+        ok_(options['A'][0] is options['C'])
+
+    def test_equal_dictionaries_not_shared(self):
+        options = compact_options({'A': {'key': 1}, 'B': [{'key': 1}]})
+
+        ok_(options['A'] is not options['B'][0])
+
+    def test_unicode_strings_shared(self):
+        options = compact_options({
+            'A': u''.join([u'not', u' interned']),
+            'B': {u''.join([u'not', u' interned']): 1},
+            })
+
+        ok_(options['A'] is options['B'].keys()[0])
+
+    def test_equal_values_of_different_types(self):
+        options = compact_options({'A': [True], 'B': [1], 'C': [1.0]})
+
+        ok_(options['A'][0] is True)
+        eq_(int, type(options['B'][0]))
+        eq_(float, type(options['C'][0]))
+
+    def test_byte_strings_interned(self):
+        value = ''.join(['not', ' interned'])
+        options = compact_options({'SETTING': value})
+
+        ok_(options['SETTING'] is intern('not interned'))
+
+    def test_mutable_options(self):
+        databases = {'default': {'NAME': 'db'}}
+        options = compact_options(
+            {'DATABASES': databases, 'SETTING': {}},
+            ['DATABASES'],
+            )
+
+        ok_(options['DATABASES'] is databases)
+
+
+class TestForkFriendlySettings(BaseDjangoTestCase):
+
+    setup_fixture = False
+
+    def setup(self):
+        super(TestForkFriendlySettings, self).setup()
+
+        self.startup_reports = []
+        add_startup_listener(self.startup_reports.append)
+
+    def teardown(self):
+        remove_startup_listener(self.startup_reports.append)
+
+        for setting_name in dir(fork_friendly_settings_module):
+            if setting_name.isupper():
+                delattr(fork_friendly_settings_module, setting_name)
+
+        super(TestForkFriendlySettings, self).teardown()
+
+    def test_disabled_by_default(self):
+        self._load_app({}, SETTING='[1, 2]')
+
+        eq_([1, 2], fork_friendly_settings_module.SETTING)
+        phase_names = self._get_phase_names()
+        assert_not_in('compaction', phase_names)
+        assert_not_in('garbage_collection', phase_names)
+
+    def test_enabled(self):
+        self._load_app(
+            {'fork_friendly_settings': 'true'},
+            SETTING='[1, 2]',
+            DATABASES='{"default": {"NAME": "db"}}',
+            )
+
+        eq_((1, 2), fork_friendly_settings_module.SETTING)
+        eq_(dict, type(fork_friendly_settings_module.DATABASES))
+        phase_names = self._get_phase_names()
+        assert_in('compaction', phase_names)
+        assert_in('garbage_collection', phase_names)
+
+    def test_mutable_settings(self):
+        self._load_app(
+            {'fork_friendly_settings': 'true', 'mutable_settings': 'SETTING'},
+            SETTING='[1, 2]',
+            DATABASES='{"default": {"NAME": "db", "OPTIONS": {"a": [1]}}}',
+            )
+
+        eq_([1, 2], fork_friendly_settings_module.SETTING)
+        eq_(
+            (1, ),
+            fork_friendly_settings_module.DATABASES['default']['OPTIONS']['a'],
+            )
+
+    def _get_phase_names(self):
+        startup_report = self.startup_reports[0]
+        phase_names = [
+            phase_timing.name for phase_timing in startup_report.phase_timings
+            ]
+        return phase_names
+
+    @staticmethod
+    def _load_app(extra_global_conf, **local_conf):
+        global_conf = get_global_conf(
+            'fork_friendly_settings_module',
+            **extra_global_conf
+            )
+        get_configured_django_wsgi_app(
+            global_conf,
+            SECRET_KEY='"secret"',
+            WSGI_APPLICATION='"tests.utils.MOCK_WSGI_APP"',
+            **local_conf
+            )
+
+
+def test_garbage_collector_freezing():
+    options = compact_options({
+        'SETTING': [u'value', [1, [2, [3]]]],
+        'OTHER_SETTING': {'key': [1, [2, [3]]]},
+        })
+
+    freeze_loaded_objects()
+
+    assert_false(gc.is_tracked(options['SETTING']))
+    assert_false(gc.is_tracked(options['OTHER_SETTING']))
+
+
+def test_memory_usage():
+    memory_usage = get_memory_usage()
+
+    ok_(0 < memory_usage.private_byte_count)
+    ok_(0 <= memory_usage.shared_byte_count)
@@ -0,0 +1,88 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from imp import load_source
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from nose.tools import assert_false
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings.freezing import freeze_django_settings
+
+from tests.utils import get_global_conf
+from tests.utils import get_local_conf
+
+
+class TestSettingsFreezing(object):
+    """
+    The settings are frozen once for all the tests because freezing them
+    alters the original settings module.
+
+    """
+
+    @classmethod
+    def setup_class(cls):
+        cls.temporary_directory_path = mkdtemp()
+        cls.frozen_module_path = os.path.join(
+            cls.temporary_directory_path,
+            'frozen_settings.py',
+            )
+
+        global_conf = get_global_conf(
+            'frozen_source_module',
+            DEFAULT_SETTING='raw value',
+            )
+        local_conf = get_local_conf(
+            INSTALLED_APPS=['app2'],
+            CUSTOM_SETTING={'key': [1, 2]},
+            )
+        freeze_django_settings(global_conf, local_conf, cls.frozen_module_path)
+
+        cls.frozen_module = \
+            load_source('frozen_settings', cls.frozen_module_path)
+
+    @classmethod
+    def teardown_class(cls):
+        rmtree(cls.temporary_directory_path)
+        del os.environ['DJANGO_SETTINGS_MODULE']
+
+    def test_bytecode(self):
+        ok_(os.path.exists(self.frozen_module_path + 'c'))
+
+    def test_default_section_settings(self):
+        eq_('raw value', self.frozen_module.DEFAULT_SETTING)
+
+    def test_decoded_settings(self):
+        eq_({'key': [1, 2]}, self.frozen_module.CUSTOM_SETTING)
+        eq_(True, self.frozen_module.DEBUG)
+
+    def test_merged_settings(self):
+        eq_(('app1', 'app2'), self.frozen_module.INSTALLED_APPS)
+
+    def test_unchanged_settings(self):
+        from tests.mock_django_settings import frozen_source_module
+
+        eq_(
+            frozen_source_module.UNCHANGED_SETTING,
+            self.frozen_module.UNCHANGED_SETTING,
+            )
+        eq_('It is a secret', self.frozen_module.SECRET_KEY)
+
+        with open(self.frozen_module_path) as frozen_module_file:
+            frozen_module_source = frozen_module_file.read()
+        assert_false('UNCHANGED_SETTING' in frozen_module_source)
@@ -0,0 +1,320 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+import threading
+from time import sleep
+
+from django.core.signals import request_started
+
+from nose.tools import assert_false
+from nose.tools import assert_raises_regexp
+from nose.tools import eq_
+from nose.tools import ok_
+from paste.deploy.loadwsgi import appconfig
+
+from django_pastedeploy_settings import _get_settings_reloader
+from django_pastedeploy_settings import _set_up_settings
+from django_pastedeploy_settings import InvalidSettingValueError
+from django_pastedeploy_settings.hot_reload import FileWatcher
+
+from tests.mock_django_settings import reloaded_settings_module
+from tests.utils import BaseDjangoTestCase
+from tests.utils import get_global_conf
+
+
+_CONFIG_FILE_TEMPLATE = """\
+[DEFAULT]
+debug = %(debug)s
+django_settings_module = tests.mock_django_settings.reloaded_settings_module
+hot_reload_interval = 3600
+hot_reloadable_settings =
+    ALLOWED_HOSTS CACHE_TIMEOUT DEBUG EMAIL_SUBJECT_PREFIX
+domain = %(domain)s
+
+[app:main]
+paste.app_factory = django_pastedeploy_settings:get_configured_django_wsgi_app
+SECRET_KEY = "secret"
+ALLOWED_HOSTS = ["${domain}"]
+CACHE_TIMEOUT = %(cache_timeout)s
+TIME_ZONE = "%(time_zone)s"
+"""
+
+
+class TestFileWatcher(object):
+
+    def setup(self):
+        self.temporary_directory_path = mkdtemp()
+        self.file_path = os.path.join(self.temporary_directory_path, 'file')
+        _write_file(self.file_path, 'original')
+
+        self.callback_calls = []
+        self.file_watcher = FileWatcher(
+            self.file_path,
+            lambda: self.callback_calls.append(None),
+            0.01,
+            )
+
+    def teardown(self):
+        self.file_watcher.stop()
+        rmtree(self.temporary_directory_path)
+
+    def test_unchanged_file(self):
+        assert_false(self.file_watcher.check())
+        eq_(0, len(self.callback_calls))
+
+    def test_changed_file(self):
+        _write_file(self.file_path, 'changed')
+
+        ok_(self.file_watcher.check())
+        eq_(1, len(self.callback_calls))
+
+        assert_false(self.file_watcher.check())
+        eq_(1, len(self.callback_calls))
+
+    def test_missing_file(self):
+        os.remove(self.file_path)
+
+        assert_false(self.file_watcher.check())
+        eq_(0, len(self.callback_calls))
+
+    def test_failing_callback(self):
+        def callback():
+            raise ValueError()
+        file_watcher = FileWatcher(self.file_path, callback, 0.01)
+        _write_file(self.file_path, 'changed')
+
+        ok_(file_watcher.check())
+
+    def test_polling(self):
+        self.file_watcher.start()
+        _write_file(self.file_path, 'changed')
+
+        for _ in range(500):
+            if self.callback_calls:
+                break
+            sleep(0.01)
+        eq_(1, len(self.callback_calls))
+
+
+class _BaseSettingsReloaderTestCase(BaseDjangoTestCase):
+
+    setup_fixture = False
+
+    def setup(self):
+        super(_BaseSettingsReloaderTestCase, self).setup()
+
+        self.temporary_directory_path = mkdtemp()
+        self.config_file_path = \
+            os.path.join(self.temporary_directory_path, 'config.ini')
+        self._write_config_file()
+
+        app_config = appconfig('config:' + self.config_file_path)
+        self.settings_reloader = _get_settings_reloader(app_config.global_conf)
+        _set_up_settings(app_config.global_conf, app_config.local_conf)
+        self.settings_reloader.start(app_config.local_conf)
+
+    def teardown(self):
+        self.settings_reloader.stop()
+        rmtree(self.temporary_directory_path)
+
+        for setting_name in dir(reloaded_settings_module):
+            if not setting_name.startswith('_'):
+                delattr(reloaded_settings_module, setting_name)
+        reload(reloaded_settings_module)
+
+        super(_BaseSettingsReloaderTestCase, self).teardown()
+
+    def _write_config_file(
+        self,
+        domain='example.com',
+        cache_timeout=300,
+        time_zone='UTC',
+        debug='false',
+        ):
+        config_file_contents = _CONFIG_FILE_TEMPLATE % {
+            'domain': domain,
+            'cache_timeout': cache_timeout,
+            'time_zone': time_zone,
+            'debug': debug,
+            }
+        if cache_timeout is None:
+            config_file_contents = config_file_contents.replace(
+                'CACHE_TIMEOUT = None\n',
+                '',
+                )
+        if debug is None:
+            config_file_contents = \
+                config_file_contents.replace('debug = None\n', '')
+        _write_file(self.config_file_path, config_file_contents)
+
+
+class TestSettingsReloading(_BaseSettingsReloaderTestCase):
+
+    def test_unchanged_options(self):
+        self._write_config_file()
+
+        eq_(set(), self.settings_reloader.reload())
+        eq_([], self.logs['info'])
+
+    def test_changed_option(self):
+        self._write_config_file(cache_timeout=600)
+
+        eq_(set(['CACHE_TIMEOUT']), self.settings_reloader.reload())
+        eq_(600, reloaded_settings_module.CACHE_TIMEOUT)
+        eq_(1, len(self.logs['info']))
+        ok_(self.logs['info'][0].startswith('Settings CACHE_TIMEOUT reloaded'))
+
+    def test_changed_variable(self):
+        """The options referencing a changed variable are reloaded."""
+        self._write_config_file(domain='example.org')
+
+        eq_(set(['ALLOWED_HOSTS']), self.settings_reloader.reload())
+        eq_(
+            ('localhost', 'example.org'),
+            reloaded_settings_module.ALLOWED_HOSTS,
+            )
+
+    def test_django_settings(self):
+        from django.conf import settings
+        eq_(300, settings.CACHE_TIMEOUT)
+
+        self._write_config_file(cache_timeout=600)
+        self.settings_reloader.reload()
+
+        eq_(600, settings.CACHE_TIMEOUT)
+
+    def test_removed_option(self):
+        from django.conf import settings
+        settings.CACHE_TIMEOUT
+
+        self._write_config_file(cache_timeout=None)
+        self.settings_reloader.reload()
+
+        assert_false(hasattr(reloaded_settings_module, 'CACHE_TIMEOUT'))
+        ok_(not hasattr(settings, 'CACHE_TIMEOUT'))
+
+    def test_removed_debug_option(self):
+        from django.conf import settings
+
+        self._write_config_file(debug=None)
+
+        eq_(set(['DEBUG']), self.settings_reloader.reload())
+        assert_false(hasattr(reloaded_settings_module, 'DEBUG'))
+        eq_(False, settings.DEBUG)
+
+    def test_non_hot_reloadable_option(self):
+        self._write_config_file(time_zone='Europe/Madrid')
+
+        eq_(set(), self.settings_reloader.reload())
+        eq_('UTC', reloaded_settings_module.TIME_ZONE)
+        eq_(1, len(self.logs['warning']))
+        ok_('TIME_ZONE' in self.logs['warning'][0])
+
+    def test_invalid_option(self):
+        self._write_config_file(cache_timeout='forever')
+
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'CACHE_TIMEOUT',
+            self.settings_reloader.reload,
+            )
+        eq_(300, reloaded_settings_module.CACHE_TIMEOUT)
+
+
+class TestFileWatching(_BaseSettingsReloaderTestCase):
+    """Tests for the start of the file watcher in each process."""
+
+    def test_watcher_not_started_before_first_request(self):
+        eq_(0, _get_file_watcher_thread_count())
+
+    def test_watcher_started_on_first_request(self):
+        request_started.send(sender=None)
+        request_started.send(sender=None)
+
+        eq_(1, _get_file_watcher_thread_count())
+
+    def test_watcher_started_in_forked_process(self):
+        request_started.send(sender=None)
+
+        child_process_id = os.fork()
+        if not child_process_id:
+            # The thread of the parent process is not running here
+            thread_count_before_request = _get_file_watcher_thread_count()
+            request_started.send(sender=None)
+            thread_count_after_request = _get_file_watcher_thread_count()
+            is_watcher_started = thread_count_before_request == 0 and \
+                thread_count_after_request == 1
+            os._exit(0 if is_watcher_started else 1)
+
+        exit_status = os.waitpid(child_process_id, 0)[1]
+        eq_(0, exit_status)
+
+    def test_watcher_stopped(self):
+        request_started.send(sender=None)
+
+        self.settings_reloader.stop()
+
+        eq_(0, _get_file_watcher_thread_count())
+        request_started.send(sender=None)
+        eq_(0, _get_file_watcher_thread_count())
+
+
+class TestSettingsReloaderRetrieval(object):
+
+    def test_disabled(self):
+        global_conf = get_global_conf(
+            'reloaded_settings_module',
+            __file__='config.ini',
+            )
+
+        eq_(None, _get_settings_reloader(global_conf))
+
+    def test_without_config_file(self):
+        global_conf = get_global_conf(
+            'reloaded_settings_module',
+            hot_reload_interval='1',
+            )
+
+        eq_(None, _get_settings_reloader(global_conf))
+
+    def test_invalid_interval(self):
+        global_conf = get_global_conf(
+            'reloaded_settings_module',
+            __file__='config.ini',
+            hot_reload_interval='often',
+            )
+
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'hot_reload_interval',
+            _get_settings_reloader,
+            global_conf,
+            )
+
+
+def _get_file_watcher_thread_count():
+    file_watcher_threads = [
+        thread for thread in threading.enumerate()
+        if thread.name.startswith('FileWatcher(') and thread.is_alive()
+        ]
+    return len(file_watcher_threads)
+
+
+def _write_file(file_path, file_contents):
+    with open(file_path, 'w') as file_:
+        file_.write(file_contents)
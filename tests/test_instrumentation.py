@@ -0,0 +1,137 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from nose.tools import assert_false
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings import get_configured_django_wsgi_app
+from django_pastedeploy_settings.instrumentation import add_startup_listener
+from django_pastedeploy_settings.instrumentation import get_startup_recorder
+from django_pastedeploy_settings.instrumentation import log_startup_report
+from django_pastedeploy_settings.instrumentation import \
+    remove_startup_listener
+
+from tests.mock_django_settings import instrumented_settings_module
+from tests.utils import BaseDjangoTestCase
+from tests.utils import get_global_conf
+
+
+class TestStartupInstrumentation(BaseDjangoTestCase):
+
+    setup_fixture = False
+
+    def setup(self):
+        super(TestStartupInstrumentation, self).setup()
+
+        self.startup_reports = []
+        add_startup_listener(self.startup_reports.append)
+
+    def teardown(self):
+        remove_startup_listener(self.startup_reports.append)
+
+        for setting_name in dir(instrumented_settings_module):
+            if setting_name.isupper():
+                delattr(instrumented_settings_module, setting_name)
+
+        super(TestStartupInstrumentation, self).teardown()
+
+    def test_phases(self):
+        self._load_app()
+
+        eq_(1, len(self.startup_reports))
+        startup_report = self.startup_reports[0]
+        phase_names = [
+            phase_timing.name for phase_timing in startup_report.phase_timings
+            ]
+        eq_(
+            [
+                'settings_module_import',
+                'default_section',
+                'validation',
+                'dereferencing',
+                'decoding',
+                'storage',
+                'wsgi_application',
+                ],
+            phase_names,
+            )
+        for phase_timing in startup_report.phase_timings:
+            ok_(0 <= phase_timing.wall_time)
+            ok_(0 <= phase_timing.cpu_time)
+
+    def test_counts(self):
+        self._load_app(SETTING='"value"')
+
+        startup_report = self.startup_reports[0]
+        # DEBUG, SECRET_KEY, WSGI_APPLICATION and SETTING
+        eq_(4, startup_report.option_count)
+        eq_(
+            len('true') + len('"secret"') +
+                len('"tests.utils.MOCK_WSGI_APP"') + len('"value"'),
+            startup_report.decoded_byte_count,
+            )
+
+    def test_report_as_dict(self):
+        self._load_app()
+
+        startup_report = self.startup_reports[0]
+        startup_report_dict = startup_report.as_dict()
+        eq_(startup_report.wall_time, startup_report_dict['wall_time'])
+        eq_(startup_report.cpu_time, startup_report_dict['cpu_time'])
+        eq_(startup_report.option_count, startup_report_dict['option_count'])
+        eq_(
+            len(startup_report.phase_timings),
+            len(startup_report_dict['phases']),
+            )
+
+    def test_logging_listener(self):
+        add_startup_listener(log_startup_report)
+        try:
+            self._load_app()
+        finally:
+            remove_startup_listener(log_startup_report)
+
+        eq_(1, len(self.logs['info']))
+        ok_(self.logs['info'][0].startswith('Application loaded in '))
+
+    def test_failing_listener(self):
+        def fail(startup_report):
+            raise RuntimeError()
+
+        add_startup_listener(fail)
+        try:
+            self._load_app()
+        finally:
+            remove_startup_listener(fail)
+
+        eq_(1, len(self.logs['error']))
+        # The other listeners are still called
+        eq_(1, len(self.startup_reports))
+
+    @staticmethod
+    def _load_app(**local_conf):
+        global_conf = get_global_conf('instrumented_settings_module')
+        get_configured_django_wsgi_app(
+            global_conf,
+            SECRET_KEY='"secret"',
+            WSGI_APPLICATION='"tests.utils.MOCK_WSGI_APP"',
+            **local_conf
+            )
+
+
+def test_no_recording_without_listeners():
+    startup_recorder = get_startup_recorder()
+    assert_false(startup_recorder.is_recording)
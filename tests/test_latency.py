@@ -0,0 +1,351 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from json import loads as parse_json
+import signal
+
+from nose.tools import assert_not_in
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings.factories import \
+    make_latency_histogram_filter
+from django_pastedeploy_settings.latency import LatencyHistogram
+from django_pastedeploy_settings.latency import LatencyHistogramMiddleware
+
+from tests.utils import LoggingHandlerFixture
+from tests.utils import MockApp
+
+
+class TestLatencyHistogram(object):
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+
+        eq_(0, histogram.count)
+        eq_(0, histogram.get_percentile(50))
+
+    def test_low_latencies(self):
+        histogram = LatencyHistogram()
+        for latency in range(1, 11):
+            histogram.record(latency)
+
+        eq_(10, histogram.count)
+        eq_(5, histogram.get_percentile(50))
+        eq_(9, histogram.get_percentile(90))
+        eq_(10, histogram.get_percentile(100))
+
+    def test_relative_error(self):
+        histogram = LatencyHistogram()
+        for latency in range(1, 100001):
+            histogram.record(latency)
+
+        for percentile in (1, 50, 90, 99, 99.9):
+            exact_latency = 100000 * percentile / 100.0
+            latency = histogram.get_percentile(percentile)
+            ok_(exact_latency <= latency <= exact_latency * (1 + 2 ** -4))
+        eq_(100000, histogram.get_percentile(100))
+
+    def test_maximum(self):
+        histogram = LatencyHistogram()
+        histogram.record(1234)
+        histogram.record(17)
+
+        eq_(1234, histogram.maximum)
+        # The end of the bucket is beyond the maximum
+        eq_(1234, histogram.get_percentile(100))
+
+    def test_latency_beyond_maximum(self):
+        histogram = LatencyHistogram(maximum_bits=10)
+        histogram.record(10 ** 9)
+
+        eq_(1023, histogram.get_percentile(100))
+
+
+class TestLatencyHistogramMiddleware(object):
+
+    def setup(self):
+        self.app = MockApp('200 OK', [])
+        self.middleware = LatencyHistogramMiddleware(
+            self.app,
+            ['/api', '/api/v2'],
+            '/_latency',
+            'secret',
+            )
+
+    def test_latency_recorded_when_response_closed(self):
+        app_iter = _make_request(self.middleware, '/page')
+
+        eq_(['body'], list(app_iter))
+        eq_({}, self.middleware.get_stats())
+
+        app_iter.close()
+
+        stats = self.middleware.get_stats()
+        eq_(['*'], stats.keys())
+        eq_(['2xx'], stats['*'].keys())
+        eq_(1, stats['*']['2xx']['count'])
+
+    def test_route_prefixes(self):
+        _make_complete_request(self.middleware, '/api/v2/users')
+        _make_complete_request(self.middleware, '/api/v1/users')
+        _make_complete_request(self.middleware, '/api/v1/users')
+
+        stats = self.middleware.get_stats()
+        eq_(1, stats['/api/v2']['2xx']['count'])
+        eq_(2, stats['/api']['2xx']['count'])
+
+    def test_route_prefix_segments(self):
+        _make_complete_request(self.middleware, '/api')
+        _make_complete_request(self.middleware, '/apiary')
+        _make_complete_request(self.middleware, '/api/v20/users')
+
+        stats = self.middleware.get_stats()
+        eq_(2, stats['/api']['2xx']['count'])
+        eq_(1, stats['*']['2xx']['count'])
+        assert_not_in('/api/v2', stats)
+
+    def test_status_classes(self):
+        _make_complete_request(self.middleware, '/page')
+        self.app.status = '404 Not Found'
+        _make_complete_request(self.middleware, '/page')
+
+        stats = self.middleware.get_stats()
+        eq_(1, stats['*']['2xx']['count'])
+        eq_(1, stats['*']['4xx']['count'])
+
+    def test_percentiles(self):
+        _make_complete_request(self.middleware, '/page')
+
+        histogram_stats = self.middleware.get_stats()['*']['2xx']
+        eq_(
+            set(['count', 'max', 'p50', 'p90', 'p99', 'p99.9']),
+            set(histogram_stats),
+            )
+        ok_(0 <= histogram_stats['p50'] <= histogram_stats['max'])
+
+    def test_original_response_closed(self):
+        app_iter = _ClosableAppIter()
+        middleware = LatencyHistogramMiddleware(lambda e, s: app_iter)
+
+        _make_complete_request(middleware, '/page')
+
+        ok_(app_iter.is_closed)
+
+    def test_app_failure(self):
+        def fail(environ, start_response):
+            raise RuntimeError()
+
+        middleware = LatencyHistogramMiddleware(fail)
+
+        assert_raises(RuntimeError, _make_request, middleware, '/page')
+        eq_(1, middleware.get_stats()['*']['5xx']['count'])
+
+    def test_file_wrapper(self):
+        app_iter = _FileWrapper()
+        middleware = LatencyHistogramMiddleware(lambda e, s: app_iter)
+
+        response = _make_request(
+            middleware,
+            '/page',
+            **{'wsgi.file_wrapper': _FileWrapper}
+            )
+
+        ok_(app_iter is response)
+        eq_(1, middleware.get_stats()['*']['unknown']['count'])
+
+    def test_stats_served_with_secret(self):
+        _make_complete_request(self.middleware, '/page')
+
+        statuses = []
+        body = ''.join(
+            _make_request(
+                self.middleware,
+                '/_latency',
+                statuses,
+                HTTP_X_STATS_SECRET='secret',
+                ),
+            )
+
+        eq_(['200 OK'], statuses)
+        eq_(self.middleware.get_stats(), parse_json(body))
+        # The request was not passed on
+        eq_('/page', self.app.environ['PATH_INFO'])
+
+    def test_stats_forbidden_without_secret(self):
+        statuses = []
+        # As proxied by a reverse proxy on the local host
+        _make_request(
+            self.middleware,
+            '/_latency',
+            statuses,
+            REMOTE_ADDR='127.0.0.1',
+            HTTP_X_FORWARDED_FOR='192.0.2.1',
+            )
+
+        eq_(['403 Forbidden'], statuses)
+
+    def test_stats_forbidden_with_wrong_secret(self):
+        statuses = []
+        _make_request(
+            self.middleware,
+            '/_latency',
+            statuses,
+            HTTP_X_STATS_SECRET='guess',
+            )
+
+        eq_(['403 Forbidden'], statuses)
+
+    def test_stats_path_without_secret(self):
+        assert_raises(
+            ValueError,
+            LatencyHistogramMiddleware,
+            self.app,
+            stats_path='/_latency',
+            )
+
+    def test_stats_logged(self):
+        logging_handler = LoggingHandlerFixture()
+        try:
+            _make_complete_request(self.middleware, '/page')
+            self.middleware.log_stats(signal.SIGUSR2, None)
+        finally:
+            logging_handler.undo()
+
+        info_messages = logging_handler.handler.messages['info']
+        eq_(1, len(info_messages))
+        ok_(info_messages[0].startswith('Request latencies in milliseconds'))
+
+
+class TestFilterFactory(object):
+
+    def test_options(self):
+        filter_ = make_latency_histogram_filter(
+            {},
+            route_prefixes='/api\n/admin',
+            stats_path='/_latency',
+            stats_secret='secret',
+            )
+        middleware = filter_(MOCK_APP)
+        _make_complete_request(middleware, '/admin/users/')
+
+        eq_(MOCK_APP, middleware.app)
+        eq_('/_latency', middleware.stats_path)
+        eq_('secret', middleware.stats_secret)
+        eq_(['/admin'], middleware.get_stats().keys())
+
+    def test_defaults(self):
+        middleware = make_latency_histogram_filter({})(MOCK_APP)
+        _make_complete_request(middleware, '/admin/users/')
+
+        eq_(None, middleware.stats_path)
+        eq_(None, middleware.stats_secret)
+        eq_(['*'], middleware.get_stats().keys())
+
+    def test_stats_path_without_secret(self):
+        assert_raises(
+            ValueError,
+            make_latency_histogram_filter,
+            {},
+            stats_path='/_latency',
+            )
+
+    def test_dump_signal(self):
+        original_signal_handler = signal.getsignal(signal.SIGUSR2)
+        try:
+            filter_ = make_latency_histogram_filter({}, dump_signal='sigusr2')
+            middleware = filter_(MOCK_APP)
+
+            eq_(middleware.log_stats, signal.getsignal(signal.SIGUSR2))
+        finally:
+            signal.signal(signal.SIGUSR2, original_signal_handler)
+
+    def test_dump_signal_handler_chained(self):
+        original_signal_handler = signal.getsignal(signal.SIGUSR2)
+        signal_numbers = []
+        logging_handler = LoggingHandlerFixture()
+        try:
+            signal.signal(
+                signal.SIGUSR2,
+                lambda signal_number, frame: signal_numbers.append(
+                    signal_number,
+                    ),
+                )
+            filter_ = make_latency_histogram_filter({}, dump_signal='sigusr2')
+            filter_(MOCK_APP)
+
+            signal.getsignal(signal.SIGUSR2)(signal.SIGUSR2, None)
+        finally:
+            signal.signal(signal.SIGUSR2, original_signal_handler)
+            logging_handler.undo()
+
+        eq_([signal.SIGUSR2], signal_numbers)
+        eq_(1, len(logging_handler.handler.messages['info']))
+
+    def test_unknown_signal(self):
+        for signal_name in ('SIGFOO', 'SIG_IGN', 'NSIG'):
+            assert_raises(
+                ValueError,
+                make_latency_histogram_filter,
+                {},
+                dump_signal=signal_name,
+                )
+
+
+MOCK_APP = MockApp('200 OK', [])
+
+
+class _ClosableAppIter(object):
+
+    def __init__(self):
+        super(_ClosableAppIter, self).__init__()
+
+        self.is_closed = False
+
+    def __iter__(self):
+        return iter([])
+
+    def close(self):
+        self.is_closed = True
+
+
+class _FileWrapper(object):
+
+    def __iter__(self):
+        return iter([])
+
+
+def _make_request(app, path_info, statuses=None, **extra_environ):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path_info,
+        'REMOTE_ADDR': '127.0.0.1',
+        }
+    environ.update(extra_environ)
+    if statuses is None:
+        statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+
+    return app(environ, start_response)
+
+
+def _make_complete_request(app, path_info):
+    app_iter = _make_request(app, path_info)
+    list(app_iter)
+    app_iter.close()
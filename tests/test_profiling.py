@@ -0,0 +1,308 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+import os
+from pstats import Stats
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings.factories import \
+    make_sampled_profiler_filter
+from django_pastedeploy_settings.profiling import SampledProfilerMiddleware
+
+
+class _BaseProfilingTestCase(object):
+
+    def setup(self):
+        self.profile_directory_path = mkdtemp()
+
+    def teardown(self):
+        rmtree(self.profile_directory_path)
+
+    def _get_profile_file_names(self):
+        return sorted(os.listdir(self.profile_directory_path))
+
+    def _get_profile_stats(self, profile_file_name):
+        profile_file_path = \
+            os.path.join(self.profile_directory_path, profile_file_name)
+        return Stats(profile_file_path)
+
+
+class TestSampledProfilerMiddleware(_BaseProfilingTestCase):
+
+    def test_sampling(self):
+        app = _ProfiledApp()
+        middleware = self._get_middleware(app, sampling_interval=3)
+
+        for _ in range(7):
+            _make_complete_request(middleware, '/page')
+        middleware.flush()
+
+        profile_file_names = self._get_profile_file_names()
+        eq_(1, len(profile_file_names))
+        ok_(profile_file_names[0].startswith('other-'))
+        ok_(profile_file_names[0].endswith('-%s.pstats' % os.getpid()))
+        eq_(2, _get_call_count(
+            self._get_profile_stats(profile_file_names[0]),
+            'handle_request',
+            ))
+        eq_(7, app.request_count)
+
+    def test_response_profiled(self):
+        middleware = \
+            self._get_middleware(_ProfiledApp(), sampling_interval=1)
+
+        _make_complete_request(middleware, '/page')
+        middleware.flush()
+
+        profile_stats = \
+            self._get_profile_stats(self._get_profile_file_names()[0])
+        # Each resumption of the generator counts as a call
+        ok_(0 < _get_call_count(profile_stats, 'generate_body'))
+        eq_(1, _get_call_count(profile_stats, 'close'))
+
+    def test_secret_header(self):
+        middleware = self._get_middleware(
+            _ProfiledApp(),
+            sampling_interval=1000,
+            secret='s3cr3t',
+            )
+
+        _make_complete_request(middleware, '/page')
+        _make_complete_request(middleware, '/page', HTTP_X_PROFILE='wrong')
+        _make_complete_request(middleware, '/page', HTTP_X_PROFILE='s3cr3t')
+        middleware.flush()
+
+        profile_stats = \
+            self._get_profile_stats(self._get_profile_file_names()[0])
+        eq_(1, _get_call_count(profile_stats, 'handle_request'))
+
+    def test_route_prefixes(self):
+        middleware = self._get_middleware(
+            _ProfiledApp(),
+            sampling_interval=1,
+            route_prefixes=['/', '/api/v2'],
+            )
+
+        _make_complete_request(middleware, '/api/v2/users')
+        _make_complete_request(middleware, '/api/v2/groups')
+        _make_complete_request(middleware, '/page')
+        middleware.flush()
+
+        profile_file_names = self._get_profile_file_names()
+        eq_(2, len(profile_file_names))
+        ok_(profile_file_names[0].startswith('api_v2-'))
+        ok_(profile_file_names[1].startswith('root-'))
+        eq_(2, _get_call_count(
+            self._get_profile_stats(profile_file_names[0]),
+            'handle_request',
+            ))
+
+    def test_route_prefix_name_collision(self):
+        for route_prefixes in (['/a-b', '/a_b'], ['/', '/root']):
+            assert_raises(
+                ValueError,
+                self._get_middleware,
+                _ProfiledApp(),
+                route_prefixes=route_prefixes,
+                )
+
+    def test_route_prefix_named_like_unmatched_requests(self):
+        assert_raises(
+            ValueError,
+            self._get_middleware,
+            _ProfiledApp(),
+            route_prefixes=['/other/'],
+            )
+
+    def test_duplicated_route_prefix(self):
+        middleware = self._get_middleware(
+            _ProfiledApp(),
+            sampling_interval=1,
+            route_prefixes=['/api', '/api'],
+            )
+
+        _make_complete_request(middleware, '/api/users')
+        middleware.flush()
+
+        profile_file_names = self._get_profile_file_names()
+        eq_(1, len(profile_file_names))
+        ok_(profile_file_names[0].startswith('api-'))
+
+    def test_window(self):
+        middleware = self._get_middleware(
+            _ProfiledApp(),
+            sampling_interval=1,
+            window=0,
+            )
+
+        _make_complete_request(middleware, '/page')
+
+        eq_(1, len(self._get_profile_file_names()))
+
+    def test_window_restarted_empty(self):
+        middleware = self._get_middleware(_ProfiledApp(), sampling_interval=1)
+
+        _make_complete_request(middleware, '/page')
+        middleware.flush()
+        for profile_file_name in self._get_profile_file_names():
+            os.remove(
+                os.path.join(self.profile_directory_path, profile_file_name),
+                )
+        _make_complete_request(middleware, '/page')
+        middleware.flush()
+
+        profile_file_names = self._get_profile_file_names()
+        eq_(1, len(profile_file_names))
+        eq_(1, _get_call_count(
+            self._get_profile_stats(profile_file_names[0]),
+            'handle_request',
+            ))
+
+    def test_nothing_to_flush(self):
+        middleware = self._get_middleware(_ProfiledApp())
+
+        middleware.flush()
+
+        eq_([], self._get_profile_file_names())
+
+    def test_app_failure(self):
+        def fail(environ, start_response):
+            raise RuntimeError()
+
+        middleware = self._get_middleware(fail, sampling_interval=1)
+
+        assert_raises(RuntimeError, _make_request, middleware, '/page')
+        middleware.flush()
+        eq_(1, len(self._get_profile_file_names()))
+
+    def test_unwritable_directory(self):
+        middleware = SampledProfilerMiddleware(
+            _ProfiledApp(),
+            os.path.join(self.profile_directory_path, 'missing'),
+            sampling_interval=1,
+            )
+
+        _make_complete_request(middleware, '/page')
+        middleware.flush()
+
+        eq_([], self._get_profile_file_names())
+
+    def _get_middleware(self, app, **options):
+        return SampledProfilerMiddleware(
+            app,
+            self.profile_directory_path,
+            **options
+            )
+
+
+class TestFilterFactory(_BaseProfilingTestCase):
+
+    def test_options(self):
+        filter_ = make_sampled_profiler_filter(
+            {},
+            profile_directory=self.profile_directory_path,
+            sampling_interval='10',
+            profile_secret='s3cr3t',
+            route_prefixes='/api /admin',
+            profile_window='30',
+            )
+        middleware = filter_(_ProfiledApp())
+
+        eq_(self.profile_directory_path, middleware.profile_directory_path)
+        eq_(10, middleware.sampling_interval)
+        eq_('s3cr3t', middleware.secret)
+        eq_(30, middleware.window)
+
+    def test_defaults(self):
+        filter_ = make_sampled_profiler_filter(
+            {},
+            profile_directory=self.profile_directory_path,
+            )
+        middleware = filter_(_ProfiledApp())
+
+        eq_(1000, middleware.sampling_interval)
+        eq_(None, middleware.secret)
+        eq_(60, middleware.window)
+
+    def test_missing_directory(self):
+        assert_raises(ValueError, make_sampled_profiler_filter, {})
+
+    def test_invalid_sampling_interval(self):
+        assert_raises(
+            ValueError,
+            make_sampled_profiler_filter,
+            {},
+            profile_directory=self.profile_directory_path,
+            sampling_interval='0',
+            )
+
+
+class _ProfiledApp(object):
+
+    def __init__(self):
+        super(_ProfiledApp, self).__init__()
+
+        self.request_count = 0
+
+    def __call__(self, environ, start_response):
+        return self.handle_request(environ, start_response)
+
+    def handle_request(self, environ, start_response):
+        self.request_count += 1
+        start_response('200 OK', [])
+        return _ProfiledAppIter()
+
+
+class _ProfiledAppIter(object):
+
+    def __iter__(self):
+        return self.generate_body()
+
+    def generate_body(self):
+        yield 'body'
+
+    def close(self):
+        pass
+
+
+def _get_call_count(profile_stats, function_name):
+    call_count = 0
+    for (_, _, stats_function_name), function_stats in \
+            profile_stats.stats.items():
+        if stats_function_name == function_name:
+            call_count += function_stats[1]
+    return call_count
+
+
+def _make_request(app, path_info, **extra_environ):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path_info,
+        }
+    environ.update(extra_environ)
+    return app(environ, lambda status, headers, exc_info=None: None)
+
+
+def _make_complete_request(app, path_info, **extra_environ):
+    app_iter = _make_request(app, path_info, **extra_environ)
+    list(app_iter)
+    if hasattr(app_iter, 'close'):
+        app_iter.close()
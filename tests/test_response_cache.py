@@ -0,0 +1,521 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+import signal
+from threading import Thread
+from time import sleep
+
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings.factories import \
+    make_latency_histogram_filter
+from django_pastedeploy_settings.factories import make_response_cache_filter
+from django_pastedeploy_settings.response_cache import \
+    ResponseCacheMiddleware
+
+from tests.utils import LoggingHandlerFixture
+
+
+_PUBLIC_HEADERS = [('Cache-Control', 'public, max-age=60')]
+
+_LAST_MODIFIED = 'Wed, 02 Jan 2013 03:04:05 GMT'
+
+
+class TestResponseCacheMiddleware(object):
+
+    def setup(self):
+        self.app = _CountingApp(_PUBLIC_HEADERS)
+        self.middleware = ResponseCacheMiddleware(self.app)
+
+    def test_response_cached(self):
+        first_response = _make_request(self.middleware, '/page')
+        second_response = _make_request(self.middleware, '/page')
+
+        eq_(1, self.app.request_count)
+        eq_(first_response.body, second_response.body)
+        eq_(first_response.status, second_response.status)
+        eq_('0', second_response.headers['Age'])
+        eq_(1, self.middleware.hit_count)
+        eq_(1, self.middleware.miss_count)
+
+    def test_head_request(self):
+        _make_request(self.middleware, '/page')
+        response = _make_request(self.middleware, '/page', 'HEAD')
+
+        eq_(1, self.app.request_count)
+        eq_('', response.body)
+        eq_('public, max-age=60', response.headers['Cache-Control'])
+
+    def test_head_request_not_cached(self):
+        _make_request(self.middleware, '/page', 'HEAD')
+        _make_request(self.middleware, '/page')
+
+        eq_(2, self.app.request_count)
+
+    def test_unsafe_method(self):
+        _make_request(self.middleware, '/page')
+        _make_request(self.middleware, '/page', 'POST')
+
+        eq_(2, self.app.request_count)
+        eq_(1, self.middleware.miss_count)
+
+    def test_query_string(self):
+        _make_request(self.middleware, '/page', QUERY_STRING='a=1')
+        _make_request(self.middleware, '/page', QUERY_STRING='a=2')
+        _make_request(self.middleware, '/page', QUERY_STRING='a=1')
+
+        eq_(2, self.app.request_count)
+
+    def test_host(self):
+        _make_request(self.middleware, '/page', HTTP_HOST='example.com')
+        _make_request(self.middleware, '/page', HTTP_HOST='example.org')
+        _make_request(self.middleware, '/page', HTTP_HOST='EXAMPLE.com')
+
+        eq_(2, self.app.request_count)
+
+    def test_server_name(self):
+        _make_request(self.middleware, '/page', SERVER_NAME='example.com')
+        _make_request(self.middleware, '/page', SERVER_NAME='example.org')
+        _make_request(
+            self.middleware,
+            '/page',
+            SERVER_NAME='example.com',
+            SERVER_PORT='8080',
+            )
+
+        eq_(3, self.app.request_count)
+
+    def test_url_scheme(self):
+        _make_request(self.middleware, '/page')
+        _make_request(self.middleware, '/page', **{'wsgi.url_scheme': 'https'})
+        _make_request(self.middleware, '/page', **{'wsgi.url_scheme': 'http'})
+
+        eq_(2, self.app.request_count)
+
+    def test_vary(self):
+        self.app.headers = \
+            _PUBLIC_HEADERS + [('Vary', 'Accept-Encoding, Accept-Language')]
+
+        _make_request(self.middleware, '/page', HTTP_ACCEPT_LANGUAGE='en')
+        _make_request(self.middleware, '/page', HTTP_ACCEPT_LANGUAGE='es')
+        _make_request(self.middleware, '/page', HTTP_ACCEPT_LANGUAGE='en')
+        _make_request(
+            self.middleware,
+            '/page',
+            HTTP_ACCEPT_LANGUAGE='en',
+            HTTP_ACCEPT_ENCODING='gzip',
+            )
+
+        eq_(3, self.app.request_count)
+
+    def test_vary_all(self):
+        self.app.headers = _PUBLIC_HEADERS + [('Vary', '*')]
+
+        _make_request(self.middleware, '/page')
+        _make_request(self.middleware, '/page')
+
+        eq_(2, self.app.request_count)
+
+    def test_uncacheable_responses(self):
+        uncacheable_response_headers = [
+            [],
+            [('Cache-Control', 'max-age=0')],
+            [('Cache-Control', 'private, max-age=60')],
+            [('Cache-Control', 'no-cache, max-age=60')],
+            [('Cache-Control', 'no-store')],
+            _PUBLIC_HEADERS + [('Set-Cookie', 'sessionid=abc')],
+            _PUBLIC_HEADERS + [('Age', '60')],
+            ]
+        for headers in uncacheable_response_headers:
+            app = _CountingApp(headers)
+            middleware = ResponseCacheMiddleware(app)
+
+            _make_request(middleware, '/page')
+            _make_request(middleware, '/page')
+
+            eq_(2, app.request_count)
+
+    def test_uncacheable_status(self):
+        self.app.status = '404 Not Found'
+
+        _make_request(self.middleware, '/page')
+        _make_request(self.middleware, '/page')
+
+        eq_(2, self.app.request_count)
+
+    def test_shared_maximum_age(self):
+        self.app.headers = [('Cache-Control', 'max-age=0, s-maxage=60')]
+
+        _make_request(self.middleware, '/page')
+        _make_request(self.middleware, '/page')
+
+        eq_(1, self.app.request_count)
+
+    def test_expiry(self):
+        self.app.headers = [('Cache-Control', 'max-age=60'), ('Age', '59')]
+
+        _make_request(self.middleware, '/page')
+        sleep(1.01)
+        _make_request(self.middleware, '/page')
+
+        eq_(2, self.app.request_count)
+
+    def test_matching_entity_tag(self):
+        self.app.headers = _PUBLIC_HEADERS + [('ETag', 'W/"abc"')]
+
+        _make_request(self.middleware, '/page')
+        response = _make_request(
+            self.middleware,
+            '/page',
+            HTTP_IF_NONE_MATCH='"xyz", "abc"',
+            )
+
+        eq_(1, self.app.request_count)
+        eq_('304 Not Modified', response.status)
+        eq_('', response.body)
+        eq_('W/"abc"', response.headers['ETag'])
+        eq_('public, max-age=60', response.headers['Cache-Control'])
+        eq_('0', response.headers['Age'])
+
+    def test_different_entity_tag(self):
+        self.app.headers = _PUBLIC_HEADERS + [('ETag', '"abc"')]
+
+        _make_request(self.middleware, '/page')
+        response = _make_request(
+            self.middleware,
+            '/page',
+            HTTP_IF_NONE_MATCH='"xyz"',
+            HTTP_IF_MODIFIED_SINCE=_LAST_MODIFIED,
+            )
+
+        eq_(1, self.app.request_count)
+        eq_('200 OK', response.status)
+        eq_('response 1', response.body)
+
+    def test_entity_tag_missing(self):
+        _make_request(self.middleware, '/page')
+        response = \
+            _make_request(self.middleware, '/page', HTTP_IF_NONE_MATCH='*')
+
+        eq_('200 OK', response.status)
+
+    def test_unmodified_response(self):
+        self.app.headers = \
+            _PUBLIC_HEADERS + [('Last-Modified', _LAST_MODIFIED)]
+
+        _make_request(self.middleware, '/page')
+        response = _make_request(
+            self.middleware,
+            '/page',
+            HTTP_IF_MODIFIED_SINCE=_LAST_MODIFIED,
+            )
+
+        eq_(1, self.app.request_count)
+        eq_('304 Not Modified', response.status)
+        eq_('', response.body)
+        eq_(_LAST_MODIFIED, response.headers['Last-Modified'])
+
+    def test_modified_response(self):
+        self.app.headers = \
+            _PUBLIC_HEADERS + [('Last-Modified', _LAST_MODIFIED)]
+
+        _make_request(self.middleware, '/page')
+        response = _make_request(
+            self.middleware,
+            '/page',
+            HTTP_IF_MODIFIED_SINCE='Tue, 01 Jan 2013 00:00:00 GMT',
+            )
+
+        eq_('200 OK', response.status)
+        eq_('response 1', response.body)
+
+    def test_modification_time_missing(self):
+        _make_request(self.middleware, '/page')
+        response = _make_request(
+            self.middleware,
+            '/page',
+            HTTP_IF_MODIFIED_SINCE=_LAST_MODIFIED,
+            )
+
+        eq_('200 OK', response.status)
+
+    def test_authorization(self):
+        _make_request(self.middleware, '/page')
+        _make_request(
+            self.middleware,
+            '/page',
+            HTTP_AUTHORIZATION='Basic Zm9vOmJhcg==',
+            )
+
+        eq_(2, self.app.request_count)
+        eq_(1, self.middleware.miss_count)
+
+    def test_cookies(self):
+        _make_request(self.middleware, '/page')
+        _make_request(self.middleware, '/page', HTTP_COOKIE='_ga=1')
+
+        eq_(2, self.app.request_count)
+
+    def test_private_cookie_names(self):
+        middleware = ResponseCacheMiddleware(
+            self.app,
+            private_cookie_names=['sessionid'],
+            )
+
+        _make_request(middleware, '/page')
+        _make_request(middleware, '/page', HTTP_COOKIE='_ga=1; csrftoken=2')
+        _make_request(middleware, '/page', HTTP_COOKIE='_ga=1; sessionid=3')
+
+        eq_(2, self.app.request_count)
+
+    def test_eviction(self):
+        # Enough room for the responses to two paths only
+        middleware = ResponseCacheMiddleware(self.app, cache_size=1500)
+
+        _make_request(middleware, '/page1')
+        _make_request(middleware, '/page2')
+        _make_request(middleware, '/page1')
+        _make_request(middleware, '/page3')
+        _make_request(middleware, '/page1')
+        _make_request(middleware, '/page2')
+
+        eq_(4, self.app.request_count)
+        ok_(0 < middleware.eviction_count)
+        ok_(middleware.get_stats()['size'] <= 1500)
+
+    def test_large_response(self):
+        middleware = ResponseCacheMiddleware(
+            self.app,
+            maximum_response_size=3,
+            )
+
+        _make_request(middleware, '/page')
+        _make_request(middleware, '/page')
+
+        eq_(2, self.app.request_count)
+
+    def test_incomplete_response(self):
+        app_iter = _make_request(self.middleware, '/page', is_complete=False)
+        app_iter.close()
+        _make_request(self.middleware, '/page')
+
+        eq_(2, self.app.request_count)
+
+    def test_original_response_closed(self):
+        app_iter = _ClosableAppIter()
+        middleware = ResponseCacheMiddleware(lambda e, s: app_iter)
+
+        response = _make_request(middleware, '/page', is_complete=False)
+        list(response)
+        response.close()
+
+        ok_(app_iter.is_closed)
+
+    def test_file_wrapper(self):
+        app_iter = _FileWrapper()
+        middleware = ResponseCacheMiddleware(lambda e, s: app_iter)
+
+        response = middleware(
+            {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': '/page',
+                'wsgi.file_wrapper': _FileWrapper,
+                },
+            lambda status, headers, exc_info=None: None,
+            )
+
+        ok_(app_iter is response)
+
+    def test_stats(self):
+        _make_request(self.middleware, '/page')
+        _make_request(self.middleware, '/page')
+
+        stats = self.middleware.get_stats()
+        eq_(1, stats['hits'])
+        eq_(1, stats['misses'])
+        eq_(0, stats['evictions'])
+        eq_(2, stats['entries'])
+        ok_(0 < stats['size'])
+
+    def test_stats_with_concurrent_requests(self):
+        def make_requests():
+            for _ in range(200):
+                _make_request(self.middleware, '/page')
+
+        threads = [Thread(target=make_requests) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = self.middleware.get_stats()
+        eq_(800, stats['hits'] + stats['misses'])
+
+    def test_stats_logged(self):
+        logging_handler = LoggingHandlerFixture()
+        try:
+            self.middleware.log_stats(signal.SIGUSR2, None)
+        finally:
+            logging_handler.undo()
+
+        info_messages = logging_handler.handler.messages['info']
+        eq_(1, len(info_messages))
+        ok_(info_messages[0].startswith('Response cache statistics'))
+
+
+class TestFilterFactory(object):
+
+    def test_options(self):
+        filter_ = make_response_cache_filter(
+            {},
+            cache_size='1000',
+            maximum_response_size='100',
+            private_cookie_names='sessionid\ncsrftoken',
+            )
+        middleware = filter_(_COUNTING_APP)
+
+        eq_(_COUNTING_APP, middleware.app)
+        eq_(100, middleware.maximum_response_size)
+        eq_(
+            frozenset(['sessionid', 'csrftoken']),
+            middleware.private_cookie_names,
+            )
+
+    def test_defaults(self):
+        middleware = make_response_cache_filter({})(_COUNTING_APP)
+
+        eq_(256 * 1024, middleware.maximum_response_size)
+        eq_(None, middleware.private_cookie_names)
+
+    def test_dump_signal(self):
+        original_signal_handler = signal.getsignal(signal.SIGUSR2)
+        try:
+            filter_ = make_response_cache_filter({}, dump_signal='SIGUSR2')
+            middleware = filter_(_COUNTING_APP)
+
+            eq_(middleware.log_stats, signal.getsignal(signal.SIGUSR2))
+        finally:
+            signal.signal(signal.SIGUSR2, original_signal_handler)
+
+    def test_dump_signal_shared(self):
+        original_signal_handler = signal.getsignal(signal.SIGUSR2)
+        logging_handler = LoggingHandlerFixture()
+        try:
+            make_latency_histogram_filter({}, dump_signal='SIGUSR2')(
+                _COUNTING_APP,
+                )
+            make_response_cache_filter({}, dump_signal='SIGUSR2')(
+                _COUNTING_APP,
+                )
+
+            signal.getsignal(signal.SIGUSR2)(signal.SIGUSR2, None)
+        finally:
+            signal.signal(signal.SIGUSR2, original_signal_handler)
+            logging_handler.undo()
+
+        info_messages = logging_handler.handler.messages['info']
+        eq_(2, len(info_messages))
+        ok_(info_messages[0].startswith('Response cache'))
+        ok_(info_messages[1].startswith('Request latencies'))
+
+    def test_unknown_signal(self):
+        assert_raises(
+            ValueError,
+            make_response_cache_filter,
+            {},
+            dump_signal='SIGFOO',
+            )
+
+
+class _CountingApp(object):
+
+    def __init__(self, headers):
+        super(_CountingApp, self).__init__()
+
+        self.status = '200 OK'
+        self.headers = headers
+        self.request_count = 0
+
+    def __call__(self, environ, start_response):
+        self.request_count += 1
+        start_response(self.status, list(self.headers))
+        return ['response ', str(self.request_count)]
+
+
+_COUNTING_APP = _CountingApp(_PUBLIC_HEADERS)
+
+
+class _ClosableAppIter(object):
+
+    def __init__(self):
+        super(_ClosableAppIter, self).__init__()
+
+        self.is_closed = False
+
+    def __iter__(self):
+        return iter([])
+
+    def close(self):
+        self.is_closed = True
+
+
+class _FileWrapper(object):
+
+    def __iter__(self):
+        return iter([])
+
+
+class _Response(object):
+
+    def __init__(self, status, headers, body):
+        super(_Response, self).__init__()
+
+        self.status = status
+        self.headers = dict(headers)
+        self.body = body
+
+
+def _make_request(
+    app,
+    path_info,
+    request_method='GET',
+    is_complete=True,
+    **extra_environ
+    ):
+    environ = {
+        'REQUEST_METHOD': request_method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path_info,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'wsgi.url_scheme': 'http',
+        }
+    environ.update(extra_environ)
+    start_response_calls = []
+
+    def start_response(status, headers, exc_info=None):
+        start_response_calls.append((status, headers))
+
+    app_iter = app(environ, start_response)
+    if not is_complete:
+        return app_iter
+
+    body = ''.join(app_iter)
+    if hasattr(app_iter, 'close'):
+        app_iter.close()
+    status, headers = start_response_calls[-1]
+    return _Response(status, headers, body)
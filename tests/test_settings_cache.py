@@ -0,0 +1,212 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from nose.tools import assert_false
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings import _get_resolved_local_conf_options
+from django_pastedeploy_settings.settings_cache import \
+    get_settings_cache_file_path
+from django_pastedeploy_settings.settings_cache import \
+    get_settings_cache_fingerprint
+from django_pastedeploy_settings.settings_cache import load_cached_options
+from django_pastedeploy_settings.settings_cache import store_cached_options
+
+from tests.mock_django_settings import cached_settings_module
+from tests.utils import get_global_conf
+from tests.utils import get_local_conf
+
+
+class _BaseSettingsCacheTestCase(object):
+
+    def setup(self):
+        self.temporary_directory_path = mkdtemp()
+        self.config_file_path = \
+            os.path.join(self.temporary_directory_path, 'config.ini')
+        with open(self.config_file_path, 'w') as config_file:
+            config_file.write('[app:main]\n')
+
+    def teardown(self):
+        rmtree(self.temporary_directory_path)
+
+    def _get_global_conf(self, **extra_options):
+        global_conf = get_global_conf(
+            'cached_settings_module',
+            __file__=self.config_file_path,
+            **extra_options
+            )
+        return global_conf
+
+    def _get_fingerprint(self, global_conf, local_conf):
+        fingerprint = get_settings_cache_fingerprint(
+            global_conf,
+            local_conf,
+            cached_settings_module,
+            )
+        return fingerprint
+
+
+class TestFingerprint(_BaseSettingsCacheTestCase):
+
+    def test_same_input(self):
+        global_conf = self._get_global_conf()
+        local_conf = get_local_conf(SETTING='value')
+
+        eq_(
+            self._get_fingerprint(global_conf, local_conf),
+            self._get_fingerprint(dict(global_conf), dict(local_conf)),
+            )
+
+    def test_different_global_conf(self):
+        local_conf = get_local_conf()
+        fingerprint1 = \
+            self._get_fingerprint(self._get_global_conf(), local_conf)
+        fingerprint2 = self._get_fingerprint(
+            self._get_global_conf(variable='value'),
+            local_conf,
+            )
+
+        ok_(fingerprint1 != fingerprint2)
+
+    def test_different_local_conf(self):
+        global_conf = self._get_global_conf()
+        fingerprint1 = \
+            self._get_fingerprint(global_conf, get_local_conf(SETTING=1))
+        fingerprint2 = \
+            self._get_fingerprint(global_conf, get_local_conf(SETTING=2))
+
+        ok_(fingerprint1 != fingerprint2)
+
+    def test_config_file_modified(self):
+        global_conf = self._get_global_conf()
+        local_conf = get_local_conf()
+        fingerprint1 = self._get_fingerprint(global_conf, local_conf)
+
+        config_file_stat = os.stat(self.config_file_path)
+        os.utime(
+            self.config_file_path,
+            (config_file_stat.st_atime, config_file_stat.st_mtime + 10),
+            )
+        fingerprint2 = self._get_fingerprint(global_conf, local_conf)
+
+        ok_(fingerprint1 != fingerprint2)
+
+
+class TestCacheStorage(_BaseSettingsCacheTestCase):
+
+    def test_cache_file_next_to_config_file(self):
+        eq_(
+            os.path.join(
+                self.temporary_directory_path,
+                '.config.ini.settings-cache',
+                ),
+            get_settings_cache_file_path(self.config_file_path),
+            )
+
+    def test_missing_cache(self):
+        cached_options = load_cached_options(self.config_file_path, 'abc')
+        eq_(None, cached_options)
+
+    def test_matching_fingerprint(self):
+        options = {'SETTING': [1, 2]}
+        store_cached_options(self.config_file_path, 'abc', options)
+
+        cached_options = load_cached_options(self.config_file_path, 'abc')
+        eq_(options, cached_options)
+
+    def test_mismatching_fingerprint(self):
+        store_cached_options(self.config_file_path, 'abc', {'SETTING': 1})
+
+        cached_options = load_cached_options(self.config_file_path, 'def')
+        eq_(None, cached_options)
+
+    def test_corrupted_cache(self):
+        cache_file_path = get_settings_cache_file_path(self.config_file_path)
+        with open(cache_file_path, 'wb') as cache_file:
+            cache_file.write('garbage')
+
+        cached_options = load_cached_options(self.config_file_path, 'abc')
+        eq_(None, cached_options)
+
+
+class TestCachedResolution(_BaseSettingsCacheTestCase):
+
+    def test_cache_disabled_by_default(self):
+        global_conf = self._get_global_conf()
+        local_conf = get_local_conf()
+
+        _get_resolved_local_conf_options(
+            global_conf,
+            local_conf,
+            cached_settings_module,
+            )
+
+        cache_file_path = get_settings_cache_file_path(self.config_file_path)
+        assert_false(os.path.exists(cache_file_path))
+
+    def test_cache_miss(self):
+        global_conf = self._get_global_conf(settings_cache='true')
+        local_conf = get_local_conf(SETTING=[1, 2])
+
+        options = _get_resolved_local_conf_options(
+            global_conf,
+            local_conf,
+            cached_settings_module,
+            )
+
+        eq_([1, 2], options['SETTING'])
+        fingerprint = self._get_fingerprint(global_conf, local_conf)
+        eq_(options, load_cached_options(self.config_file_path, fingerprint))
+
+    def test_cache_hit(self):
+        global_conf = self._get_global_conf(settings_cache='true')
+        local_conf = get_local_conf()
+
+        fingerprint = self._get_fingerprint(global_conf, local_conf)
+        store_cached_options(
+            self.config_file_path,
+            fingerprint,
+            {'SETTING': 'cached'},
+            )
+
+        options = _get_resolved_local_conf_options(
+            global_conf,
+            local_conf,
+            cached_settings_module,
+            )
+
+        eq_({'SETTING': 'cached'}, options)
+
+    def test_cache_invalidated(self):
+        global_conf = self._get_global_conf(settings_cache='true')
+        store_cached_options(
+            self.config_file_path,
+            self._get_fingerprint(global_conf, get_local_conf()),
+            {'SETTING': 'cached'},
+            )
+
+        local_conf = get_local_conf(SETTING='fresh')
+        options = _get_resolved_local_conf_options(
+            global_conf,
+            local_conf,
+            cached_settings_module,
+            )
+
+        eq_('fresh', options['SETTING'])
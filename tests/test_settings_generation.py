@@ -17,14 +17,17 @@ from nose.tools import assert_in
 from nose.tools import assert_raises
 from nose.tools import assert_raises_regexp
 from nose.tools import eq_
+from nose.tools import ok_
 
 from django_pastedeploy_settings import _DJANGO_UNSUPPORTED_SETTINGS
 from django_pastedeploy_settings import BadDebugFlagError
 from django_pastedeploy_settings import InvalidSettingValueError
+from django_pastedeploy_settings import LazilyResolvedOptions
 from django_pastedeploy_settings import MissingDjangoSettingsModuleError
 from django_pastedeploy_settings import resolve_local_conf_options
 from django_pastedeploy_settings import UnsupportedDjangoSettingError
 
+from tests import mock_json_decoder
 from tests.utils import BaseDjangoTestCase
 from tests.utils import get_global_conf
 from tests.utils import get_local_conf
@@ -143,6 +146,127 @@ class TestJSONParsing(object):
             )
 
 
+class TestJSONDecoderSelection(object):
+
+    def teardown(self):
+        del mock_json_decoder.DECODED_DOCUMENTS[:]
+
+    def test_custom_decoder(self):
+        global_conf = get_global_conf(
+            'read_only_empty_module',
+            json_decoder='tests.mock_json_decoder',
+            )
+        local_conf = get_local_conf(SETTING=[1, 2])
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf)
+
+        eq_([1, 2], local_conf_resolved['SETTING'])
+        assert_in('[1, 2]', mock_json_decoder.DECODED_DOCUMENTS)
+
+    def test_custom_decoder_in_lazy_resolution(self):
+        global_conf = get_global_conf(
+            'read_only_empty_module',
+            json_decoder='tests.mock_json_decoder',
+            )
+        local_conf = get_local_conf(SETTING=[1, 2])
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf, lazy=True)
+
+        eq_([1, 2], local_conf_resolved['SETTING'])
+        eq_(['[1, 2]'], mock_json_decoder.DECODED_DOCUMENTS)
+
+    def test_non_existing_decoder(self):
+        global_conf = get_global_conf(
+            'read_only_empty_module',
+            json_decoder='non_existing_json_library',
+            )
+
+        assert_raises(
+            ImportError,
+            resolve_local_conf_options,
+            global_conf,
+            get_local_conf(),
+            )
+
+    def test_automatic_decoder(self):
+        global_conf = \
+            get_global_conf('read_only_empty_module', json_decoder='auto')
+        local_conf = get_local_conf(SETTING={'key': [1, 2]})
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf)
+
+        eq_({'key': [1, 2]}, local_conf_resolved['SETTING'])
+
+
+class TestBatchedJSONParsing(object):
+
+    def setup(self):
+        self.global_conf = get_global_conf(
+            'read_only_empty_module',
+            batch_json_decoding='true',
+            json_decoder='tests.mock_json_decoder',
+            )
+
+    def teardown(self):
+        del mock_json_decoder.DECODED_DOCUMENTS[:]
+
+    def test_valid_json_values(self):
+        local_conf = get_local_conf(
+            parameter1='value1',
+            parameter2={'key': [1, 2]},
+            parameter3=None,
+            )
+
+        local_conf_resolved = \
+            resolve_local_conf_options(self.global_conf, local_conf)
+
+        eq_('value1', local_conf_resolved['parameter1'])
+        eq_({'key': [1, 2]}, local_conf_resolved['parameter2'])
+        eq_(None, local_conf_resolved['parameter3'])
+        eq_('secret', local_conf_resolved['SECRET_KEY'])
+        eq_(True, local_conf_resolved['DEBUG'])
+        eq_(1, len(mock_json_decoder.DECODED_DOCUMENTS))
+
+    def test_invalid_json_value(self):
+        local_conf = get_local_conf()
+        local_conf['parameter'] = 'unquoted string'
+
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            r"Could not decode value for option 'parameter'",
+            resolve_local_conf_options,
+            self.global_conf,
+            local_conf,
+            )
+
+    def test_value_with_multiple_json_documents(self):
+        local_conf = get_local_conf()
+        local_conf['parameter'] = '1, 2'
+
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            r"Could not decode value for option 'parameter'",
+            resolve_local_conf_options,
+            self.global_conf,
+            local_conf,
+            )
+
+    def test_values_spanning_multiple_options(self):
+        local_conf = get_local_conf()
+        local_conf['parameter1'] = '[1'
+        local_conf['parameter2'] = '2]'
+
+        assert_raises(
+            InvalidSettingValueError,
+            resolve_local_conf_options,
+            self.global_conf,
+            local_conf,
+            )
+
+
 class TestCustomStringSubstitution(object):
 
     def test_no_substitution(self):
@@ -226,6 +350,118 @@ class TestCustomStringSubstitution(object):
 
         eq_(1, local_conf_resolved[local_option_name])
 
+    def test_substituting_local_option(self):
+        global_conf = get_global_conf('read_only_empty_module')
+
+        local_conf = get_local_conf()
+        local_conf['SETTING1'] = '[${SETTING2}, ${SETTING3}]'
+        local_conf['SETTING2'] = '${SETTING3}0'
+        local_conf['SETTING3'] = '1'
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf)
+
+        eq_([10, 1], local_conf_resolved['SETTING1'])
+        eq_(10, local_conf_resolved['SETTING2'])
+
+    def test_global_options_take_precedence(self):
+        global_conf = get_global_conf('read_only_empty_module', SETTING2='1')
+
+        local_conf = get_local_conf(SETTING2=2)
+        local_conf['SETTING1'] = '${SETTING2}'
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf)
+
+        eq_(1, local_conf_resolved['SETTING1'])
+
+    def test_substituting_global_option_with_references(self):
+        global_conf = get_global_conf(
+            'read_only_empty_module',
+            root='/srv',
+            media_root='${root}/media',
+            escaped='$${root}',
+            )
+
+        local_conf = get_local_conf()
+        local_conf['SETTING1'] = '"${media_root}"'
+        local_conf['SETTING2'] = '"${escaped}"'
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf)
+
+        eq_('/srv/media', local_conf_resolved['SETTING1'])
+        eq_('${root}', local_conf_resolved['SETTING2'])
+
+    def test_global_option_referencing_local_option(self):
+        global_conf = get_global_conf(
+            'read_only_empty_module',
+            global_option='${SETTING2}',
+            )
+
+        local_conf = get_local_conf(SETTING2='value')
+        local_conf['SETTING1'] = '"${global_option}"'
+
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            'global_option.+SETTING2',
+            resolve_local_conf_options,
+            global_conf,
+            local_conf,
+            )
+
+    def test_reference_cycle(self):
+        global_conf = get_global_conf('read_only_empty_module')
+
+        local_conf = get_local_conf()
+        local_conf['SETTING1'] = '${SETTING2}'
+        local_conf['SETTING2'] = '${SETTING3}'
+        local_conf['SETTING3'] = '[${SETTING1}]'
+
+        with assert_raises(InvalidSettingValueError) as context_manager:
+            resolve_local_conf_options(global_conf, local_conf)
+
+        exception_message = str(context_manager.exception)
+        assert_in('cycle', exception_message)
+        # The chain may start at any option in the cycle
+        cycle_chain = exception_message.split(': ', 1)[1].split(' -> ')
+        eq_(4, len(cycle_chain))
+        eq_(cycle_chain[0], cycle_chain[-1])
+        eq_(
+            set(['"SETTING1"', '"SETTING2"', '"SETTING3"']),
+            set(cycle_chain),
+            )
+
+    def test_self_reference(self):
+        global_conf = get_global_conf('read_only_empty_module')
+
+        local_conf = get_local_conf()
+        local_conf['SETTING1'] = '${SETTING1}'
+
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            '"SETTING1" -> "SETTING1"',
+            resolve_local_conf_options,
+            global_conf,
+            local_conf,
+            )
+
+    def test_long_reference_chain(self):
+        """Long chains of references must not exhaust the stack."""
+        global_conf = get_global_conf('read_only_empty_module')
+
+        local_conf = get_local_conf()
+        chain_length = 5000
+        for option_index in range(chain_length):
+            local_conf['OPTION%s' % option_index] = \
+                '${OPTION%s}' % (option_index + 1)
+        local_conf['OPTION%s' % chain_length] = '"end"'
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf)
+
+        eq_('end', local_conf_resolved['OPTION0'])
+
 
 def test_unsupported_settings():
     global_conf = get_global_conf('read_only_empty_module')
@@ -262,3 +498,68 @@ def test_original_local_conf_unchanged():
     resolve_local_conf_options(global_conf, local_conf)
 
     eq_(local_conf_copy, local_conf)
+
+
+class TestLazyResolution(object):
+
+    def test_values_resolved(self):
+        global_conf = get_global_conf('read_only_empty_module', variable='v')
+        local_conf = get_local_conf(SETTING=['${variable}'])
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf, lazy=True)
+
+        ok_(isinstance(local_conf_resolved, LazilyResolvedOptions))
+        eq_(['v'], local_conf_resolved['SETTING'])
+        eq_(True, local_conf_resolved['DEBUG'])
+        eq_(None, local_conf_resolved['paste_configuration_file'])
+
+    def test_option_names(self):
+        global_conf = get_global_conf('read_only_empty_module')
+        local_conf = get_local_conf(SETTING=1)
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf, lazy=True)
+
+        expected_option_names = set(local_conf) | \
+            set(['DEBUG', 'paste_configuration_file'])
+        eq_(expected_option_names, set(local_conf_resolved))
+        eq_(len(expected_option_names), len(local_conf_resolved))
+
+    def test_values_memoized(self):
+        global_conf = get_global_conf('read_only_empty_module')
+        local_conf = get_local_conf(SETTING={'key': 'value'})
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf, lazy=True)
+
+        ok_(local_conf_resolved['SETTING'] is local_conf_resolved['SETTING'])
+
+    def test_invalid_value_not_resolved(self):
+        global_conf = get_global_conf('read_only_empty_module')
+        local_conf = get_local_conf()
+        local_conf['parameter'] = 'unquoted string'
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf, lazy=True)
+
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            r'parameter',
+            local_conf_resolved.__getitem__,
+            'parameter',
+            )
+
+    def test_validation(self):
+        global_conf = get_global_conf('read_only_empty_module')
+        local_conf = get_local_conf()
+        local_conf['parameter'] = 'unquoted string'
+
+        local_conf_resolved = \
+            resolve_local_conf_options(global_conf, local_conf, lazy=True)
+
+        assert_raises_regexp(
+            InvalidSettingValueError,
+            r'parameter',
+            local_conf_resolved.validate,
+            )
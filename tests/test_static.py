@@ -0,0 +1,613 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from email.utils import formatdate
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from nose.tools import assert_false
+from nose.tools import assert_in
+from nose.tools import assert_not_in
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings.static import _LRUCache
+from django_pastedeploy_settings.static import StaticFilesApplication
+
+
+class _BaseStaticFilesTestCase(object):
+
+    def setup(self):
+        self.directory_path = mkdtemp()
+        self._write_file('file.txt', 'Hello world')
+        os.mkdir(os.path.join(self.directory_path, 'directory'))
+        self._write_file('directory/index.html', '<p>Index</p>')
+
+        self.app = StaticFilesApplication(self.directory_path)
+
+    def teardown(self):
+        rmtree(self.directory_path)
+
+    def _write_file(self, relative_file_path, file_contents, mtime=None):
+        file_path = os.path.join(self.directory_path, relative_file_path)
+        with open(file_path, 'wb') as file_:
+            file_.write(file_contents)
+        if mtime is not None:
+            os.utime(file_path, (mtime, mtime))
+
+    def _request(self, path_info, method='GET', **extra_environ):
+        return _request(self.app, path_info, method, **extra_environ)
+
+
+class TestFileServing(_BaseStaticFilesTestCase):
+
+    def test_existing_file(self):
+        response = self._request('/file.txt')
+
+        eq_('200 OK', response.status)
+        eq_('Hello world', response.body)
+        eq_('text/plain', response.headers['Content-Type'])
+        eq_('11', response.headers['Content-Length'])
+
+    def test_unknown_content_type(self):
+        self._write_file('file.unknown-extension', 'data')
+
+        response = self._request('/file.unknown-extension')
+
+        eq_('application/octet-stream', response.headers['Content-Type'])
+
+    def test_non_existing_file(self):
+        response = self._request('/non-existing.txt')
+
+        eq_('404 Not Found', response.status)
+
+    def test_path_outside_directory(self):
+        response = self._request('/../' + os.path.basename(__file__))
+
+        eq_('404 Not Found', response.status)
+
+    def test_path_with_nul_byte(self):
+        response = self._request('/file.txt\0.html')
+
+        eq_('404 Not Found', response.status)
+
+    def test_directory_index(self):
+        response = self._request('/directory/')
+
+        eq_('200 OK', response.status)
+        eq_('<p>Index</p>', response.body)
+        eq_('text/html', response.headers['Content-Type'])
+
+    def test_directory_without_trailing_slash(self):
+        response = self._request('/directory')
+
+        eq_('301 Moved Permanently', response.status)
+        eq_('http://example.com/directory/', response.headers['Location'])
+
+    def test_head_request(self):
+        response = self._request('/file.txt', 'HEAD')
+
+        eq_('200 OK', response.status)
+        eq_('', response.body)
+        eq_('11', response.headers['Content-Length'])
+
+    def test_unsafe_method(self):
+        response = self._request('/file.txt', 'POST')
+
+        eq_('405 Method Not Allowed', response.status)
+        eq_('GET, HEAD', response.headers['Allow'])
+
+    def test_large_file(self):
+        self.app = StaticFilesApplication(
+            self.directory_path,
+            maximum_cached_file_size=4,
+            )
+
+        response = self._request('/file.txt')
+
+        eq_('Hello world', response.body)
+        assert_not_in(
+            os.path.join(self.directory_path, 'file.txt'),
+            self.app._file_contents_cache,
+            )
+
+
+class TestFileCaching(_BaseStaticFilesTestCase):
+
+    def test_file_cached(self):
+        self._request('/file.txt')
+
+        assert_in(
+            os.path.join(self.directory_path, 'file.txt'),
+            self.app._file_contents_cache,
+            )
+
+    def test_modified_file(self):
+        self._write_file('file.txt', 'Original', mtime=1000000000)
+        self._request('/file.txt')
+
+        self._write_file('file.txt', 'Modified', mtime=1000000001)
+        response = self._request('/file.txt')
+
+        eq_('Modified', response.body)
+
+
+class TestConditionalRequests(_BaseStaticFilesTestCase):
+
+    def setup(self):
+        super(TestConditionalRequests, self).setup()
+
+        self._write_file('file.txt', 'Hello world', mtime=1000000000)
+
+    def test_validators(self):
+        response = self._request('/file.txt')
+
+        ok_(response.headers['ETag'].startswith('"'))
+        ok_(response.headers['ETag'].endswith('"'))
+        eq_(
+            formatdate(1000000000, usegmt=True),
+            response.headers['Last-Modified'],
+            )
+
+    def test_entity_tag_changes_with_file(self):
+        original_entity_tag = self._request('/file.txt').headers['ETag']
+
+        self._write_file('file.txt', 'Hello world', mtime=1000000001)
+        new_entity_tag = self._request('/file.txt').headers['ETag']
+
+        ok_(original_entity_tag != new_entity_tag)
+
+    def test_matching_entity_tag(self):
+        entity_tag = self._request('/file.txt').headers['ETag']
+
+        response = self._request(
+            '/file.txt',
+            HTTP_IF_NONE_MATCH='"other", %s' % entity_tag,
+            )
+
+        eq_('304 Not Modified', response.status)
+        eq_('', response.body)
+        eq_(entity_tag, response.headers['ETag'])
+        assert_not_in('Content-Length', response.headers)
+
+    def test_weak_entity_tag(self):
+        entity_tag = self._request('/file.txt').headers['ETag']
+
+        response = \
+            self._request('/file.txt', HTTP_IF_NONE_MATCH='W/' + entity_tag)
+
+        eq_('304 Not Modified', response.status)
+
+    def test_wildcard_entity_tag(self):
+        response = self._request('/file.txt', HTTP_IF_NONE_MATCH='*')
+
+        eq_('304 Not Modified', response.status)
+
+    def test_mismatching_entity_tag(self):
+        response = self._request(
+            '/file.txt',
+            HTTP_IF_NONE_MATCH='"other"',
+            HTTP_IF_MODIFIED_SINCE=formatdate(1000000000, usegmt=True),
+            )
+
+        eq_('200 OK', response.status)
+
+    def test_unmodified_since(self):
+        response = self._request(
+            '/file.txt',
+            HTTP_IF_MODIFIED_SINCE=formatdate(1000000000, usegmt=True),
+            )
+
+        eq_('304 Not Modified', response.status)
+
+    def test_modified_since(self):
+        response = self._request(
+            '/file.txt',
+            HTTP_IF_MODIFIED_SINCE=formatdate(999999999, usegmt=True),
+            )
+
+        eq_('200 OK', response.status)
+
+    def test_invalid_modification_date(self):
+        response = \
+            self._request('/file.txt', HTTP_IF_MODIFIED_SINCE='yesterday')
+
+        eq_('200 OK', response.status)
+
+
+class _BaseByteRangesTestCase(_BaseStaticFilesTestCase):
+
+    maximum_cached_file_size = None
+
+    def setup(self):
+        super(_BaseByteRangesTestCase, self).setup()
+
+        self._write_file('file.txt', 'abcdefghij')
+        self.app = StaticFilesApplication(
+            self.directory_path,
+            maximum_cached_file_size=self.maximum_cached_file_size,
+            )
+
+    def test_ranges_accepted(self):
+        response = self._request('/file.txt')
+
+        eq_('bytes', response.headers['Accept-Ranges'])
+
+    def test_single_range(self):
+        response = self._request('/file.txt', HTTP_RANGE='bytes=2-4')
+
+        eq_('206 Partial Content', response.status)
+        eq_('cde', response.body)
+        eq_('3', response.headers['Content-Length'])
+        eq_('bytes 2-4/10', response.headers['Content-Range'])
+        eq_('text/plain', response.headers['Content-Type'])
+
+    def test_range_without_last_byte(self):
+        response = self._request('/file.txt', HTTP_RANGE='bytes=7-')
+
+        eq_('hij', response.body)
+        eq_('bytes 7-9/10', response.headers['Content-Range'])
+
+    def test_suffix_range(self):
+        response = self._request('/file.txt', HTTP_RANGE='bytes=-3')
+
+        eq_('hij', response.body)
+        eq_('bytes 7-9/10', response.headers['Content-Range'])
+
+    def test_range_beyond_end_of_file(self):
+        response = self._request('/file.txt', HTTP_RANGE='bytes=8-100')
+
+        eq_('ij', response.body)
+        eq_('bytes 8-9/10', response.headers['Content-Range'])
+
+    def test_multiple_ranges(self):
+        response = self._request('/file.txt', HTTP_RANGE='bytes=0-1, 5-6')
+
+        eq_('206 Partial Content', response.status)
+        content_type = response.headers['Content-Type']
+        ok_(content_type.startswith('multipart/byteranges; boundary='))
+        boundary = content_type.split('=', 1)[1]
+        expected_body = (
+            '\r\n--%(boundary)s\r\n'
+            'Content-Type: text/plain\r\n'
+            'Content-Range: bytes 0-1/10\r\n'
+            '\r\n'
+            'ab'
+            '\r\n--%(boundary)s\r\n'
+            'Content-Type: text/plain\r\n'
+            'Content-Range: bytes 5-6/10\r\n'
+            '\r\n'
+            'fg'
+            '\r\n--%(boundary)s--\r\n'
+            ) % {'boundary': boundary}
+        eq_(expected_body, response.body)
+        eq_(str(len(expected_body)), response.headers['Content-Length'])
+
+    def test_unsatisfiable_range(self):
+        response = self._request('/file.txt', HTTP_RANGE='bytes=20-30')
+
+        ok_(response.status.startswith('416 '))
+        eq_('bytes */10', response.headers['Content-Range'])
+
+    def test_partially_satisfiable_ranges(self):
+        response = self._request('/file.txt', HTTP_RANGE='bytes=20-30, 0-0')
+
+        eq_('206 Partial Content', response.status)
+        eq_('a', response.body)
+
+    def test_invalid_range(self):
+        response = self._request('/file.txt', HTTP_RANGE='bytes=5-2')
+
+        eq_('200 OK', response.status)
+        eq_('abcdefghij', response.body)
+
+    def test_unsupported_range_unit(self):
+        response = self._request('/file.txt', HTTP_RANGE='items=1-2')
+
+        eq_('200 OK', response.status)
+
+    def test_range_in_head_request(self):
+        response = self._request('/file.txt', 'HEAD', HTTP_RANGE='bytes=2-4')
+
+        eq_('200 OK', response.status)
+        eq_('10', response.headers['Content-Length'])
+
+    def test_matching_if_range(self):
+        entity_tag = self._request('/file.txt').headers['ETag']
+
+        response = self._request(
+            '/file.txt',
+            HTTP_RANGE='bytes=2-4',
+            HTTP_IF_RANGE=entity_tag,
+            )
+
+        eq_('206 Partial Content', response.status)
+
+    def test_mismatching_if_range(self):
+        response = self._request(
+            '/file.txt',
+            HTTP_RANGE='bytes=2-4',
+            HTTP_IF_RANGE='"other"',
+            )
+
+        eq_('200 OK', response.status)
+        eq_('abcdefghij', response.body)
+
+
+class TestByteRangesInCachedFiles(_BaseByteRangesTestCase):
+
+    maximum_cached_file_size = 1024
+
+
+class TestByteRangesInUncachedFiles(_BaseByteRangesTestCase):
+
+    maximum_cached_file_size = 0
+
+
+class TestUncachedFileServing(_BaseStaticFilesTestCase):
+
+    def setup(self):
+        super(TestUncachedFileServing, self).setup()
+
+        self.app = StaticFilesApplication(
+            self.directory_path,
+            maximum_cached_file_size=0,
+            )
+
+    def test_file_larger_than_chunk(self):
+        file_contents = ''.join(chr(index % 256) for index in range(200000))
+        self._write_file('file.bin', file_contents)
+
+        response = self._request('/file.bin')
+
+        eq_(file_contents, response.body)
+
+    def test_empty_file(self):
+        self._write_file('empty.txt', '')
+
+        response = self._request('/empty.txt')
+
+        eq_('200 OK', response.status)
+        eq_('', response.body)
+
+    def test_file_wrapper(self):
+        response = self._request(
+            '/file.txt',
+            **{'wsgi.file_wrapper': _MockFileWrapper}
+            )
+
+        eq_('Hello world', response.body)
+        ok_(response.was_file_wrapper_used)
+
+    def test_file_wrapper_not_used_for_ranges(self):
+        response = self._request(
+            '/file.txt',
+            HTTP_RANGE='bytes=0-4',
+            **{'wsgi.file_wrapper': _MockFileWrapper}
+            )
+
+        eq_('Hello', response.body)
+        assert_false(response.was_file_wrapper_used)
+
+
+class TestPrecompressedFiles(_BaseStaticFilesTestCase):
+
+    def setup(self):
+        super(TestPrecompressedFiles, self).setup()
+
+        self._write_file('file.txt', 'Hello world', mtime=1000000000)
+        self._write_file('file.txt.gz', 'gzip data', mtime=1000000000)
+        self._write_file('file.txt.br', 'brotli data', mtime=1000000000)
+        self.app = StaticFilesApplication(
+            self.directory_path,
+            precompressed_encodings=('gzip', ),
+            )
+
+    def test_accepted_encoding(self):
+        response = self._request('/file.txt', HTTP_ACCEPT_ENCODING='gzip')
+
+        eq_('gzip data', response.body)
+        eq_('gzip', response.headers['Content-Encoding'])
+        eq_('text/plain', response.headers['Content-Type'])
+        eq_('9', response.headers['Content-Length'])
+        eq_('Accept-Encoding', response.headers['Vary'])
+
+    def test_unaccepted_encoding(self):
+        response = \
+            self._request('/file.txt', HTTP_ACCEPT_ENCODING='deflate')
+
+        eq_('Hello world', response.body)
+        assert_not_in('Content-Encoding', response.headers)
+        eq_('Accept-Encoding', response.headers['Vary'])
+
+    def test_rejected_encoding(self):
+        response = \
+            self._request('/file.txt', HTTP_ACCEPT_ENCODING='gzip;q=0')
+
+        eq_('Hello world', response.body)
+
+    def test_wildcard_encoding(self):
+        response = self._request('/file.txt', HTTP_ACCEPT_ENCODING='*')
+
+        eq_('gzip data', response.body)
+
+    def test_encoding_preference(self):
+        self.app = StaticFilesApplication(
+            self.directory_path,
+            precompressed_encodings=('br', 'gzip'),
+            )
+
+        response = \
+            self._request('/file.txt', HTTP_ACCEPT_ENCODING='gzip, br')
+
+        eq_('brotli data', response.body)
+        eq_('br', response.headers['Content-Encoding'])
+
+    def test_disabled_encoding(self):
+        response = self._request('/file.txt', HTTP_ACCEPT_ENCODING='br')
+
+        eq_('Hello world', response.body)
+
+    def test_no_precompressed_encodings(self):
+        self.app = StaticFilesApplication(self.directory_path)
+
+        response = self._request('/file.txt', HTTP_ACCEPT_ENCODING='gzip')
+
+        eq_('Hello world', response.body)
+        assert_not_in('Vary', response.headers)
+
+    def test_out_of_date_compressed_file(self):
+        self._write_file('file.txt', 'Hello world', mtime=1000000001)
+
+        response = self._request('/file.txt', HTTP_ACCEPT_ENCODING='gzip')
+
+        eq_('Hello world', response.body)
+
+    def test_missing_compressed_file(self):
+        os.remove(os.path.join(self.directory_path, 'file.txt.gz'))
+
+        response = self._request('/file.txt', HTTP_ACCEPT_ENCODING='gzip')
+
+        eq_('Hello world', response.body)
+
+    def test_entity_tag_per_encoding(self):
+        entity_tag = self._request('/file.txt').headers['ETag']
+        compressed_entity_tag = self._request(
+            '/file.txt',
+            HTTP_ACCEPT_ENCODING='gzip',
+            ).headers['ETag']
+
+        ok_(entity_tag != compressed_entity_tag)
+
+        response = self._request(
+            '/file.txt',
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=compressed_entity_tag,
+            )
+        eq_('304 Not Modified', response.status)
+
+    def test_unsupported_encoding(self):
+        assert_raises(
+            ValueError,
+            StaticFilesApplication,
+            self.directory_path,
+            precompressed_encodings=('deflate', ),
+            )
+
+
+class TestLRUCache(object):
+
+    def test_missing_entry(self):
+        cache = _LRUCache(10)
+
+        eq_(None, cache.get('entry', 1))
+
+    def test_matching_key(self):
+        cache = _LRUCache(10)
+        cache.set('entry', 1, 'value')
+
+        eq_('value', cache.get('entry', 1))
+
+    def test_mismatching_key(self):
+        cache = _LRUCache(10)
+        cache.set('entry', 1, 'value')
+
+        eq_(None, cache.get('entry', 2))
+        assert_not_in('entry', cache)
+        eq_(0, cache.size)
+
+    def test_least_recently_used_entry_evicted(self):
+        cache = _LRUCache(10)
+        cache.set('entry1', 1, 'abcd')
+        cache.set('entry2', 1, 'efgh')
+        cache.get('entry1', 1)
+
+        cache.set('entry3', 1, 'ijkl')
+
+        assert_in('entry1', cache)
+        assert_not_in('entry2', cache)
+        assert_in('entry3', cache)
+        eq_(8, cache.size)
+
+    def test_replaced_entry(self):
+        cache = _LRUCache(10)
+        cache.set('entry', 1, 'abcd')
+
+        cache.set('entry', 2, 'efghij')
+
+        eq_('efghij', cache.get('entry', 2))
+        eq_(6, cache.size)
+
+    def test_entry_larger_than_cache(self):
+        cache = _LRUCache(10)
+        cache.set('entry', 1, 'abcdefghijk')
+
+        assert_false('entry' in cache)
+        eq_(0, len(cache))
+
+
+class _MockFileWrapper(object):
+
+    def __init__(self, file_, block_size):
+        super(_MockFileWrapper, self).__init__()
+
+        self.file = file_
+
+    def __iter__(self):
+        return iter([self.file.read()])
+
+    def close(self):
+        self.file.close()
+
+
+class _Response(object):
+
+    def __init__(self, status, headers, body, was_file_wrapper_used):
+        super(_Response, self).__init__()
+
+        self.status = status
+        self.headers = dict(headers)
+        self.body = body
+        self.was_file_wrapper_used = was_file_wrapper_used
+
+
+def _request(app, path_info, method='GET', **extra_environ):
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path_info,
+        'SERVER_NAME': 'example.com',
+        'SERVER_PORT': '80',
+        'wsgi.url_scheme': 'http',
+        }
+    environ.update(extra_environ)
+
+    start_response_arguments = []
+
+    def start_response(status, headers, exc_info=None):
+        start_response_arguments.extend([status, headers])
+
+    response_body_chunks = app(environ, start_response)
+    was_file_wrapper_used = isinstance(response_body_chunks, _MockFileWrapper)
+    try:
+        response_body = ''.join(response_body_chunks)
+    finally:
+        if hasattr(response_body_chunks, 'close'):
+            response_body_chunks.close()
+
+    status, headers = start_response_arguments
+    return _Response(status, headers, response_body, was_file_wrapper_used)
@@ -0,0 +1,150 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+from paste.urlmap import URLMap
+
+from django_pastedeploy_settings.urlmap import TrieURLMap
+
+
+_MOUNTED_URLS = (
+    '/',
+    '/media',
+    '/media/tenant1',
+    '/media/tenant2/',
+    '/static',
+    'http://example.org/media',
+    'http://example.org:8080/',
+    )
+
+_REQUESTS = (
+    ('example.com', ''),
+    ('example.com', '/'),
+    ('example.com', '/page'),
+    ('example.com', '/media'),
+    ('example.com', '/media/'),
+    ('example.com', '/media/image.png'),
+    ('example.com', '/mediafile'),
+    ('example.com', '/media/tenant1/image.png'),
+    ('example.com', '/media/tenant10/image.png'),
+    ('example.com', '/media/tenant2'),
+    ('example.com', '//media//tenant2//image.png'),
+    ('example.com', '/static/css/style.css'),
+    ('example.org', '/media/image.png'),
+    ('example.org', '/page'),
+    ('example.org:8080', '/page'),
+    ('EXAMPLE.ORG', '/media'),
+    )
+
+
+class TestDispatching(object):
+
+    def test_same_as_urlmap(self):
+        url_map = _get_url_map(URLMap)
+        trie_url_map = _get_url_map(TrieURLMap)
+
+        for host, path_info in _REQUESTS:
+            eq_(
+                _dispatch(url_map, host, path_info),
+                _dispatch(trie_url_map, host, path_info),
+                'Different result for %s%s' % (host, path_info),
+                )
+
+    def test_not_found(self):
+        trie_url_map = TrieURLMap()
+        trie_url_map['/media'] = _MockApp('/media')
+
+        environ = _get_environ('example.com', '/page')
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(status)
+
+        trie_url_map(environ, start_response)
+
+        eq_(['404 Not Found'], statuses)
+        ok_(environ['paste.urlmap_object'] is trie_url_map)
+
+    def test_replaced_app(self):
+        trie_url_map = TrieURLMap()
+        trie_url_map['/media'] = _MockApp('original')
+        trie_url_map['/media/'] = _MockApp('replacement')
+
+        eq_(
+            ('replacement', '/media', '/image.png'),
+            _dispatch(trie_url_map, 'example.com', '/media/image.png'),
+            )
+        eq_(1, len(trie_url_map.keys()))
+
+    def test_removed_app(self):
+        trie_url_map = TrieURLMap()
+        trie_url_map['/'] = _MockApp('root')
+        trie_url_map['/media'] = _MockApp('media')
+
+        del trie_url_map['/media']
+
+        eq_(
+            ('root', '', '/media/image.png'),
+            _dispatch(trie_url_map, 'example.com', '/media/image.png'),
+            )
+
+    def test_removing_non_existing_app(self):
+        trie_url_map = TrieURLMap()
+
+        assert_raises(KeyError, trie_url_map.__delitem__, '/media')
+
+    def test_app_set_to_none(self):
+        trie_url_map = TrieURLMap()
+        trie_url_map['/media'] = _MockApp('media')
+
+        trie_url_map['/media'] = None
+
+        eq_([], trie_url_map.keys())
+
+
+class _MockApp(object):
+
+    def __init__(self, name):
+        super(_MockApp, self).__init__()
+
+        self.name = name
+
+    def __call__(self, environ, start_response):
+        return (self.name, environ['SCRIPT_NAME'], environ['PATH_INFO'])
+
+
+def _get_url_map(url_map_class):
+    url_map = url_map_class()
+    for url in _MOUNTED_URLS:
+        url_map[url] = _MockApp(url)
+    return url_map
+
+
+def _dispatch(url_map, host, path_info):
+    environ = _get_environ(host, path_info)
+    return url_map(environ, lambda status, headers: None)
+
+
+def _get_environ(host, path_info):
+    environ = {
+        'HTTP_HOST': host,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path_info,
+        'REQUEST_METHOD': 'GET',
+        'wsgi.url_scheme': 'http',
+        }
+    return environ
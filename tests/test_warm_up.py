@@ -0,0 +1,322 @@
+##############################################################################
+#
+# Copyright (c) 2013, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of django-pastedeploy-settings
+# <https://github.com/2degrees/django-pastedeploy-settings>, which is subject
+# to the provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+import django.core.cache
+import django.db
+from django.template import TemplateDoesNotExist
+from nose.tools import assert_in
+from nose.tools import assert_not_in
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_pastedeploy_settings import get_configured_django_wsgi_app
+from django_pastedeploy_settings.instrumentation import add_startup_listener
+from django_pastedeploy_settings.instrumentation import \
+    remove_startup_listener
+from django_pastedeploy_settings.warm_up import warm_up_application
+
+from tests.mock_django_settings import warmed_up_settings_module
+from tests.utils import BaseDjangoTestCase
+from tests.utils import get_global_conf
+from tests.utils import MOCK_WSGI_APP
+from tests.utils import MockApp
+
+
+class _BaseWarmUpTestCase(BaseDjangoTestCase):
+
+    setup_fixture = False
+
+    def teardown(self):
+        for setting_name in dir(warmed_up_settings_module):
+            if setting_name.isupper():
+                delattr(warmed_up_settings_module, setting_name)
+
+        super(_BaseWarmUpTestCase, self).teardown()
+
+    @staticmethod
+    def _load_app(
+        allowed_hosts='[".example.org", "example.com"]',
+        **extra_global_conf
+        ):
+        global_conf = get_global_conf(
+            'warmed_up_settings_module',
+            **extra_global_conf
+            )
+        get_configured_django_wsgi_app(
+            global_conf,
+            SECRET_KEY='"secret"',
+            WSGI_APPLICATION='"tests.utils.MOCK_WSGI_APP"',
+            ROOT_URLCONF='"tests.mock_django_settings.'
+                'warmed_up_settings_module"',
+            ALLOWED_HOSTS=allowed_hosts,
+            )
+
+
+class TestWarmUpConfiguration(_BaseWarmUpTestCase):
+
+    def setup(self):
+        super(TestWarmUpConfiguration, self).setup()
+
+        self.startup_reports = []
+        add_startup_listener(self.startup_reports.append)
+
+    def teardown(self):
+        remove_startup_listener(self.startup_reports.append)
+
+        super(TestWarmUpConfiguration, self).teardown()
+
+    def test_disabled_by_default(self):
+        self._load_app()
+
+        assert_not_in('warm_up', self._get_phase_names())
+        eq_([], self.logs['info'])
+
+    def test_enabled(self):
+        self._load_app(warm_up='true')
+
+        assert_in('warm_up', self._get_phase_names())
+        eq_(1, len(self.logs['info']))
+        ok_(self.logs['info'][0].startswith('Application warmed up in '))
+
+    def test_requests(self):
+        self._load_app(warm_up='true', warm_up_paths='/ /page?query')
+
+        eq_('/page', MOCK_WSGI_APP.environ['PATH_INFO'])
+        eq_('query', MOCK_WSGI_APP.environ['QUERY_STRING'])
+        eq_(
+            [
+                'Warm-up request to /: 200 OK',
+                'Warm-up request to /page?query: 200 OK',
+                ],
+            [
+                message for message in self.logs['debug']
+                if message.startswith('Warm-up request')
+                ],
+            )
+
+    def _get_phase_names(self):
+        startup_report = self.startup_reports[0]
+        phase_names = [
+            phase_timing.name for phase_timing in startup_report.phase_timings
+            ]
+        return phase_names
+
+
+class TestWarmUp(_BaseWarmUpTestCase):
+
+    def setup(self):
+        super(TestWarmUp, self).setup()
+
+        self._load_app()
+
+    def test_steps(self):
+        step_timings = warm_up_application()
+
+        eq_(
+            ['urlconf', 'middleware', 'templates', 'translations'],
+            [step_timing.name for step_timing in step_timings],
+            )
+
+    def test_missing_template(self):
+        assert_raises(
+            TemplateDoesNotExist,
+            warm_up_application,
+            template_names=['missing.html'],
+            )
+
+    def test_lazily_loaded_middleware(self):
+        wsgi_application = _MockDjangoHandler()
+
+        warm_up_application(wsgi_application)
+
+        ok_(wsgi_application.is_middleware_loaded)
+
+    def test_requests(self):
+        wsgi_application = MockApp('200 OK', [])
+
+        step_timings = \
+            warm_up_application(wsgi_application, request_paths=['/page'])
+
+        eq_('requests', step_timings[-1].name)
+        environ = wsgi_application.environ
+        eq_('GET', environ['REQUEST_METHOD'])
+        eq_('/page', environ['PATH_INFO'])
+        eq_('', environ['QUERY_STRING'])
+        # The first host allowed which is not a pattern
+        eq_('example.com', environ['HTTP_HOST'])
+        eq_(['Warm-up request to /page: 200 OK'], self.logs['debug'][-1:])
+
+    def test_failed_request(self):
+        wsgi_application = MockApp('500 Internal Server Error', [])
+
+        warm_up_application(wsgi_application, request_paths=['/page'])
+
+        eq_(
+            [
+                'Warm-up request to /page (host example.com) failed: 500 '
+                'Internal Server Error',
+                ],
+            self.logs['warning'][-1:],
+            )
+
+    def test_client_error_request(self):
+        wsgi_application = MockApp('400 Bad Request', [])
+
+        warm_up_application(wsgi_application, request_paths=['/page'])
+
+        eq_(
+            [
+                'Warm-up request to /page (host example.com) failed: 400 Bad '
+                'Request',
+                ],
+            self.logs['warning'][-1:],
+            )
+
+    def test_requests_without_application(self):
+        assert_raises(
+            ValueError,
+            warm_up_application,
+            request_paths=['/page'],
+            )
+
+
+class TestWarmUpRequestHost(_BaseWarmUpTestCase):
+
+    def test_subdomain_pattern(self):
+        self._load_app(allowed_hosts='["*", ".example.org"]')
+        wsgi_application = MockApp('200 OK', [])
+
+        warm_up_application(wsgi_application, request_paths=['/page'])
+
+        eq_('example.org', wsgi_application.environ['HTTP_HOST'])
+
+    def test_no_allowed_hosts(self):
+        self._load_app(allowed_hosts='[]')
+        wsgi_application = MockApp('200 OK', [])
+
+        warm_up_application(wsgi_application, request_paths=['/page'])
+
+        eq_('localhost', wsgi_application.environ['HTTP_HOST'])
+
+
+class TestWarmUpConnections(_BaseWarmUpTestCase):
+
+    def setup(self):
+        super(TestWarmUpConnections, self).setup()
+
+        self._load_app()
+
+        self.original_connections = django.db.connections
+        self.original_caches = django.core.cache.caches
+        django.db.connections = _MockConnectionHandler()
+        django.core.cache.caches = _MockConnectionHandler()
+
+    def teardown(self):
+        django.db.connections = self.original_connections
+        django.core.cache.caches = self.original_caches
+
+        super(TestWarmUpConnections, self).teardown()
+
+    def test_connections_closed(self):
+        wsgi_application = _ConnectingApp()
+
+        warm_up_application(wsgi_application, request_paths=['/page'])
+
+        ok_(django.db.connections.connection.is_closed)
+        ok_(django.core.cache.caches.connection.is_closed)
+
+    def test_connections_closed_after_failed_request(self):
+        wsgi_application = _ConnectingApp(exception=ValueError())
+
+        assert_raises(
+            ValueError,
+            warm_up_application,
+            wsgi_application,
+            request_paths=['/page'],
+            )
+
+        ok_(django.db.connections.connection.is_closed)
+        ok_(django.core.cache.caches.connection.is_closed)
+
+    def test_no_requests(self):
+        warm_up_application(_ConnectingApp())
+
+        ok_(not django.db.connections.connection.is_closed)
+        ok_(not django.core.cache.caches.connection.is_closed)
+
+
+class _ConnectingApp(MockApp):
+    """
+    Mock WSGI application which uses the database and the cache.
+
+    """
+
+    def __init__(self, exception=None):
+        super(_ConnectingApp, self).__init__('200 OK', [])
+
+        self.exception = exception
+
+    def __call__(self, environ, start_response):
+        django.db.connections.connection.is_closed = False
+        django.core.cache.caches.connection.is_closed = False
+
+        if self.exception:
+            raise self.exception
+
+        return super(_ConnectingApp, self).__call__(environ, start_response)
+
+
+class _MockConnectionHandler(object):
+    """
+    Mock handler of the database connections or the cache backends, with a
+    single connection which is open until it's closed.
+
+    """
+
+    def __init__(self):
+        super(_MockConnectionHandler, self).__init__()
+
+        self.connection = _MockConnection()
+
+    def all(self):
+        return [self.connection]
+
+    def close_all(self):
+        self.connection.close()
+
+
+class _MockConnection(object):
+
+    def __init__(self):
+        super(_MockConnection, self).__init__()
+
+        self.is_closed = False
+
+    def close(self, **kwargs):
+        self.is_closed = True
+
+
+class _MockDjangoHandler(object):
+
+    def __init__(self):
+        super(_MockDjangoHandler, self).__init__()
+
+        self._request_middleware = None
+        self.is_middleware_loaded = False
+
+    def load_middleware(self):
+        self._request_middleware = []
+        self.is_middleware_loaded = True